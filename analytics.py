@@ -0,0 +1,228 @@
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dependencies import duration_hours, format_hours
+from metrics import STAGE_SECONDS, log
+from storage import TASKS_UPDATED_MARK, StorageError, get_storage
+
+# Seconds a snapshot is reused before the next read brings it up to date
+ANALYTICS_REFRESH_SECONDS = int(os.getenv("ANALYTICS_REFRESH_SECONDS", "60"))
+# Postgres stamps UPDATED_AT when a row is written, not when its transaction commits, so each refresh
+# also re-reads this many seconds before the previous one; only longer transactions can be missed
+ANALYTICS_OVERLAP_SECONDS = int(os.getenv("ANALYTICS_OVERLAP_SECONDS", "300"))
+
+STATUS_TYPE = pd.CategoricalDtype(["Not Started", "In Progress", "On Hold", "Completed", "Reviewed & Approved"])
+PRIORITY_TYPE = pd.CategoricalDtype(["Low", "Medium", "High"], ordered=True)
+CLOSED_STATUSES = ["Completed", "Reviewed & Approved"]
+
+SNAPSHOT_COLUMNS = ["id", "assigned_to", "status", "priority", "deadline", "started_at", "completed_at", "estimated_time"]
+SNAPSHOT_TASKS = """
+SELECT ID, ASSIGNED_TO, STATUS, PRIORITY, DEADLINE, STARTED_AT, COMPLETED_AT, ESTIMATED_TIME
+FROM TASKS
+"""
+CHANGED_SINCE = "WHERE ID > ? OR UPDATED_AT >= ?"
+TASK_TOTALS = "SELECT COUNT(*), MAX(ID) FROM TASKS"
+CONTACT_NAMES = "SELECT ID, NAME FROM CONTACTS WHERE ID IN ({ids})"
+
+
+class TaskSnapshot:
+    """
+    An in-memory columnar copy of the TASKS columns that workload reporting needs: a DataFrame
+    indexed by task ID, with categorical status and priority, datetime64 timestamps, and
+    ESTIMATED_TIME parsed into hours once per distinct text. The first refresh loads every task;
+    later ones re-read only the tasks added or updated since, and reload everything only when
+    tasks were deleted. All metrics are computed on whole columns.
+    """
+
+    def __init__(self, storage, overlap=ANALYTICS_OVERLAP_SECONDS):
+        self.storage = storage
+        self.overlap = overlap
+        self._estimates = {}  # ESTIMATED_TIME text -> hours (NaN if unreadable)
+        self._last_id = 0
+        self._since = None
+        self.frame = self._read(None)
+        self.refreshed_at = None
+        self._lock = threading.Lock()
+
+    def _read(self, buffer):
+        if buffer is None:
+            frame = pd.DataFrame({column: pd.Series(dtype=object) for column in SNAPSHOT_COLUMNS}).set_index("id")
+        else:
+            frame = pd.read_csv(buffer, names=SNAPSHOT_COLUMNS, index_col="id", keep_default_na=False, na_values=[""],
+                                dtype={"estimated_time": str})
+        frame["assigned_to"] = frame["assigned_to"].astype("int64")
+        frame["status"] = frame["status"].astype(STATUS_TYPE)
+        frame["priority"] = frame["priority"].astype(PRIORITY_TYPE)
+        for column in ("deadline", "started_at", "completed_at"):
+            frame[column] = pd.to_datetime(frame[column], format="ISO8601")
+        codes, texts = pd.factorize(frame.pop("estimated_time"))
+        for text in texts:
+            if text not in self._estimates:
+                self._estimates[text] = duration_hours(text) or np.nan
+        # Code -1 (no estimate) picks the trailing NaN
+        hours = np.array([self._estimates[text] for text in texts] + [np.nan])
+        frame["estimate_hours"] = hours[codes]
+        return frame
+
+    def refresh(self):
+        """Bring the snapshot up to date; return the number of tasks (re-)read."""
+        with self._lock:
+            read = self._load(full=self.refreshed_at is None)
+            if read is None:
+                # Tasks were deleted since the last read: start over with a full load
+                read = self._load(full=True)
+            self.refreshed_at = datetime.now()
+            return read
+
+    def _load(self, full):
+        with self.storage.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.storage.sql(TASKS_UPDATED_MARK[self.storage.backend]), (self.overlap,))
+            since = cursor.fetchone()[0]
+            if full:
+                changed = self._read(self.storage.copy_out(cursor, SNAPSHOT_TASKS))
+            else:
+                changed = self._read(self.storage.copy_out(cursor, SNAPSHOT_TASKS + CHANGED_SINCE, (self._last_id, self._since)))
+            cursor.execute(TASK_TOTALS)
+            count, last_id = cursor.fetchone()
+        if full:
+            frame = changed
+        elif len(changed):
+            frame = pd.concat([self.frame.drop(changed.index, errors="ignore"), changed])
+            if len(frame) != count:
+                return None
+        else:
+            frame = self.frame
+            if len(frame) != count:
+                return None
+        self.frame, self._last_id, self._since = frame, last_id or 0, since
+        return len(changed)
+
+    def _columns(self, now=None):
+        frame = self.frame
+        now = np.datetime64(now or datetime.now())
+        closed = frame["status"].isin(CLOSED_STATUSES).to_numpy()
+        cycle_hours = ((frame["completed_at"] - frame["started_at"]).dt.total_seconds() / 3600).to_numpy()
+        cycle_hours = np.where(closed & (cycle_hours >= 0), cycle_hours, np.nan)
+        return pd.DataFrame({
+            "assigned_to": frame["assigned_to"].to_numpy(),
+            "priority": frame["priority"].array,
+            "estimate_hours": frame["estimate_hours"].to_numpy(),
+            "open": ~closed,
+            "overdue": ~closed & (frame["deadline"].to_numpy() < now),
+            "completed": closed,
+            "cycle_hours": cycle_hours,
+            "estimate_ratio": cycle_hours / frame["estimate_hours"].to_numpy(),
+        })
+
+    def summary(self, now=None):
+        """Task counts, with median and 90th percentile cycle time and median actual/estimate ratio of finished tasks."""
+        columns = self._columns(now)
+        cycle, ratio = columns["cycle_hours"].dropna(), columns["estimate_ratio"].dropna()
+        return {
+            "tasks": len(columns),
+            "open": int(columns["open"].sum()),
+            "overdue": int(columns["overdue"].sum()),
+            "completed": int(columns["completed"].sum()),
+            "cycle_hours_p50": float(cycle.median()) if len(cycle) else None,
+            "cycle_hours_p90": float(cycle.quantile(0.9)) if len(cycle) else None,
+            "estimate_ratio_p50": float(ratio.median()) if len(ratio) else None,
+            "over_estimate": float((ratio > 1).mean()) if len(ratio) else None,
+        }
+
+    def workload(self, now=None):
+        """Per assignee: open, overdue and completed tasks, median cycle hours and actual/estimate ratio; most overdue first."""
+        table = self._columns(now).groupby("assigned_to").agg(
+            open=("open", "sum"), overdue=("overdue", "sum"), completed=("completed", "sum"),
+            cycle_hours=("cycle_hours", "median"), estimate_ratio=("estimate_ratio", "median"),
+        )
+        return table.sort_values(["overdue", "open"], ascending=False)
+
+    def cycle_times(self):
+        """Finished tasks per priority, with median and 90th percentile hours from start to completion."""
+        cycle = self._columns().dropna(subset=["cycle_hours"]).groupby("priority", observed=False)["cycle_hours"]
+        return pd.DataFrame({"completed": cycle.count(), "p50_hours": cycle.median(), "p90_hours": cycle.quantile(0.9)})
+
+    def estimate_accuracy(self):
+        """
+        Finished tasks grouped by their estimate, with the median actual/estimate ratio and the
+        share that took longer than estimated.
+        """
+        columns = self._columns().dropna(subset=["estimate_ratio"])
+        columns["over"] = columns["estimate_ratio"] > 1
+        grouped = columns.groupby("estimate_hours")
+        return pd.DataFrame({
+            "completed": grouped.size(),
+            "estimate_ratio": grouped["estimate_ratio"].median(),
+            "over_estimate": grouped["over"].mean(),
+        })
+
+
+def contact_names(ids, storage=None):
+    """Return {contact ID: name} for the given IDs (a page of a report, not every contact)."""
+    ids = [int(contact_id) for contact_id in ids]
+    if not ids:
+        return {}
+    storage = storage or get_storage()
+    with storage.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(storage.sql(CONTACT_NAMES.format(ids=", ".join(["?"] * len(ids)))), ids)
+        return dict(cursor.fetchall())
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_task_snapshot(storage=None, max_age=ANALYTICS_REFRESH_SECONDS):
+    """
+    Return the process-wide task snapshot, refreshed first when older than `max_age` seconds.
+    If the database fails, the previous snapshot is returned as it was.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = TaskSnapshot(storage or get_storage())
+        snapshot = _snapshot
+    refreshed_at = snapshot.refreshed_at
+    if refreshed_at is not None and (datetime.now() - refreshed_at).total_seconds() < max_age:
+        return snapshot
+    started = time.perf_counter()
+    try:
+        with STAGE_SECONDS.time(stage="analytics"):
+            read = snapshot.refresh()
+    except StorageError as e:
+        log("analytics_refresh_error", error=str(e))
+    else:
+        log("analytics_refresh", read=read, tasks=len(snapshot.frame), seconds=round(time.perf_counter() - started, 4))
+    return snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the task analytics snapshot and print workload metrics.")
+    parser.add_argument("--top", type=int, default=10, help="assignees listed, most overdue first")
+    args = parser.parse_args()
+
+    storage = get_storage()
+    storage.create_schema()
+    snapshot = TaskSnapshot(storage)
+    started = time.perf_counter()
+    print(f"Loaded {snapshot.refresh()} task(s) in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    print(f"Refreshed {snapshot.refresh()} changed task(s) in {time.perf_counter() - started:.3f}s")
+
+    summary = snapshot.summary()
+    print(f"{summary['open']} open, {summary['overdue']} overdue, {summary['completed']} finished")
+    if summary["cycle_hours_p50"] is not None:
+        print(f"Cycle time: median {format_hours(summary['cycle_hours_p50'])}, 90th percentile {format_hours(summary['cycle_hours_p90'])}")
+        print(f"Actual/estimate: median {summary['estimate_ratio_p50']:.2f}, {summary['over_estimate']:.0%} over estimate")
+    workload = snapshot.workload().head(args.top)
+    names = contact_names(workload.index, storage)
+    for row in workload.itertuples():
+        print(f"{names.get(row.Index, row.Index)}: {row.overdue} overdue of {row.open} open, {row.completed} finished")
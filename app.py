@@ -1,23 +1,89 @@
 import os
-import sqlite3
-from datetime import datetime
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from dotenv import load_dotenv
-from apscheduler.schedulers.blocking import BlockingScheduler
-import google.generativeai as genai
+from changes import CHANGE_CAPTURE, CHANGE_POLL_SECONDS, ChangeFeed
+from dependencies import get_dependency_graph
+from dispatch import Email, EmailDispatcher, SEND_CONCURRENCY, make_transport
+from llm import DIGEST_PROMPT, MessageGenerator, make_backend
+from llm_cache import LLMCache
+from pipeline import FETCH_CHUNK_SIZE, prefetch, stage
+from ledger import NotificationLedger
+from outbox import Outbox
+from shards import NOTIFY_SHARDS, run_sharded
+from slots import SCHEDULE_JITTER_SECONDS, SCHEDULE_TICK_MINUTES, SlotClock, due_slots, todays_slots
+from storage import get_storage
+from templates import get_template
+from metrics import RUNS, STAGE_SECONDS, TASKS, log, record_span, span, start_metrics_server
 
 # Load environment variables
 load_dotenv()
 
-# Retrieve API keys (remove or hide these prints in production)
+# Retrieve API keys (never logged); the Gemini key is read by the backend on its first request
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-print("SendGrid API Key:", SENDGRID_API_KEY)
-print("Gemini API Key:", GEMINI_API_KEY)
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+# "inline" sends from the scheduler process; "outbox" only queues jobs for worker.py processes
+NOTIFY_MODE = os.getenv("NOTIFY_MODE", "inline")
+
+# Days before the deadline on which reminders go out, e.g. LEAD_TIMES=7,2,0
+LEAD_TIMES = [int(days) for days in os.getenv("LEAD_TIMES", "2").split(",")]
+
+# LLM_CACHE_ENABLED=0 sends every LLM request to the model
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+
+# Digest mode: one email per contact covering all of their due tasks, with at most one LLM message each
+DIGEST_MODE = os.getenv("DIGEST_MODE", "0") == "1"
+
+# The dispatcher and the message generators are created on first use, not on import,
+# so importing app (pages, tests, tools) opens no connections and creates no cache file
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+_message_generator = _digest_generator = None
+_generator_lock = threading.Lock()
+
+def get_dispatcher():
+    """
+    Return the process-wide EmailDispatcher: one transport (and its keep-alive connections) shared by
+    every send, SendGrid's HTTP API or an SMTP relay with EMAIL_TRANSPORT=smtp.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = EmailDispatcher(make_transport(sendgrid_api_key=SENDGRID_API_KEY), max_workers=SEND_CONCURRENCY)
+        return _dispatcher
+
+def close_dispatcher():
+    """Close the dispatcher's send workers and connections, if this process created it."""
+    global _dispatcher
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.close()
+
+def get_message_generator():
+    """
+    Return the process-wide MessageGenerator: one model instance reused by every LLM request
+    (LLM_BACKEND=stub for offline runs), fronted by an on-disk cache so re-runs and retries
+    skip tasks that have not changed.
+    """
+    global _message_generator
+    with _generator_lock:
+        if _message_generator is None:
+            _message_generator = MessageGenerator(make_backend(), cache=LLMCache() if LLM_CACHE_ENABLED else None)
+        return _message_generator
+
+def get_digest_generator():
+    """Return the digest MessageGenerator, sharing the message generator's model and cache."""
+    global _digest_generator
+    generator = get_message_generator()
+    with _generator_lock:
+        if _digest_generator is None:
+            _digest_generator = MessageGenerator(generator.backend, cache=generator.cache, prompt=DIGEST_PROMPT)
+        return _digest_generator
+
+# Distinct deadlines whose formatted form is kept in memory
+DEADLINE_CACHE_SIZE = int(os.getenv("DEADLINE_CACHE_SIZE", "4096"))
 
 def ordinal(n):
     """Return ordinal string for an integer n, e.g., 1 -> 1st, 2 -> 2nd."""
@@ -27,123 +93,339 @@ def ordinal(n):
         suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
     return f"{n}{suffix}"
 
-def format_deadline(deadline_str):
+# Deadlines travel as the DEADLINE value the database returned (a datetime on Postgres, the stored
+# 'YYYY-MM-DD HH:MM' text on SQLite), so the ledger and outbox keys match TASKS.DEADLINE exactly;
+# they are turned into text only for the email and the LLM prompt
+def deadline_text(deadline):
+    """Return a DEADLINE value as 'YYYY-MM-DD HH:MM' text."""
+    return deadline.strftime('%Y-%m-%d %H:%M') if isinstance(deadline, datetime) else deadline
+
+@lru_cache(maxsize=DEADLINE_CACHE_SIZE)
+def format_deadline(deadline):
     """
-    Convert a deadline string in 'YYYY-MM-DD HH:MM' format into a nicely formatted string.
+    Convert a deadline (a datetime, or a string in 'YYYY-MM-DD HH:MM' format) into a nicely formatted string.
     Example: '2025-03-12 23:59' becomes 'March 12th, 2025, at 11:59 PM'
+    Results are memoized, since most reminders in a run share a handful of deadlines.
     """
-    dt = datetime.strptime(deadline_str, '%Y-%m-%d %H:%M')
+    dt = deadline if isinstance(deadline, datetime) else datetime.strptime(deadline, '%Y-%m-%d %H:%M')
     return dt.strftime("%B ") + ordinal(dt.day) + dt.strftime(", %Y, at %I:%M %p")
 
-# Function to send email notifications using SendGrid
-def send_deadline_notification(recipient_email, task_title, deadline, additional_message="", recipient_name=""):
-    formatted_deadline = format_deadline(deadline)
-    subject = f"Gentle Reminder: {task_title} Deadline Approaching"
-    
-    plain_text = (
-        f"Hi,\n\n"
-        f"This is a friendly reminder about your task {task_title}, which is due on {deadline}.\n\n"
-        f"Subject: {subject}\n\n"
-        f"Hi {recipient_name}, This is a friendly reminder about the {task_title} task, due on {formatted_deadline}. "
-        f"To help you stay on track, consider breaking down the project into smaller, manageable chunks. "
-        f"This can make the overall task feel less overwhelming and allow for more focused progress. "
-        f"Please let me know if you require any assistance or resources to complete this on time. We're here to support you!\n\n"
-        f"Best regards,\n"
-        f"[Your Name/Team Name]"
+# Reminder templates live in TEMPLATE_DIR (templates/reminder.subject.txt, .txt and .html) and
+# are compiled once, then again only when edited. Per-recipient values become substitution tags,
+# so every reminder shares one template and can be sent to many recipients in a single batched request.
+REMINDER_TEMPLATE = os.getenv("REMINDER_TEMPLATE", "reminder")
+REMINDER_FIELDS = ("task_title", "deadline", "formatted_deadline", "recipient_name", "additional_message", "escalation")
+
+def reminder_template():
+    return get_template(REMINDER_TEMPLATE, REMINDER_FIELDS)
+
+# Function to render the reminder email for a single task
+def build_deadline_email(recipient_email, task_title, deadline, additional_message="", recipient_name="", task_id=None, lead_days=None, template=None, escalation=""):
+    template = template or reminder_template()
+    return Email(
+        to=recipient_email,
+        subject=template.subject.tagged,
+        plain_text=template.plain_text.tagged,
+        html=template.html.tagged,
+        to_name=recipient_name,
+        key=(task_id, lead_days, deadline) if task_id is not None else task_title,
+        substitutions=template.substitutions({
+            "task_title": task_title,
+            "deadline": deadline_text(deadline),
+            "formatted_deadline": format_deadline(deadline),
+            "recipient_name": recipient_name,
+            "additional_message": additional_message,
+            "escalation": escalation,
+        }),
+        template=template
     )
-    
-    html_content = f"""
-    <html>
-      <body>
-        <p>Hi,</p>
-        <p>This is a friendly reminder about your task <strong>{task_title}</strong>, which is due on {deadline}.</p>
-        <p><strong>Subject: {subject}</strong></p>
-        <p>Hi {recipient_name}, This is a friendly reminder about the <strong>{task_title}</strong> task, due on <strong>{formatted_deadline}</strong>.<br>
-           To help you stay on track, consider breaking down the project into smaller, manageable chunks. 
-           This can make the overall task feel less overwhelming and allow for more focused progress.<br>
-           Please let me know if you require any assistance or resources to complete this on time. We're here to support you!</p>
-        <p>Best regards,<br>[Your Name/Team Name]</p>
-      </body>
-    </html>
-    """
-    
-    message = Mail(
-        from_email='srepuriya24@gmail.com',  # Replace with your verified sender email
-        to_emails=recipient_email,
-        subject=subject,
-        plain_text_content=plain_text,
-        html_content=html_content
+
+# Function to record one send outcome as a per-task span of the current run
+def report_send_result(result):
+    key = result.email.key
+    if isinstance(key, list):  # Digest: one span for the email, listing its tasks
+        task_id, lead_days = ",".join(str(task[0]) for task in key), None
+    else:
+        task_id, lead_days, _ = key if isinstance(key, tuple) else (None, None, None)
+    record_span(
+        "task", result.elapsed or 0.0,
+        task_id=task_id, lead_days=lead_days, recipient=result.email.to,
+        status="sent" if result.ok else "failed", status_code=result.status_code,
+        message_id=result.message_id, error=result.error
     )
+
+# Function to send a single email notification through the configured transport
+def send_deadline_notification(recipient_email, task_title, deadline, additional_message="", recipient_name=""):
+    email = build_deadline_email(recipient_email, task_title, deadline, additional_message, recipient_name)
+    result = get_dispatcher().dispatch([email])[0]
+    report_send_result(result)
+    return result
+
+def deadline_windows(lead_times, today=None):
+    """Return (lead_days, start, end) half-open date ranges, one per lead time."""
+    today = today or date.today()
+    return [
+        (days, (today + timedelta(days=days)).isoformat(), (today + timedelta(days=days + 1)).isoformat())
+        for days in sorted(set(lead_times))
+    ]
+
+# Function to time each chunk fetched from the database and count the tasks it holds
+def timed_chunks(chunks, count=len):
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        print(f"Email sent to {recipient_email} with status code:", response.status_code)
-    except Exception as e:
-        print("Error sending email:", str(e))
-
-# Function to query the database for tasks with deadlines exactly 2 days from now
-def get_tasks_due_in_two_days():
-    conn = sqlite3.connect("test.db")  # Adjust the path if needed
-    cursor = conn.cursor()
-    
-    query = """
-    SELECT t.TITLE, t.DEADLINE, c.EMAIL, c.NAME
-    FROM TASKS t
-    JOIN CONTACTS c ON t.ASSIGNED_TO = c.ID
-    WHERE date(t.DEADLINE) = date('now', '+2 days')
-    """
-    cursor.execute(query)
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+        while True:
+            with STAGE_SECONDS.time(stage="query"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            TASKS.inc(count(chunk))
+            yield chunk
+    finally:
+        chunks.close()
 
-# Function to process tasks with LLM (Gemini) for additional message/recommendations
+# Function to query the database for open tasks due on any of the lead-time days,
+# streamed in chunks of `chunk_size` rows (see Storage.iter_due_tasks)
+def iter_due_task_chunks(lead_times=LEAD_TIMES, today=None, chunk_size=FETCH_CHUNK_SIZE, slot=None, shard=None, changes=None):
+    return timed_chunks(get_storage().iter_due_tasks(deadline_windows(lead_times, today), chunk_size, slot, shard, changes))
+
+# Function to query due tasks grouped per contact (see Storage.iter_due_digests)
+def iter_due_digest_chunks(lead_times=LEAD_TIMES, today=None, chunk_size=FETCH_CHUNK_SIZE, slot=None, shard=None, changes=None):
+    return timed_chunks(
+        get_storage().iter_due_digests(deadline_windows(lead_times, today), chunk_size, slot, shard, changes),
+        count=lambda digests: sum(len(digest.tasks) for digest in digests)
+    )
+
+# Function to query the due tasks of the contacts in each send slot, with lead times
+# counted from the contacts' local date (all contacts and today's date without slots)
+def iter_slot_chunks(fetch, slots=None, shard=None, changes=None):
+    if slots is None:
+        yield from fetch(shard=shard, changes=changes)
+        return
+    for slot in slots:
+        yield from fetch(today=slot.local_date, slot=slot, shard=shard, changes=changes)
+
+def get_due_tasks(lead_times=LEAD_TIMES, today=None):
+    return [row for chunk in iter_due_task_chunks(lead_times, today) for row in chunk]
+
+# Function to generate a personalized message per task with the LLM (Gemini)
 def process_tasks_with_llm(tasks):
-    prompt =  """You are generating a single email notification for the following task:
+    """Return {task_id: message} for the given task rows; tasks the LLM could not answer are omitted."""
+    llm_tasks = [(task_id, title, deadline_text(deadline), name) for task_id, title, deadline, email, name, lead_days in tasks]
+    messages = get_message_generator().generate(llm_tasks)
+    log("llm_messages", generated=len(messages), tasks=len(tasks))
+    return messages
+
+# Reminders for tasks that hold up work at risk of missing its deadline carry an escalation note
+def render_chunk(tasks, messages):
+    graph = get_dependency_graph()
+    with STAGE_SECONDS.time(stage="render"):
+        template = reminder_template()
+        return [
+            build_deadline_email(recipient_email, title, deadline, messages.get(task_id, ""), recipient_name, task_id, lead_days, template,
+                                 graph.escalation(task_id))
+            for task_id, title, deadline, recipient_email, recipient_name, lead_days in tasks
+        ]
+
+# Reminder digests: one summary per contact, tasks listed by priority then deadline
+DIGEST_TEMPLATE = os.getenv("DIGEST_TEMPLATE", "digest")
+DIGEST_FIELDS = ("recipient_name", "task_count", "additional_message")
+DIGEST_ITEM_FIELDS = ("task_title", "deadline", "formatted_deadline", "priority", "escalation")
+
+def digest_template():
+    return get_template(DIGEST_TEMPLATE, DIGEST_FIELDS, item_fields=DIGEST_ITEM_FIELDS)
+
+def build_digest_email(digest, additional_message="", template=None, graph=None):
+    template = template or digest_template()
+    graph = graph or get_dependency_graph()
+    return Email(
+        to=digest.email,
+        subject=template.subject.tagged,
+        plain_text=template.plain_text.tagged,
+        html=template.html.tagged,
+        to_name=digest.name,
+        key=[(task.task_id, task.lead_days, task.deadline) for task in digest.tasks],
+        substitutions=template.substitutions(
+            {"recipient_name": digest.name, "task_count": len(digest.tasks), "additional_message": additional_message},
+            [
+                {"task_title": task.title, "deadline": deadline_text(task.deadline),
+                 "formatted_deadline": format_deadline(task.deadline), "priority": task.priority,
+                 "escalation": graph.escalation(task.task_id)}
+                for task in digest.tasks
+            ]
+        ),
+        template=template
+    )
+
+# Function to generate one personalized message per contact digest with the LLM
+def process_digests_with_llm(digests):
+    """Return {contact_id: message}; contacts the LLM could not answer are omitted."""
+    items = [
+        (digest.contact_id, digest.name, [(task.title, deadline_text(task.deadline), task.priority) for task in digest.tasks])
+        for digest in digests
+    ]
+    messages = get_digest_generator().generate(items)
+    log("llm_messages", generated=len(messages), digests=len(digests))
+    return messages
+
+def render_digest_chunk(digests, messages):
+    graph = get_dependency_graph()
+    with STAGE_SECONDS.time(stage="render"):
+        template = digest_template()
+        return [build_digest_email(digest, messages.get(digest.contact_id, ""), template, graph) for digest in digests]
 
-Please create an email notification for the task assigned to the person below, ensuring it is polite, motivating, and encourages them to complete the task on time. The email should not be repetitive, and should include the following structure:
+# Function to pick the (fetch, enrich, render) stages for the current mode
+def notify_stages():
+    if DIGEST_MODE:
+        return iter_due_digest_chunks, process_digests_with_llm, render_digest_chunk
+    return iter_due_task_chunks, process_tasks_with_llm, render_chunk
 
-1. A friendly greeting that addresses the person by their name.
-2. A clear mention of the task title and its deadline.
-3. A brief and polite reminder of the task deadline.
-4. A suggestion or recommendation to help them manage the task efficiently.
-5. A closing line offering help or resources if needed.
 
-Your goal is to ensure that the email is helpful, clear, and motivating. Only generate **one email** based on the provided task details. Do not include any additional options or versions.
-The following tasks have deadlines in 2 days:\n
-"""
-    for title, deadline, email, name in tasks:
-        prompt += f"Task: {title}, Deadline: {deadline}, Assigned To: {email}\n"
-    prompt += "\nPlease provide an additional message or recommendation to include in the email notifications."
+# Main function to check tasks and send notifications.
+# Query, LLM enrichment and sending run as a pipeline of bounded stages: each stage works on
+# its own thread at most PIPELINE_DEPTH chunks ahead of the next, so memory stays flat and the
+# first emails go out as soon as the first chunk is enriched.
+# With DIGEST_MODE=1 the same pipeline runs over per-contact digests instead of single tasks.
+# Scheduled runs pass the send slots that came due (see notify_due_slots); without them every contact is reminded.
+# A shard (index, count) limits the run to that share of the contacts (see shards.py), and
+# a change ID to the tasks logged in TASK_CHANGES up to it (see notify_changes).
+def check_and_notify(slots=None, shard=None, changes=None):
+    fetch, enrich, render = notify_stages()
+    with span(
+        "notify_run", mode="inline", digest=DIGEST_MODE, lead_times=",".join(map(str, sorted(LEAD_TIMES))),
+        slots=len(slots) if slots is not None else None, shard="/".join(map(str, shard)) if shard else None,
+        changes=changes
+    ) as run:
+        storage = get_storage()
+        get_dependency_graph(storage)  # Refresh the dependency index before the pipeline starts
+        ledger = NotificationLedger(storage)
+        chunks = prefetch(iter_slot_chunks(fetch, slots, shard, changes))
+        enriched = stage(lambda items: (items, enrich(items)), chunks)
+        emails = (email for items, messages in enriched for email in render(items, messages))
 
+        sent = total = 0
+        try:
+            for result in get_dispatcher().dispatch_iter(emails):
+                report_send_result(result)
+                ledger.record(result)
+                total += 1
+                sent += result.ok
+        except Exception:
+            RUNS.inc(status="error")
+            raise
+        finally:
+            ledger.close()
+        RUNS.inc(status="ok")
+        run.set(sent=sent, failed=total - sent)
+        cache = get_message_generator().cache
+        if cache is not None:
+            run.set(**{f"llm_cache_{key}": value for key, value in cache.stats().items()})
+    return {"sent": sent, "failed": total - sent}
+
+# Function to queue due reminders in the outbox for worker processes (python worker.py) to send.
+# Only the query runs here; LLM calls and sends scale with the number of workers.
+def enqueue_due_notifications(slots=None, changes=None):
+    with span(
+        "notify_run", mode="outbox", lead_times=",".join(map(str, sorted(LEAD_TIMES))),
+        slots=len(slots) if slots is not None else None, changes=changes
+    ) as run:
+        storage = get_storage()
+        queue = Outbox(storage)
+        queued = sum(queue.enqueue(tasks) for tasks in iter_slot_chunks(iter_due_task_chunks, slots, changes=changes))
+        # Already queued reminders are skipped by the outbox
+        run.set(offered=queued, outbox=queue.counts())
+        RUNS.inc(status="ok")
+    return queued
+
+# Each contact is reminded at their preferred local hour (PREFERRED_HOUR and TIMEZONE on CONTACTS),
+# in a slot spread over the following SEND_SPREAD_MINUTES. Every few minutes the scheduler sends
+# only the slots that came due since its last tick, so the day's reminders go out in small batches.
+# The clock only moves on once a run has finished: a tick that fails (e.g. the database is down) is
+# covered again by the next one, and slots with failed sends are retried on later ticks that day.
+# Either way the ledger skips the reminders already sent.
+slot_clock = SlotClock()
+
+# Scheduler ticks and change batches run one at a time: both may pick the same contact's reminder,
+# and neither sees it as sent until its run has recorded it in the ledger
+_notify_lock = threading.Lock()
+
+def notify_due_slots():
+    with _notify_lock:
+        start, end = slot_clock.pending()
+        storage = get_storage()
+        ChangeFeed(storage).prune()  # Keeps the change log bounded when no watcher runs
+        slots = slot_clock.retry_slots(end) + due_slots(storage.send_groups(), start, end)
+        if not slots:
+            slot_clock.finish(end)
+            return None
+        if NOTIFY_MODE == "outbox":
+            result = enqueue_due_notifications(slots)  # Failed sends are retried by the outbox workers
+            slot_clock.finish(end, slots)
+            return result
+        if NOTIFY_SHARDS > 1:
+            result = run_sharded(NOTIFY_SHARDS, slots)
+        else:
+            result = check_and_notify(slots)
+        slot_clock.finish(end, slots, failed=result["failed"] > 0)
+        return result
+
+# Tasks added, re-dated, reassigned or reopened are logged by triggers on TASKS (see changes.py).
+# Each batch of changes is checked right away for the contacts whose send slot already came
+# today; contacts whose slot is still ahead get the changed tasks with it.
+# Returns the last change handled, or None when there were none.
+def notify_changes(feed):
+    last_change = feed.latest()
+    if last_change is None:
+        return None
+    storage = get_storage()
+    with _notify_lock:
+        slots = todays_slots(storage.send_groups())
+        if slots and NOTIFY_MODE == "outbox":
+            enqueue_due_notifications(slots, changes=last_change)
+        elif slots:
+            check_and_notify(slots, changes=last_change)
+    feed.clear(last_change)
+    return last_change
+
+# Function to handle task changes within seconds of being made, until stopped
+def watch_changes(poll_seconds=CHANGE_POLL_SECONDS):
+    storage = get_storage()
+    feed = ChangeFeed(storage, poll_seconds)
+    log("change_watch_started", backend=storage.backend)
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
-        response = model.generate_content(prompt)
-        llm_response = response.text.strip() if response and response.text else ""
-        print("LLM Response:", llm_response)
-        return llm_response
-    except Exception as e:
-        print("Error during LLM processing:", str(e))
-        return ""
-
-# Main function to check tasks and send notifications
-def check_and_notify():
-    print("Checking tasks due in 2 days...")
-    tasks = get_tasks_due_in_two_days()
-    if tasks:
-        additional_message = process_tasks_with_llm(tasks)
-        for title, deadline, recipient_email, recipient_name in tasks:
-            send_deadline_notification(recipient_email, title, deadline, additional_message, recipient_name)
-    else:
-        print("No tasks with deadlines in 2 days.")
+        while True:
+            try:
+                if notify_changes(feed) is None:
+                    feed.wait()
+            except Exception as e:
+                # The batch stays in the log and is retried after the next wait
+                log("change_watch_error", error=str(e))
+                feed.wait()
+    finally:
+        feed.close()
 
-# Scheduler to run the check_and_notify function at a fixed time
-scheduler = BlockingScheduler()
-scheduler.add_job(check_and_notify, 'cron', hour=19, minute=8)  # Adjust the time as needed
+# Function to build the long-running scheduler; APScheduler is only imported by the serve command
+def build_scheduler():
+    from apscheduler.schedulers.blocking import BlockingScheduler
 
-if __name__ == "__main__":
+    scheduler = BlockingScheduler()
+    scheduler.add_job(
+        notify_due_slots, 'interval', minutes=SCHEDULE_TICK_MINUTES, jitter=SCHEDULE_JITTER_SECONDS,
+        max_instances=1, coalesce=True
+    )
+    return scheduler
+
+# Function to run the scheduler (and the change watcher) until stopped. The schema is created
+# or migrated once here, at startup: runs and ticks never take DDL locks themselves.
+def serve():
+    get_storage().create_schema()
+    start_metrics_server()
+    scheduler = build_scheduler()
+    if CHANGE_CAPTURE:
+        threading.Thread(target=watch_changes, name="change-watcher", daemon=True).start()
     print("Starting scheduler... (Press Ctrl+C to exit)")
     try:
         scheduler.start()
     except (KeyboardInterrupt, SystemExit):
         print("Scheduler stopped.")
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime
+
+# Benchmark defaults; every one can also be set on the command line
+BENCH_SIZES = os.getenv("BENCH_SIZES", "1000,10000,100000")  # Tasks per generated database
+BENCH_LEAD_TIMES = os.getenv("BENCH_LEAD_TIMES", "0,1,2,3,7")
+BENCH_OUTPUT = os.getenv("BENCH_OUTPUT", "bench_results.json")
+BENCH_STARTUP_RUNS = int(os.getenv("BENCH_STARTUP_RUNS", "5"))  # Cold starts timed per command
+
+
+class Recorder:
+    """Collects call durations from several threads."""
+
+    def __init__(self):
+        self.durations = []
+        self._lock = threading.Lock()
+
+    def wrap(self, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.durations.append(elapsed)
+        return timed
+
+    def timed_iter(self, iterable):
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            with self._lock:
+                self.durations.append(time.perf_counter() - started)
+            yield item
+
+    def latency_ms(self):
+        durations = sorted(self.durations)
+        if not durations:
+            return {"calls": 0, "p50": None, "p99": None, "max": None}
+
+        def percentile(p):
+            return round(durations[min(len(durations) - 1, int(p * len(durations)))] * 1000, 3)
+
+        return {"calls": len(durations), "p50": percentile(0.50), "p99": percentile(0.99), "max": round(durations[-1] * 1000, 3)}
+
+
+def measure(func, items_of, recorder):
+    """Run one stage on its own, returning its timings and traced peak memory."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    output = func()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    items = items_of(output)
+    return output, {
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(items / seconds, 1) if seconds else None,
+        "latency_ms": recorder.latency_ms(),
+        "peak_memory_mb": round(peak / 2 ** 20, 2)
+    }
+
+
+# Function to benchmark one generated database inside a child process, so module-level
+# state (storage pool, dispatcher, caches) and peak RSS are not shared between sizes
+def run_child(args):
+    from fakes import FakeGemini, FakeSendGrid, FakeSMTP
+
+    if args.transport == "smtp":
+        mail = FakeSMTP(args.send_latency / 1000, args.send_error_rate, seed=args.seed).start()
+        os.environ.update(EMAIL_TRANSPORT="smtp", SMTP_HOST="127.0.0.1", SMTP_PORT=str(mail.port), SMTP_SECURITY="none")
+    else:
+        mail = FakeSendGrid(args.send_latency / 1000, args.send_error_rate, seed=args.seed).start()
+        os.environ.update(EMAIL_TRANSPORT="sendgrid", SENDGRID_API_URL=mail.url)
+    gemini = FakeGemini(args.llm_latency / 1000, args.llm_error_rate, seed=args.seed).start()
+
+    import app
+    from llm import GeminiBackend
+
+    backend = GeminiBackend(api_key="bench", transport="rest", client_options={"api_endpoint": gemini.url})
+    app.get_message_generator().backend = app.get_digest_generator().backend = backend
+    backend.model  # Load the SDK now, so its import is not counted in the LLM stage (see measure_startup)
+
+    query_calls, llm_calls, render_calls, send_calls = Recorder(), Recorder(), Recorder(), Recorder()
+    backend, transport = app.get_message_generator().backend, app.get_dispatcher().transport
+    backend.generate = llm_calls.wrap(backend.generate)
+    if args.transport == "smtp":
+        # One call per message (or per batch, sent over one connection)
+        transport.send, transport.send_batch = send_calls.wrap(transport.send), send_calls.wrap(transport.send_batch)
+    else:
+        transport.post = send_calls.wrap(transport.post)
+
+    # Each stage on its own, fed with the previous stage's output
+    stages = {}
+    chunks, stages["query"] = measure(
+        lambda: list(query_calls.timed_iter(app.iter_due_task_chunks())),
+        lambda output: sum(map(len, output)), query_calls
+    )
+    messages, stages["llm"] = measure(
+        lambda: [app.process_tasks_with_llm(tasks) for tasks in chunks],
+        lambda output: sum(map(len, output)), llm_calls
+    )
+    # The dependency index is refreshed and the graph loaded on its own, so render times only rendering
+    _, stages["dependencies"] = measure(app.get_dependency_graph, lambda graph: len(graph.slack), Recorder())
+    render = render_calls.wrap(app.render_chunk)
+    emails, stages["render"] = measure(
+        lambda: [email for tasks, found in zip(chunks, messages) for email in render(tasks, found)],
+        len, render_calls
+    )
+    _, stages["send"] = measure(lambda: app.get_dispatcher().dispatch(emails), len, send_calls)
+    # Free the staged outputs before the end-to-end run
+    for output in (chunks, messages, emails):
+        output.clear()
+
+    # The full pipelined notify path; the ledger is empty, so every due task is sent again
+    llm_calls.durations, send_calls.durations = [], []
+    started = time.perf_counter()
+    outcome = app.check_and_notify()
+    seconds = time.perf_counter() - started
+    total = outcome["sent"] + outcome["failed"]
+
+    return {
+        "tasks": args.size,
+        "due_tasks": stages["query"]["items"],
+        "stages": stages,
+        "end_to_end": {
+            **outcome,
+            "seconds": round(seconds, 4),
+            "throughput_per_s": round(total / seconds, 1) if seconds else None,
+            "llm_latency_ms": llm_calls.latency_ms(),
+            "send_latency_ms": send_calls.latency_ms(),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+        },
+        "fakes": {
+            args.transport: {"requests": mail.requests, "errors": mail.errors, "recipients": mail.recipients,
+                             **({"connections": mail.connections} if args.transport == "smtp" else {})},
+            "gemini": {"requests": gemini.requests, "errors": gemini.errors}
+        }
+    }
+
+
+# Function to time cold starts in fresh processes against an empty database: the wall time of
+# importing the app and of a `main.py run-once` with nothing due, and the time the CLI took to
+# get ready (its `startup` log line). Each figure is the median of `runs` starts.
+def measure_startup(workdir, runs=BENCH_STARTUP_RUNS):
+    db_path = os.path.join(workdir, "bench-startup.db")
+    env = {
+        **os.environ,
+        "DB_BACKEND": "sqlite", "DATABASE_PATH": db_path, "LLM_BACKEND": "gemini", "LLM_CACHE_ENABLED": "0",
+        "LOG_FORMAT": "json", "METRICS_PORT": "0", "NOTIFY_MODE": "inline", "NOTIFY_SHARDS": "1"
+    }
+    here = os.path.dirname(os.path.abspath(__file__))
+    commands = {
+        "import_app": [sys.executable, "-c", "import app"],
+        "run_once": [sys.executable, os.path.join(here, "main.py"), "run-once"]
+    }
+    results = {}
+    for name, command in commands.items():
+        wall, ready = [], []
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = subprocess.run(command, env=env, cwd=here, capture_output=True, text=True, check=True).stdout
+            wall.append(time.perf_counter() - started)
+            ready += [event["seconds"] for event in map(json.loads, filter(lambda line: line.startswith("{"), output.splitlines()))
+                      if event["event"] == "startup"]
+        results[name] = {
+            "runs": runs,
+            "wall_seconds": round(sorted(wall)[len(wall) // 2], 4),
+            "ready_seconds": round(sorted(ready)[len(ready) // 2], 4) if ready else None
+        }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the notify path against generated databases and local fake APIs.")
+    parser.add_argument("--sizes", default=BENCH_SIZES, help="Comma-separated task counts, one database each")
+    parser.add_argument("--lead-times", default=BENCH_LEAD_TIMES, help="LEAD_TIMES used for the runs")
+    parser.add_argument("--transport", choices=["sendgrid", "smtp"], default="sendgrid", help="Email transport under test")
+    parser.add_argument("--send-latency", type=float, default=20.0, help="Fake SendGrid (or SMTP relay) latency per request (ms)")
+    parser.add_argument("--send-error-rate", type=float, default=0.0, help="Share of send requests that fail")
+    parser.add_argument("--llm-latency", type=float, default=200.0, help="Fake Gemini latency per request (ms)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of Gemini requests that fail")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the generated data and injected errors")
+    parser.add_argument("--workdir", help="Where generated databases are kept (default: a temporary directory)")
+    parser.add_argument("--output", default=BENCH_OUTPUT, help="JSON results file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.result, "w") as f:
+            json.dump(run_child(args), f)
+        return
+
+    from seed import seed
+    from storage import Storage
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+    os.makedirs(workdir, exist_ok=True)
+    today = datetime.combine(date.today(), datetime.min.time())
+    print("Measuring startup...")
+    startup = measure_startup(workdir)
+    for name, timing in startup.items():
+        print(f"  {name:<10} {timing['wall_seconds']:.3f}s wall" + (f", ready after {timing['ready_seconds']:.3f}s" if timing["ready_seconds"] else ""))
+    runs = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        # A fresh database per size, so the NOTIFICATIONS ledger starts empty
+        db_path = os.path.join(workdir, f"bench-{size}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        storage = Storage("sqlite", db_path)
+        seed(storage, max(10, size // 20), size, args.seed, today)
+        storage.close()
+
+        result_path = db_path + ".json"
+        env = {
+            **os.environ,
+            "DB_BACKEND": "sqlite", "DATABASE_PATH": db_path, "LEAD_TIMES": args.lead_times,
+            "LLM_BACKEND": "gemini", "LLM_CACHE_ENABLED": "0",
+            "SENDGRID_API_KEY": "bench", "GEMINI_API_KEY": "bench"
+        }
+        print(f"Benchmarking {size} tasks...")
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--size", str(size), "--result", result_path,
+             "--transport", args.transport, "--send-latency", str(args.send_latency), "--send-error-rate", str(args.send_error_rate),
+             "--llm-latency", str(args.llm_latency), "--llm-error-rate", str(args.llm_error_rate),
+             "--seed", str(args.seed), "--lead-times", args.lead_times],
+            env=env, stdout=subprocess.DEVNULL, check=True
+        )
+        with open(result_path) as f:
+            run = json.load(f)
+        runs.append(run)
+        e2e = run["end_to_end"]
+        print(f"  {run['due_tasks']} due, {e2e['sent']} sent, {e2e['failed']} failed in {e2e['seconds']}s "
+              f"({e2e['throughput_per_s']}/s, peak RSS {e2e['peak_rss_mb']} MB)")
+        for name, stage in run["stages"].items():
+            print(f"  {name:<12} {stage['seconds']:>9.3f}s {stage['throughput_per_s'] or 0:>10.1f}/s "
+                  f"p50 {stage['latency_ms']['p50']} ms  p99 {stage['latency_ms']['p99']} ms  peak {stage['peak_memory_mb']} MB")
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("child", "size", "result")},
+        "startup": startup,
+        "runs": runs
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
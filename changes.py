@@ -0,0 +1,79 @@
+import os
+import select
+import time
+
+from metrics import log
+from storage import TASK_CHANGES_CHANNEL, StorageError
+
+CHANGE_CAPTURE = os.getenv("CHANGE_CAPTURE", "1") == "1"  # Whether `serve` also handles task changes as they happen
+# How often SQLite is checked for changes; on Postgres, the longest wait when no NOTIFY arrives
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS", "2"))
+# Changes older than this are dropped even if no watcher handled them: by then every contact's
+# daily send slot has come around and checked all of their tasks anyway
+CHANGE_RETENTION_HOURS = int(os.getenv("CHANGE_RETENTION_HOURS", "48"))
+
+LATEST_CHANGE = "SELECT MAX(ID) FROM TASK_CHANGES"
+CLEAR_CHANGES = "DELETE FROM TASK_CHANGES WHERE ID <= ?"
+PRUNE_CHANGES_SQLITE = "DELETE FROM TASK_CHANGES WHERE CHANGED_AT < datetime('now', '-' || ? || ' hours')"
+PRUNE_CHANGES_POSTGRES = "DELETE FROM TASK_CHANGES WHERE CHANGED_AT < LOCALTIMESTAMP - ? * INTERVAL '1 hour'"
+
+
+class ChangeFeed:
+    """
+    The TASK_CHANGES log written by the triggers on TASKS, read by a single consumer.
+    A batch is every change up to latest(), cleared once it has been handled. Changes logged in
+    the meantime wait for the next batch, and a batch that is handled twice after a crash sends
+    nothing twice, because the ledger skips reminders that were already sent.
+    """
+
+    def __init__(self, storage, poll_seconds=CHANGE_POLL_SECONDS):
+        self.storage = storage
+        self.poll_seconds = poll_seconds
+        self._listener = None
+
+    def latest(self):
+        """Return the ID of the newest logged change, or None when the log is empty."""
+        with self.storage.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(LATEST_CHANGE)
+            return cursor.fetchone()[0]
+
+    def clear(self, last_change):
+        with self.storage.connection() as conn:
+            conn.cursor().execute(self.storage.sql(CLEAR_CHANGES), (last_change,))
+
+    def prune(self, max_age_hours=CHANGE_RETENTION_HOURS):
+        """
+        Delete changes logged more than `max_age_hours` ago and return how many there were.
+        Scheduled runs call this, so the log stays bounded when no watcher consumes it.
+        """
+        query = PRUNE_CHANGES_POSTGRES if self.storage.backend == "postgres" else PRUNE_CHANGES_SQLITE
+        with self.storage.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.storage.sql(query), (max_age_hours,))
+            pruned = cursor.rowcount
+        if pruned:
+            log("task_changes_pruned", rows=pruned, max_age_hours=max_age_hours)
+        return pruned
+
+    def wait(self):
+        """Block until a change may have been logged: a NOTIFY on Postgres, the poll interval on SQLite."""
+        if self.storage.backend != "postgres":
+            time.sleep(self.poll_seconds)
+            return
+        try:
+            if self._listener is None:
+                self._listener = self.storage.listen(TASK_CHANGES_CHANNEL)
+            if select.select([self._listener], [], [], self.poll_seconds)[0]:
+                self._listener.poll()
+                self._listener.notifies.clear()
+        except (StorageError, *self.storage.errors) as e:
+            # Changes stay in the log, so a lost connection only delays them until the next poll
+            log("change_listen_error", error=str(e))
+            self.close()
+            time.sleep(self.poll_seconds)
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
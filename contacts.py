@@ -0,0 +1,103 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Validation rules shared by the single-contact form and the bulk importer.
+# A stored phone is a 10-digit number, so it cannot start with 0 (see the CONTACTS CHECK constraint)
+PHONE_PATTERN = r"^[1-9]\d{9}$"
+EMAIL_PATTERN = r"@"
+
+COLUMNS = ["Name", "Phone", "Email", "Address"]
+
+
+def validate_contact(name, phone, email):
+    """Return the list of validation errors for one contact form submission."""
+    name, phone, email = name.strip(), phone.strip(), email.strip()  # Like the importer's columns
+    errors = []
+    if not name: errors.append("Name is required")
+    if not phone: errors.append("Phone is required")
+    if not email: errors.append("Email is required")
+
+    if phone and not re.fullmatch(PHONE_PATTERN, phone):
+        errors.append("Phone must be 10 digits, not starting with 0")
+
+    if email and not re.search(EMAIL_PATTERN, email):
+        errors.append("Invalid email format")
+    return errors
+
+
+def format_phone(phone):
+    """Format a stored 10-digit phone number as (555) 123-4567."""
+    phone_str = str(phone).zfill(10)
+    return f"({phone_str[:3]}) {phone_str[3:6]}-{phone_str[6:]}"
+
+
+def read_contacts_file(uploaded_file):
+    """Read an uploaded CSV or XLSX file into a DataFrame of text columns Name, Phone, Email, Address."""
+    if uploaded_file.name.lower().endswith(".xlsx"):
+        frame = pd.read_excel(uploaded_file, dtype=str)
+    else:
+        frame = pd.read_csv(uploaded_file, dtype=str, keep_default_na=False)
+    frame.columns = [str(column).strip().title() for column in frame.columns]
+    missing = [column for column in COLUMNS[:3] if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    if "Address" not in frame.columns:
+        frame["Address"] = ""
+    return frame[COLUMNS].fillna("")
+
+
+def validate_contacts(frame):
+    """
+    Apply the form's rules to every row at once and return a report DataFrame with
+    the file row number, cleaned values, a Status ('Valid' or 'Rejected') and a Reason.
+    Rows repeating a phone or email seen earlier in the file are rejected too.
+    """
+    name = frame["Name"].astype(str).str.strip()
+    phone = frame["Phone"].astype(str).str.strip().str.replace(r"\.0$", "", regex=True)  # Excel numbers
+    email = frame["Email"].astype(str).str.strip()
+    address = frame["Address"].astype(str).str.strip()
+
+    checks = [
+        (name == "", "Name is required"),
+        (phone == "", "Phone is required"),
+        (email == "", "Email is required"),
+        ((phone != "") & ~phone.str.fullmatch(PHONE_PATTERN), "Phone must be 10 digits, not starting with 0"),
+        ((email != "") & ~email.str.contains(EMAIL_PATTERN, regex=True), "Invalid email format"),
+        ((phone != "") & phone.duplicated(), "Duplicate phone in file"),
+        ((email != "") & email.str.lower().duplicated(), "Duplicate email in file"),
+    ]
+    reason = pd.Series("", index=frame.index)
+    for failed, message in checks:
+        reason = reason + np.where(failed, message + "; ", "")
+    reason = reason.str.rstrip("; ")
+
+    return pd.DataFrame({
+        "Row": frame.index + 2,  # Line number in the file, after the header
+        "Name": name,
+        "Phone": phone,
+        "Email": email,
+        "Address": address.where(address != "", None),
+        "Status": np.where(reason == "", "Valid", "Rejected"),
+        "Reason": reason,
+    })
+
+
+def import_contacts(report, storage):
+    """
+    Load the valid rows of a validation report through the storage layer's bulk import
+    and return the report with each row marked Accepted (with its new ID) or Rejected.
+    """
+    valid = report[report["Status"] == "Valid"]
+    outcomes = storage.import_contacts(
+        zip(valid["Row"], valid["Name"], valid["Phone"].astype("int64"), valid["Email"], valid["Address"])
+    )
+    report = report.copy()
+    report["ID"] = report["Row"].map({row: contact_id for row, (_, contact_id, _) in outcomes.items()}).astype("Int64")
+    imported = report["Row"].map({row: status for row, (status, _, _) in outcomes.items()})
+    reasons = report["Row"].map({row: reason for row, (_, _, reason) in outcomes.items()})
+    is_valid = report["Status"] == "Valid"
+    report.loc[is_valid, "Status"] = imported[is_valid]
+    report.loc[is_valid, "Reason"] = reasons[is_valid]
+    return report
@@ -0,0 +1,318 @@
+import argparse
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+
+from metrics import STAGE_SECONDS, log
+from storage import TASKS_UPDATED_MARK, StorageError, get_storage
+
+# Reminders for tasks that others wait on are escalated when the critical path through them
+# has less than this many hours of slack (negative slack: the work after them will be late)
+ESCALATION_SLACK_HOURS = float(os.getenv("ESCALATION_SLACK_HOURS", "0"))
+# Seconds a loaded dependency graph is reused before the index is refreshed and the graph reloaded
+DEPENDENCY_REFRESH_SECONDS = int(os.getenv("DEPENDENCY_REFRESH_SECONDS", "300"))
+# Each refresh also re-checks tasks updated this many seconds before the previous one (see TASKS_UPDATED_MARK)
+DEPENDENCY_OVERLAP_SECONDS = int(os.getenv("DEPENDENCY_OVERLAP_SECONDS", "300"))
+
+# Text in TASKS.DEPENDENCIES meaning "no dependencies"
+EMPTY_REFERENCES = {"", "none", "n/a", "na", "nil", "-"}
+# 'Project Planning' and "UI Design"; without quotes, titles are separated by commas, semicolons or lines
+QUOTED = re.compile(r"""(?<!\w)['"‘“]([^'"‘’“”]+)['"’”](?!\w)""")
+SEPARATORS = re.compile(r"[,;\n]")
+
+DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*(minute|min|hour|hr|h|day|d|week|wk|w|month)s?\b", re.IGNORECASE)
+UNIT_HOURS = {"minute": 1 / 60, "min": 1 / 60, "hour": 1, "hr": 1, "h": 1, "day": 24, "d": 24,
+              "week": 168, "wk": 168, "w": 168, "month": 720}
+
+# Tasks added or edited since they were last indexed (title or dependency text differs). The first
+# refresh in a process compares every task; later ones only those added or updated since (CHANGED_SINCE),
+# found through the primary key and the UPDATED_AT index.
+CHANGED_TASKS = """
+SELECT t.ID, t.DEPENDENCIES
+FROM TASKS t
+LEFT JOIN TASK_DEPENDENCY_SOURCES s ON s.TASK_ID = t.ID
+WHERE (s.TASK_ID IS NULL OR s.TITLE <> t.TITLE OR COALESCE(s.DEPENDENCIES, '') <> COALESCE(t.DEPENDENCIES, ''))
+"""
+CHANGED_SINCE = "AND (t.ID > ? OR t.UPDATED_AT >= ?)"
+
+# Once changed tasks are indexed, every task has a source row: more source rows than tasks means deletions
+INDEX_TOTALS = """
+SELECT (SELECT COUNT(*) FROM TASKS), (SELECT COUNT(*) FROM TASK_DEPENDENCY_SOURCES), (SELECT MAX(ID) FROM TASKS)
+"""
+
+DELETED_TASKS = """
+SELECT s.TASK_ID FROM TASK_DEPENDENCY_SOURCES s
+WHERE NOT EXISTS (SELECT 1 FROM TASKS t WHERE t.ID = s.TASK_ID)
+"""
+
+SAVE_SOURCE = """
+INSERT INTO TASK_DEPENDENCY_SOURCES (TASK_ID, TITLE, DEPENDENCIES)
+SELECT ID, TITLE, DEPENDENCIES FROM TASKS WHERE ID = ?
+"""
+
+# A reference points at the first task with that title. Edges still unresolved, or whose task was
+# since deleted or renamed, are resolved again; the title index makes each lookup a single probe.
+# (REFERENCE is already lower case: LOWER() only drops its column affinity, which would stop
+# SQLite from using the expression index.)
+RESOLVE_EDGES = """
+UPDATE TASK_DEPENDENCIES
+SET DEPENDS_ON = (SELECT MIN(t.ID) FROM TASKS t WHERE LOWER(TRIM(t.TITLE)) = LOWER(TASK_DEPENDENCIES.REFERENCE))
+WHERE DEPENDS_ON IS NULL
+   OR NOT EXISTS (
+       SELECT 1 FROM TASKS t
+       WHERE t.ID = TASK_DEPENDENCIES.DEPENDS_ON AND LOWER(TRIM(t.TITLE)) = LOWER(TASK_DEPENDENCIES.REFERENCE)
+   )
+"""
+
+# Edges between two open tasks, with what the schedule needs about both ends
+OPEN_EDGES = """
+SELECT d.TASK_ID, t.DEADLINE, t.ESTIMATED_TIME, d.DEPENDS_ON, p.DEADLINE, p.ESTIMATED_TIME
+FROM TASK_DEPENDENCIES d
+JOIN TASKS t ON t.ID = d.TASK_ID
+JOIN TASKS p ON p.ID = d.DEPENDS_ON
+WHERE t.STATUS NOT IN ('Completed', 'Reviewed & Approved')
+  AND p.STATUS NOT IN ('Completed', 'Reviewed & Approved')
+  AND d.TASK_ID <> d.DEPENDS_ON
+"""
+
+
+def reference_key(title):
+    """Normalized form of a task title, as matched against LOWER(TRIM(TITLE))."""
+    return title.strip().lower()[:255]
+
+
+def parse_dependencies(text):
+    """Return the normalized task titles listed in a DEPENDENCIES value, in order and without repeats."""
+    if not text:
+        return []
+    parts = QUOTED.findall(text) or SEPARATORS.split(text)
+    keys = []
+    for part in parts:
+        key = reference_key(part)
+        if key not in EMPTY_REFERENCES and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def duration_hours(text):
+    """Hours of work in an ESTIMATED_TIME value such as '3 days' or '1 week 2 days'; 0 if unreadable."""
+    return sum(float(amount) * UNIT_HOURS[unit.lower()] for amount, unit in DURATION.findall(text or ""))
+
+
+def as_datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def format_hours(hours):
+    return f"{round(hours)} hour(s)" if hours < 48 else f"{round(hours / 24)} day(s)"
+
+
+class DependencyIndex:
+    """
+    Maintains the TASK_DEPENDENCIES edge table from TASKS.DEPENDENCIES. Each refresh parses
+    only the tasks added, edited or deleted since the previous one.
+    """
+
+    def __init__(self, storage, overlap=DEPENDENCY_OVERLAP_SECONDS):
+        self.storage = storage
+        self.overlap = overlap
+        self._last_id = None  # Largest task ID seen; None until the first refresh
+        self._since = None
+
+    def _many(self, cursor, query, rows):
+        if not rows:
+            return
+        if self.storage.backend == "postgres":
+            from psycopg2.extras import execute_batch
+
+            execute_batch(cursor, self.storage.sql(query), rows, page_size=1000)
+        else:
+            cursor.executemany(query, rows)
+
+    def refresh(self):
+        """Bring the index up to date; return the number of tasks that were (re-)indexed or removed."""
+        with self.storage.connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.storage.sql(TASKS_UPDATED_MARK[self.storage.backend]), (self.overlap,))
+            since = cursor.fetchone()[0]
+            if self._last_id is None:
+                cursor.execute(CHANGED_TASKS)
+            else:
+                cursor.execute(self.storage.sql(CHANGED_TASKS + CHANGED_SINCE), (self._last_id, self._since))
+            changed = cursor.fetchall()
+            stale = [(task_id,) for task_id, _ in changed]
+            self._remove(cursor, stale)
+            self._many(cursor, "INSERT INTO TASK_DEPENDENCIES (TASK_ID, REFERENCE) VALUES (?, ?)", [
+                (task_id, reference) for task_id, text in changed for reference in parse_dependencies(text)
+            ])
+            self._many(cursor, SAVE_SOURCE, stale)
+            cursor.execute(INDEX_TOTALS)
+            tasks, sources, last_id = cursor.fetchone()
+            if sources != tasks:
+                cursor.execute(DELETED_TASKS)
+                deleted = cursor.fetchall()
+                self._remove(cursor, deleted)
+                stale += deleted
+            if stale:
+                cursor.execute(RESOLVE_EDGES)
+        self._last_id, self._since = last_id or 0, since
+        return len(stale)
+
+    def _remove(self, cursor, task_ids):
+        self._many(cursor, "DELETE FROM TASK_DEPENDENCIES WHERE TASK_ID = ?", task_ids)
+        self._many(cursor, "DELETE FROM TASK_DEPENDENCY_SOURCES WHERE TASK_ID = ?", task_ids)
+
+    def graph(self, now=None):
+        """Load the open part of the index as a DependencyGraph."""
+        with self.storage.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(OPEN_EDGES)
+            rows = cursor.fetchall()
+        nodes, edges = {}, []
+        for task_id, deadline, estimate, depends_on, dependency_deadline, dependency_estimate in rows:
+            nodes[task_id] = (as_datetime(deadline), duration_hours(estimate))
+            nodes[depends_on] = (as_datetime(dependency_deadline), duration_hours(dependency_estimate))
+            edges.append((task_id, depends_on))
+        return DependencyGraph(nodes, edges, now or datetime.now())
+
+
+class DependencyGraph:
+    """
+    Open tasks linked by their open dependencies, with critical-path timings computed once on load.
+    Times are calendar hours from `now`: a task can finish no earlier than its dependencies plus its
+    own estimate, and must finish early enough for everything waiting on it to meet its deadline.
+    Slack is the difference; tasks outside the graph neither wait on nor block open work.
+    """
+
+    def __init__(self, nodes, edges, now):
+        self.now = now
+        self.dependencies = defaultdict(list)  # task -> open tasks it waits for
+        self.dependents = defaultdict(list)  # task -> open tasks waiting for it
+        for task_id, depends_on in edges:
+            self.dependencies[task_id].append(depends_on)
+            self.dependents[depends_on].append(task_id)
+        self.earliest_finish, self.latest_finish, self.slack = {}, {}, {}
+        self.cyclic = set()
+        self._schedule(nodes)
+
+    def _schedule(self, nodes):
+        waiting = {task_id: len(self.dependencies[task_id]) for task_id in nodes}
+        ready = deque(task_id for task_id, count in waiting.items() if not count)
+        order = []
+        while ready:
+            task_id = ready.popleft()
+            order.append(task_id)
+            for dependent in self.dependents[task_id]:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    ready.append(dependent)
+        # Tasks on a dependency cycle can never start; they get no timings
+        self.cyclic = set(nodes) - set(order)
+
+        for task_id in order:
+            start = max([self.now] + [self.earliest_finish[d] for d in self.dependencies[task_id]])
+            self.earliest_finish[task_id] = start + timedelta(hours=nodes[task_id][1])
+        for task_id in reversed(order):
+            self.latest_finish[task_id] = min(
+                [nodes[task_id][0]]
+                + [self.latest_finish[d] - timedelta(hours=nodes[d][1]) for d in self.dependents[task_id] if d in self.latest_finish]
+            )
+            self.slack[task_id] = (self.latest_finish[task_id] - self.earliest_finish[task_id]).total_seconds() / 3600
+
+    def blocked(self):
+        """Open tasks waiting on at least one open dependency."""
+        return sorted(task_id for task_id, dependencies in self.dependencies.items() if dependencies)
+
+    def transitive_dependents(self, task_id):
+        """Every open task that waits, directly or through others, on `task_id`."""
+        seen, queue = set(), deque(self.dependents.get(task_id, ()))
+        while queue:
+            dependent = queue.popleft()
+            if dependent not in seen:
+                seen.add(dependent)
+                queue.extend(self.dependents.get(dependent, ()))
+        return seen
+
+    def critical_path(self):
+        """The chain of open tasks with the least slack, from a task nothing blocks to its last dependent."""
+        roots = [task_id for task_id in self.slack if not self.dependencies.get(task_id)]
+        if not roots:
+            return []
+        path = [min(roots, key=self.slack.get)]
+        while True:
+            nxt = [d for d in self.dependents.get(path[-1], ()) if d in self.slack]
+            if not nxt:
+                return path
+            path.append(min(nxt, key=self.slack.get))
+
+    def escalation(self, task_id, threshold=ESCALATION_SLACK_HOURS):
+        """A note for the reminder of a task that blocks work at risk of being late, or ''."""
+        slack = self.slack.get(task_id)
+        if slack is None or slack >= threshold or not self.dependents.get(task_id):
+            return ""
+        waiting = len(self.transitive_dependents(task_id))
+        if slack < 0:
+            return (f"{waiting} other task(s) are waiting on this one and will miss their deadlines "
+                    f"by about {format_hours(-slack)} unless it is finished early.")
+        return f"{waiting} other task(s) are waiting on this one, with only {format_hours(slack)} of slack left."
+
+
+EMPTY_GRAPH = DependencyGraph({}, [], datetime.now())
+
+_graph = (None, EMPTY_GRAPH)  # (time.monotonic() when loaded, graph); never loaded yet
+_index = None
+_graph_lock = threading.Lock()
+
+
+def get_dependency_graph(storage=None, max_age=DEPENDENCY_REFRESH_SECONDS):
+    """
+    Return the dependency graph, refreshing the index and reloading it when older than `max_age`.
+    Escalation is best effort: if the database fails, the previous graph is kept.
+    """
+    global _graph, _index
+    with _graph_lock:
+        loaded_at, graph = _graph
+        if loaded_at is not None and time.monotonic() - loaded_at < max_age:
+            return graph
+        storage = storage or get_storage()
+        if _index is None or _index.storage is not storage:
+            _index = DependencyIndex(storage)
+        try:
+            with STAGE_SECONDS.time(stage="dependencies"):
+                indexed = _index.refresh()
+                graph = _index.graph()
+        except StorageError as e:
+            log("dependency_graph_error", error=str(e))
+        else:
+            log("dependency_graph", indexed=indexed, tasks=len(graph.slack), blocked=len(graph.blocked()),
+                cyclic=len(graph.cyclic))
+        _graph = (time.monotonic(), graph)
+        return graph
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the task dependency index and query it.")
+    parser.add_argument("--blocked", action="store_true", help="list open tasks waiting on open dependencies")
+    parser.add_argument("--dependents", type=int, metavar="TASK_ID", help="list open tasks that wait on a task")
+    parser.add_argument("--critical-path", action="store_true", help="show the chain of tasks with the least slack")
+    args = parser.parse_args()
+
+    storage = get_storage()
+    storage.create_schema()
+    index = DependencyIndex(storage)
+    started = time.perf_counter()
+    print(f"Indexed {index.refresh()} changed task(s) in {time.perf_counter() - started:.2f}s")
+    graph = index.graph()
+    print(f"{len(graph.slack)} open task(s) linked by dependencies, {len(graph.blocked())} blocked, "
+          f"{len(graph.cyclic)} on dependency cycles")
+    if args.blocked:
+        for task_id in graph.blocked():
+            print(f"Task {task_id} waits on {', '.join(map(str, graph.dependencies[task_id]))}")
+    if args.dependents is not None:
+        print(f"Task {args.dependents} blocks: {', '.join(map(str, sorted(graph.transitive_dependents(args.dependents)))) or 'nothing'}")
+    if args.critical_path:
+        for task_id in graph.critical_path():
+            print(f"Task {task_id}: slack {graph.slack[task_id]:.1f}h, latest finish {graph.latest_finish[task_id]:%Y-%m-%d %H:%M}")
@@ -0,0 +1,472 @@
+import http.client
+import json
+import os
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.header import Header
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr, formatdate, make_msgid
+from urllib.parse import urlsplit
+
+from metrics import EMAILS, RETRIES, STAGE_SECONDS
+from ratelimit import Retrier, get_limiter, parse_retry_after
+
+DEFAULT_SENDER = os.getenv("SENDER_EMAIL", "srepuriya24@gmail.com")  # Replace with your verified sender email
+SENDGRID_API_URL = os.getenv("SENDGRID_API_URL", "https://api.sendgrid.com")
+SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "16"))
+SEND_MODE = os.getenv("SEND_MODE", "single")  # "single" (one request per email) or "batch"
+SEND_BATCH_SIZE = int(os.getenv("SEND_BATCH_SIZE", "1000"))  # SendGrid allows up to 1000 personalizations per request
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "sendgrid")  # "sendgrid" (HTTP API) or "smtp" (a relay, SMTP_* settings)
+
+# SMTP relay settings (the password is never logged)
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "starttls")  # "starttls", "ssl" (implicit TLS, usually port 465) or "none"
+SMTP_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MESSAGES_PER_CONNECTION", "100"))  # Relays often cap messages per session
+
+
+@dataclass
+class Email:
+    """A rendered notification ready to hand to a transport."""
+    to: str
+    subject: str
+    plain_text: str
+    html: str
+    to_name: str = ""
+    key: object = None  # Caller's identifier (e.g. task title), echoed back in the SendResult
+    substitutions: dict = None  # Tag -> value, applied by the provider in batch mode or locally otherwise
+    template: object = None  # Compiled template (see templates.py) that renders the substitutions locally in one pass
+
+    def template_key(self):
+        """Emails sharing a template key can go out together in one batched request."""
+        return (self.subject, self.plain_text, self.html)
+
+    def rendered(self):
+        """Return a copy with the substitution tags filled in."""
+        if not self.substitutions:
+            return self
+        if self.template is not None:
+            subject, plain_text, html = self.template.render(self.substitutions)
+            return Email(self.to, subject, plain_text, html, self.to_name, self.key)
+        subject, plain_text, html = self.subject, self.plain_text, self.html
+        for tag, value in self.substitutions.items():
+            subject = subject.replace(tag, value)
+            plain_text = plain_text.replace(tag, value)
+            html = html.replace(tag, value)
+        return Email(self.to, subject, plain_text, html, self.to_name, self.key)
+
+
+@dataclass
+class SendResult:
+    """Outcome of a single message handed to a transport."""
+    email: Email
+    status_code: int = None
+    message_id: str = None
+    error: str = None
+    elapsed: float = None  # Seconds spent on the request that carried this message
+    retry_after: float = None  # Provider's Retry-After hint on a throttled or failed request
+
+    @property
+    def ok(self):
+        return self.error is None and self.status_code is not None and 200 <= self.status_code < 300
+
+
+class SendGridTransport:
+    """
+    Posts messages to the SendGrid v3 mail endpoint.
+    Each worker thread keeps one keep-alive HTTPS connection open and reuses it for
+    every send, so the TLS handshake is paid once per thread instead of once per email.
+    """
+
+    provider = "sendgrid"
+
+    def __init__(self, api_key, base_url=SENDGRID_API_URL, from_email=DEFAULT_SENDER, timeout=30):
+        parts = urlsplit(base_url)
+        self.api_key = api_key
+        self.from_email = from_email
+        self.timeout = timeout
+        self._scheme = parts.scheme or "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path.rstrip("/") or "") + "/v3/mail/send"
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn_cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+            conn = conn_cls(self._host, self._port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+
+    def build_message(self, email):
+        from sendgrid.helpers.mail import Mail
+
+        email = email.rendered()
+        return Mail(
+            from_email=self.from_email,
+            to_emails=email.to,
+            subject=email.subject,
+            plain_text_content=email.plain_text,
+            html_content=email.html
+        )
+
+    def post(self, payload):
+        """POST a v3 mail payload and return (status_code, headers, body)."""
+        body = json.dumps(payload)
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        # A pooled connection may have been closed by the server while idle; retry once on a fresh one
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", self._path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                return response.status, dict(response.getheaders()), data
+            except (http.client.HTTPException, ConnectionError):
+                self._drop_connection()
+                if attempt:
+                    raise
+                RETRIES.inc(kind="send_reconnect")
+
+    def build_batch_message(self, emails):
+        """Build one request carrying a personalization (recipient + substitutions) per email."""
+        from sendgrid.helpers.mail import Mail, Personalization, Substitution, To
+
+        template = emails[0]
+        message = Mail(
+            from_email=self.from_email,
+            subject=template.subject,
+            plain_text_content=template.plain_text,
+            html_content=template.html
+        )
+        for email in emails:
+            personalization = Personalization()
+            personalization.add_to(To(email.to, email.to_name or None))
+            for tag, value in (email.substitutions or {}).items():
+                personalization.add_substitution(Substitution(tag, value))
+            message.add_personalization(personalization)
+        return message
+
+    def _deliver(self, emails, message):
+        started = time.perf_counter()
+        try:
+            status, headers, data = self.post(message.get())
+        except Exception as e:
+            status, headers, error = None, {}, str(e)
+        else:
+            error = None if 200 <= status < 300 else data.decode("utf-8", "replace")
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage="send")
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        return [SendResult(email, status, headers.get("X-Message-Id"), error, elapsed, retry_after) for email in emails]
+
+    def send(self, email):
+        return self._deliver([email], self.build_message(email))[0]
+
+    def send_batch(self, emails):
+        """Send emails that share a template key as a single API call."""
+        return self._deliver(emails, self.build_batch_message(emails))
+
+    @staticmethod
+    def classify(result, error):
+        return classify_send(result, error)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+@dataclass
+class SMTPSession:
+    """An open, authenticated SMTP connection and the number of messages sent over it."""
+    conn: smtplib.SMTP
+    sent: int = 0
+
+
+class SMTPTransport:
+    """
+    Sends messages through an SMTP relay over a pool of open connections, each upgraded to TLS
+    (STARTTLS, or implicit TLS with security="ssl") and logged in once, then reused for many
+    messages. A connection the server dropped while idle is replaced and the message sent again
+    once. Connections are renewed after `messages_per_connection` messages, and at most
+    `pool_size` idle ones are kept.
+    """
+
+    provider = "smtp"
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, username=SMTP_USERNAME, password=SMTP_PASSWORD,
+                 security=SMTP_SECURITY, from_email=DEFAULT_SENDER, timeout=30, pool_size=SEND_CONCURRENCY,
+                 messages_per_connection=SMTP_MESSAGES_PER_CONNECTION, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.security = security
+        self.from_email = from_email
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.messages_per_connection = messages_per_connection
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._domain = from_email.rpartition("@")[2] or None
+        self._idle = []  # Most recently used last, so busy periods keep reusing warm connections
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.security == "ssl":
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=self.ssl_context)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.security == "starttls":
+                conn.starttls(context=self.ssl_context)
+            if self.username:
+                conn.login(self.username, self.password or "")
+        except BaseException:
+            conn.close()
+            raise
+        return SMTPSession(conn)
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, session):
+        if session.sent < self.messages_per_connection:
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(session)
+                    return
+        self._quit(session)
+
+    @staticmethod
+    def _quit(session):
+        try:
+            session.conn.quit()
+        except (smtplib.SMTPException, OSError):
+            session.conn.close()
+
+    def build_message(self, email):
+        """Build a multipart/alternative message (the compat32 classes build it several times faster than EmailMessage)."""
+        email = email.rendered()
+        message = MIMEMultipart("alternative")
+        message["From"] = self.from_email
+        message["To"] = formataddr((email.to_name, email.to)) if email.to_name else email.to
+        message["Subject"] = email.subject if email.subject.isascii() else Header(email.subject, "utf-8")
+        message["Date"] = formatdate(usegmt=True)
+        message["Message-ID"] = make_msgid(domain=self._domain)
+        message.attach(MIMEText(email.plain_text, "plain", "utf-8"))
+        message.attach(MIMEText(email.html, "html", "utf-8"))
+        return message
+
+    def _deliver(self, emails):
+        """Send each email in turn over one pooled connection and return a SendResult per email."""
+        results, session = [], None
+        try:
+            for email in emails:
+                message = self.build_message(email)
+                data = message.as_bytes()
+                started = time.perf_counter()
+                status = error = None
+                for attempt in range(2):
+                    try:
+                        session = session or self._acquire()
+                        session.conn.sendmail(self.from_email, [email.to], data)
+                        session.sent += 1
+                        status = 250
+                        if session.sent >= self.messages_per_connection:
+                            # Renewed within a batch too, before the relay's per-session limit is reached
+                            self._release(session)
+                            session = None
+                        break
+                    except smtplib.SMTPRecipientsRefused as e:
+                        status, reply = next(iter(e.recipients.values()))
+                        error = reply.decode("utf-8", "replace")
+                        break
+                    except smtplib.SMTPResponseException as e:
+                        status, error = e.smtp_code, e.smtp_error.decode("utf-8", "replace")
+                        if status == 421 and session is not None:  # The server is closing the connection
+                            session.conn.close()
+                            session = None
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        # Dropped, timed out or refused: retry once on a fresh connection
+                        if session is not None:
+                            session.conn.close()
+                            session = None
+                        if attempt:
+                            error = str(e)
+                        else:
+                            RETRIES.inc(kind="send_reconnect")
+                elapsed = time.perf_counter() - started
+                STAGE_SECONDS.observe(elapsed, stage="send")
+                results.append(SendResult(email, status, message["Message-ID"] if status == 250 else None, error, elapsed))
+        finally:
+            if session is not None:
+                self._release(session)
+        return results
+
+    def send(self, email):
+        return self._deliver([email])[0]
+
+    def send_batch(self, emails):
+        """Send emails one after another over the same connection; SMTP has no multi-recipient personalization."""
+        return self._deliver(emails)
+
+    @staticmethod
+    def classify(result, error):
+        return classify_smtp(result, error)
+
+    def close(self):
+        with self._lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            self._quit(session)
+
+
+def make_transport(name=EMAIL_TRANSPORT, sendgrid_api_key=None):
+    if name == "smtp":
+        return SMTPTransport()
+    return SendGridTransport(sendgrid_api_key)
+
+
+# Function to decide whether a send should be retried: connection errors, 429s and 5xx are
+def classify_send(result, error):
+    if error is not None:
+        return None
+    first = result[0] if isinstance(result, list) else result
+    if first.status_code is None or first.status_code == 429 or first.status_code >= 500:
+        return first.status_code == 429, first.retry_after
+    return None
+
+
+# SMTP replies meaning the relay is shedding load (closing the session, over a rate or queue limit):
+# only these slow the shared rate limiter down
+SMTP_THROTTLE_CODES = {421, 450, 451, 452}
+
+# Function to decide whether an SMTP send should be retried: dropped connections and 4xx replies
+# are, 5xx replies are permanent. Only the throttling replies above also back off the rate limiter;
+# other 4xx (greylisting, a busy mailbox) are retried like a dropped connection, up to
+# RETRY_MAX_ATTEMPTS. A batch is only retried when none of its messages got through, so no
+# message is sent twice.
+def classify_smtp(result, error):
+    if error is not None:
+        return None
+    results = result if isinstance(result, list) else [result]
+    if all(r.status_code is None or 400 <= r.status_code < 500 for r in results):
+        return any(r.status_code in SMTP_THROTTLE_CODES for r in results), None
+    return None
+
+
+def count_results(results):
+    results = results if isinstance(results, list) else [results]
+    failed = sum(1 for result in results if not result.ok)
+    if failed:
+        EMAILS.inc(failed, status="failed")
+    if len(results) > failed:
+        EMAILS.inc(len(results) - failed, status="sent")
+    return results
+
+
+class EmailDispatcher:
+    """
+    Sends emails concurrently through a shared transport on a bounded thread pool.
+    At most `max_workers` requests are in flight at once; results come back per message.
+    Requests go through the provider's shared rate limiter, and throttled or failed requests
+    are retried with backoff before their result is reported. In batch mode, emails sharing a template are grouped into requests of up to
+    `batch_size` recipients using the transport's `send_batch`.
+
+    A transport is any object with `send(email)`, `send_batch(emails)`, `close()`, a `provider`
+    name (whose rate limiter it uses) and `classify(result, error)` for the retrier.
+    """
+
+    def __init__(self, transport, max_workers=SEND_CONCURRENCY, mode=SEND_MODE, batch_size=SEND_BATCH_SIZE, retrier=None):
+        self.transport = transport
+        self.max_workers = max_workers
+        self.mode = mode
+        self.batch_size = batch_size
+        self.retrier = retrier or Retrier(get_limiter(transport.provider), transport.classify)
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="send")
+        return self._pool
+
+    def _stream(self, func, work_items):
+        """
+        Yield func(item) for each work item, in order, keeping at most 2 * max_workers in flight.
+        Work items are pulled lazily, so a generator upstream is only consumed as sends complete.
+        """
+        pool = self._executor()
+        in_flight = deque()
+        for item in work_items:
+            if len(in_flight) >= self.max_workers * 2:
+                yield in_flight.popleft().result()
+            in_flight.append(self.retrier.submit(pool, func, item))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def batches(self, emails):
+        """Group emails by template key into chunks of at most batch_size."""
+        groups = {}
+        for email in emails:
+            group = groups.setdefault(email.template_key(), [])
+            if len(group) == self.batch_size:
+                yield group
+                group = groups[email.template_key()] = []
+            group.append(email)
+        for group in groups.values():
+            if group:
+                yield group
+
+    def dispatch_iter(self, emails):
+        """Send emails from any iterable, yielding a SendResult for each as its request completes."""
+        if self.mode != "batch":
+            for result in self._stream(self.transport.send, emails):
+                yield from count_results(result)
+            return
+        for results in self._stream(self.transport.send_batch, self.batches(emails)):
+            yield from count_results(results)
+
+    def dispatch(self, emails):
+        """Send every email and return a list of SendResult in input order."""
+        if self.mode != "batch":
+            return list(self.dispatch_iter(emails))
+        emails = list(emails)
+        by_id = {id(result.email): result for result in self.dispatch_iter(emails)}
+        return [by_id[id(email)] for email in emails]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.transport.close()
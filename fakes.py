@@ -0,0 +1,217 @@
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm import StubBackend
+
+
+class FakeServer:
+    """
+    Local HTTP server standing in for an external API in benchmarks and load tests.
+    Every request waits `latency` seconds and fails with `error_status` at `error_rate`.
+    With `rate_limit`, requests beyond that many per second get a 429 with Retry-After.
+    """
+
+    error_status = 500
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None, rate_limit=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self._window = (0, 0)  # (second, requests accepted in it)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def handle(self, path, body):
+        """Return (status, headers, body) for a successful request."""
+        raise NotImplementedError
+
+    def error_body(self):
+        return {"errors": [{"message": "Injected failure"}]}
+
+    def _respond(self, path, body):
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit:
+                second = int(time.time())
+                accepted = self._window[1] if self._window[0] == second else 0
+                if accepted >= self.rate_limit:
+                    self.throttled += 1
+                    headers = {"Content-Type": "application/json", "Retry-After": "1"}
+                    return 429, headers, json.dumps(self.error_body()).encode()
+                self._window = (second, accepted + 1)
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            error = json.dumps(self.error_body()).encode()
+            return self.error_status, {"Content-Type": "application/json"}, error
+        return self.handle(path, body)
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+                status, headers, data = fake._respond(self.path, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FakeSendGrid(FakeServer):
+    """Accepts v3 mail/send requests with 202 and an X-Message-Id, counting recipients."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recipients = 0
+
+    def handle(self, path, body):
+        recipients = sum(len(p.get("to", [])) for p in body.get("personalizations", []))
+        with self._lock:
+            self.recipients += recipients
+            message_id = f"fake-{self.requests}"
+        return 202, {"X-Message-Id": message_id}, b""
+
+
+class FakeGemini(FakeServer):
+    """
+    Answers generateContent calls (REST transport) with the StubBackend's structured response,
+    so prompts are parsed exactly as they would be from the real model.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stub = StubBackend()
+
+    def error_body(self):
+        return {"error": {"code": self.error_status, "message": "Injected failure", "status": "INTERNAL"}}
+
+    def handle(self, path, body):
+        prompt = "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        response = {
+            "candidates": [{
+                "content": {"parts": [{"text": self._stub.generate(prompt)}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }]
+        }
+        return 200, {"Content-Type": "application/json"}, json.dumps(response).encode()
+
+
+class FakeSMTP:
+    """
+    Local SMTP sink standing in for a relay (no TLS or AUTH, like SMTP_SECURITY=none).
+    Each message waits `latency` seconds after its data and is refused with a 451 at `error_rate`.
+    Counts connections, so connection reuse by the transport shows up in the results.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.recipients = 0
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _accept(self, recipients):
+        """Return the reply to a message's end of data."""
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+            if not failed:
+                self.recipients += recipients
+            message_number = self.requests
+        if self.latency:
+            time.sleep(self.latency)
+        return b"451 4.3.0 Injected failure" if failed else f"250 2.0.0 Ok: queued as fake-{message_number}".encode()
+
+    def start(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True  # Replies are small writes; don't hold them back for ACKs
+
+            def reply(self, line):
+                self.wfile.write(line + b"\r\n")
+
+            def handle(self):
+                with fake._lock:
+                    fake.connections += 1
+                self.reply(b"220 fake-smtp ESMTP")
+                recipients = 0
+                for line in self.rfile:
+                    command = line.strip().split(b" ", 1)[0].upper()
+                    if command == b"EHLO":
+                        self.reply(b"250-fake-smtp\r\n250 8BITMIME")
+                    elif command in (b"HELO", b"MAIL", b"NOOP"):
+                        self.reply(b"250 Ok")
+                    elif command == b"RCPT":
+                        recipients += 1
+                        self.reply(b"250 Ok")
+                    elif command == b"RSET":
+                        recipients = 0
+                        self.reply(b"250 Ok")
+                    elif command == b"DATA":
+                        self.reply(b"354 End data with <CR><LF>.<CR><LF>")
+                        for data in self.rfile:
+                            if data == b".\r\n":
+                                break
+                        self.reply(fake._accept(recipients))
+                        recipients = 0
+                    elif command == b"QUIT":
+                        self.reply(b"221 Bye")
+                        return
+                    else:
+                        self.reply(b"502 Command not implemented")
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,65 @@
+import threading
+
+# Anti-join used by the due-task query: skip reminders already recorded as sent
+NOT_YET_SENT = """
+NOT EXISTS (
+    SELECT 1 FROM NOTIFICATIONS n
+    WHERE n.TASK_ID = t.ID AND n.LEAD_DAYS = w.LEAD_DAYS AND n.DEADLINE = t.DEADLINE
+      AND n.RECIPIENT = c.EMAIL AND n.STATUS = 'Sent'
+)
+"""
+
+UPSERT_NOTIFICATION = """
+INSERT INTO NOTIFICATIONS (TASK_ID, LEAD_DAYS, DEADLINE, RECIPIENT, STATUS, PROVIDER_MESSAGE_ID, ERROR)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (TASK_ID, LEAD_DAYS, DEADLINE, RECIPIENT) DO UPDATE SET
+    STATUS = excluded.STATUS,
+    PROVIDER_MESSAGE_ID = excluded.PROVIDER_MESSAGE_ID,
+    ERROR = excluded.ERROR,
+    UPDATED_AT = CURRENT_TIMESTAMP
+"""
+
+
+def task_keys(key):
+    """The (task_id, lead_days, deadline) keys an email covers: one, or several for a digest."""
+    return key if isinstance(key, list) else [key]
+
+
+class NotificationLedger:
+    """
+    Records the outcome of each reminder in the NOTIFICATIONS table.
+    Writes are committed every `flush_every` results, so a crashed run loses at most
+    one batch of bookkeeping and the next run resumes from what was recorded.
+    Results must carry a (task_id, lead_days, deadline) tuple as their email key, or a
+    list of them for a digest email, which is recorded once per task it covers.
+    """
+
+    def __init__(self, storage, flush_every=100):
+        self.storage = storage
+        self.flush_every = flush_every
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def record(self, result):
+        status = "Sent" if result.ok else "Failed"
+        rows = [
+            (task_id, lead_days, deadline, result.email.to, status, result.message_id, result.error)
+            for task_id, lead_days, deadline in task_keys(result.email.key)
+        ]
+        with self._lock:
+            self._pending.extend(rows)
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+
+    def _flush(self):
+        if self._pending:
+            with self.storage.connection() as conn:
+                self.storage.execute(conn.cursor(), "upsert_notification", UPSERT_NOTIFICATION, self._pending, many=True)
+            self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
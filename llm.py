@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+from llm_cache import make_key
+from metrics import LLM_REQUESTS, STAGE_SECONDS, log
+from ratelimit import Retrier, get_limiter
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "gemini" or "stub" (offline, deterministic)
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash-latest")
+LLM_CHUNK_TOKENS = int(os.getenv("LLM_CHUNK_TOKENS", "4000"))  # Prompt budget per request
+LLM_CHUNK_MAX_TASKS = int(os.getenv("LLM_CHUNK_MAX_TASKS", "25"))  # Keeps each response well under the output limit
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+TASKS_MARKER = "Tasks (JSON):\n"
+
+PROMPT_HEADER = """You are helping write deadline reminder emails.
+
+For each task listed below, write one short paragraph to include in the reminder email sent to the person it is assigned to. Each paragraph should be polite, motivating and specific to the task:
+
+1. Address the person by their name.
+2. Briefly acknowledge the task and its deadline.
+3. Give one practical suggestion to help them manage the task efficiently.
+4. Offer help or resources if needed.
+
+Do not repeat the same wording across tasks and do not add greetings or sign-offs beyond the paragraph itself.
+Respond with JSON only, in the form {"messages": [{"task_id": <id>, "message": "<paragraph>"}]}, with exactly one entry per task.
+
+"""
+
+DIGEST_PROMPT_HEADER = """You are helping write deadline reminder emails.
+
+Each person listed below receives one email summarising all of their tasks that are due soon, most urgent first. For each person, write one short paragraph to include in that email. Each paragraph should be polite, motivating and specific:
+
+1. Address the person by their name.
+2. Acknowledge how many tasks are due and name the most urgent one.
+3. Give one practical suggestion for prioritising or sequencing the work.
+4. Offer help or resources if needed.
+
+Do not repeat the same wording across people and do not add greetings or sign-offs beyond the paragraph itself.
+Respond with JSON only, in the form {"messages": [{"digest_id": <id>, "message": "<paragraph>"}]}, with exactly one entry per person.
+
+"""
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) used for chunk sizing."""
+    return len(text) // 4 + 1
+
+
+def task_payload(task):
+    task_id, title, deadline, recipient_name = task
+    return {"task_id": task_id, "title": title, "deadline": deadline, "assigned_to": recipient_name}
+
+
+def digest_payload(digest):
+    digest_id, recipient_name, tasks = digest
+    return {
+        "digest_id": digest_id,
+        "assigned_to": recipient_name,
+        "tasks": [{"title": title, "deadline": deadline, "priority": priority} for title, deadline, priority in tasks],
+    }
+
+
+class Prompt(NamedTuple):
+    """A prompt header, the JSON payload for each item, and the field identifying items in the response."""
+    header: str
+    payload: Callable
+    id_field: str
+
+
+# One message per task: items are (task_id, title, deadline, recipient_name)
+TASK_PROMPT = Prompt(PROMPT_HEADER, task_payload, "task_id")
+# One message per contact: items are (digest_id, recipient_name, [(title, deadline, priority), ...])
+DIGEST_PROMPT = Prompt(DIGEST_PROMPT_HEADER, digest_payload, "digest_id")
+
+
+def build_prompt(chunk, prompt=TASK_PROMPT):
+    return prompt.header + TASKS_MARKER + json.dumps([prompt.payload(item) for item in chunk])
+
+
+def chunk_tasks(tasks, token_budget=LLM_CHUNK_TOKENS, max_tasks=LLM_CHUNK_MAX_TASKS, prompt=TASK_PROMPT):
+    """Split tasks into chunks whose prompts stay within the token budget."""
+    budget = token_budget - estimate_tokens(prompt.header + TASKS_MARKER)
+    chunk, used = [], 0
+    for task in tasks:
+        cost = estimate_tokens(json.dumps(prompt.payload(task)))
+        if chunk and (used + cost > budget or len(chunk) == max_tasks):
+            yield chunk
+            chunk, used = [], 0
+        chunk.append(task)
+        used += cost
+    if chunk:
+        yield chunk
+
+
+def parse_messages(text, id_field="task_id"):
+    """Parse a structured response into {id: message}, ignoring malformed entries."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    data = json.loads(text)
+    entries = data.get("messages", []) if isinstance(data, dict) else data
+    messages = {}
+    for entry in entries:
+        try:
+            messages[int(entry[id_field])] = str(entry["message"]).strip()
+        except (KeyError, TypeError, ValueError):
+            continue
+    return messages
+
+
+class GeminiBackend:
+    """
+    Wraps a single GenerativeModel instance, reused for every request. The SDK is imported and
+    configured on the first request, so runs that never call the LLM do not pay for loading it.
+    """
+
+    provider = "gemini"
+
+    def __init__(self, model_name=LLM_MODEL, api_key=None, **client_config):
+        self.model_name = model_name
+        self.api_key = api_key
+        self.client_config = client_config  # Extra genai.configure arguments, e.g. transport/client_options
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self.api_key or os.getenv("GEMINI_API_KEY"), **self.client_config)
+                    self._model = genai.GenerativeModel(
+                        self.model_name,
+                        generation_config={"response_mime_type": "application/json"}
+                    )
+        return self._model
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        return response.text if response and response.text else ""
+
+
+class StubBackend:
+    """Deterministic offline backend that answers the structured prompt without a network call."""
+
+    model_name = "stub"
+
+    def generate(self, prompt):
+        items = json.loads(prompt.rsplit(TASKS_MARKER, 1)[1])
+        messages = []
+        for item in items:
+            if "tasks" in item:
+                first = item["tasks"][0]
+                messages.append({"digest_id": item["digest_id"], "message": (
+                    f"Hi {item['assigned_to']}, you have {len(item['tasks'])} task(s) due soon, starting with "
+                    f"{first['title']} on {first['deadline']}. Tackling them in the order listed will keep you on track."
+                )})
+            else:
+                messages.append({"task_id": item["task_id"], "message": (
+                    f"Hi {item['assigned_to']}, {item['title']} is due on {item['deadline']}. "
+                    f"Setting aside a focused block of time today will help you finish it comfortably."
+                )})
+        return json.dumps({"messages": messages})
+
+
+def make_backend(name=LLM_BACKEND):
+    if name == "stub":
+        return StubBackend()
+    return GeminiBackend()
+
+
+# Function to decide whether an LLM call should be retried: rate limits (429), server errors and timeouts are
+def classify_llm_error(result, error):
+    if error is None:
+        return None
+    code = getattr(error, "code", None)  # HTTP status on google.api_core exceptions
+    if code == 429:
+        return True, None
+    if (code is None and isinstance(error, (ConnectionError, TimeoutError))) or (isinstance(code, int) and code >= 500):
+        return False, None
+    return None
+
+
+class MessageGenerator:
+    """
+    Generates one message per task by sending chunked, structured prompts to the
+    backend concurrently. Tasks are (task_id, title, deadline, recipient_name) tuples, or
+    digest items for DIGEST_PROMPT (one message per contact).
+    With a cache, only tasks whose inputs have not been answered before reach the backend.
+    Requests share the backend provider's rate limiter; throttled or failed ones are retried with backoff.
+    """
+
+    def __init__(self, backend, token_budget=LLM_CHUNK_TOKENS, max_tasks=LLM_CHUNK_MAX_TASKS, concurrency=LLM_CONCURRENCY, cache=None,
+                 prompt=TASK_PROMPT):
+        self.backend = backend
+        self.prompt = prompt
+        self.token_budget = token_budget
+        self.max_tasks = max_tasks
+        self.concurrency = concurrency
+        self.cache = cache
+        self.retrier = Retrier(get_limiter(getattr(backend, "provider", backend.model_name)), classify_llm_error)
+
+    def cache_key(self, task):
+        payload = self.prompt.payload(task)
+        del payload[self.prompt.id_field]  # The message depends on the task's content, not its row ID
+        return make_key(self.backend.model_name, [self.prompt.header, payload])
+
+    def _request(self, chunk):
+        with STAGE_SECONDS.time(stage="llm"):
+            return self.backend.generate(build_prompt(chunk, self.prompt))
+
+    def generate(self, tasks):
+        """Return {task_id: message}; tasks whose chunk failed are left out."""
+        messages = {}
+        keys = {}
+        if self.cache is not None:
+            keys = {task[0]: self.cache_key(task) for task in tasks}
+            cached = self.cache.get_many(set(keys.values()))
+            messages = {task_id: cached[key] for task_id, key in keys.items() if key in cached}
+            tasks = [task for task in tasks if task[0] not in messages]
+
+        chunks = list(chunk_tasks(tasks, self.token_budget, self.max_tasks, self.prompt))
+        if not chunks:
+            return messages
+        generated = {}
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(chunks)), thread_name_prefix="llm") as pool:
+            futures = [self.retrier.submit(pool, self._request, chunk) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                try:
+                    generated.update(parse_messages(future.result(), self.prompt.id_field))
+                except Exception as e:
+                    LLM_REQUESTS.inc(status="error")
+                    log("llm_error", tasks=len(chunk), error=str(e))
+                    continue
+                LLM_REQUESTS.inc(status="ok")
+
+        if self.cache is not None and generated:
+            self.cache.put_many({keys[task_id]: message for task_id, message in generated.items() if task_id in keys})
+        messages.update(generated)
+        return messages
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds before an entry expires
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+
+# Lookups are split so the IN (...) list stays below SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+
+def normalize(value):
+    """Normalize prompt inputs so cosmetic differences (whitespace, key order) hit the same entry."""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def make_key(model_name, inputs):
+    material = json.dumps([model_name, normalize(inputs)], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    On-disk cache of LLM responses in SQLite, with a TTL and a size bound.
+    When the cache grows past `max_entries`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS LLM_CACHE (
+            KEY TEXT PRIMARY KEY,
+            VALUE TEXT NOT NULL,
+            CREATED_AT REAL NOT NULL,
+            LAST_USED REAL NOT NULL
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS IDX_LLM_CACHE_LAST_USED ON LLM_CACHE (LAST_USED)")
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys present and not expired."""
+        keys = list(keys)
+        now = time.time()
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[i:i + LOOKUP_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT KEY, VALUE FROM LLM_CACHE WHERE KEY IN ({placeholders}) AND CREATED_AT > ?",
+                    (*chunk, now - self.ttl)
+                ).fetchall()
+                found.update(rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE LLM_CACHE SET LAST_USED = ? WHERE KEY = ?",
+                    [(now, key) for key in found]
+                )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """Store {key: value} pairs, then evict anything expired or over the size bound."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO LLM_CACHE (KEY, VALUE, CREATED_AT, LAST_USED) VALUES (?, ?, ?, ?)",
+                [(key, value, now, now) for key, value in items.items()]
+            )
+            self._evict(now)
+            self._conn.execute("COMMIT")
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def _evict(self, now):
+        removed = self._conn.execute("DELETE FROM LLM_CACHE WHERE CREATED_AT <= ?", (now - self.ttl,)).rowcount
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM LLM_CACHE").fetchone()
+        if count > self.max_entries:
+            removed += self._conn.execute(
+                "DELETE FROM LLM_CACHE WHERE KEY IN (SELECT KEY FROM LLM_CACHE ORDER BY LAST_USED LIMIT ?)",
+                (count - self.max_entries,)
+            ).rowcount
+        self.evictions += removed
+
+    def stats(self):
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM LLM_CACHE").fetchone()
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": size}
+
+    def close(self):
+        self._conn.close()
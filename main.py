@@ -0,0 +1,139 @@
+import time
+
+STARTED = time.perf_counter()  # Taken before any other import, so startup covers loading the app
+
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+from changes import CHANGE_POLL_SECONDS, ChangeFeed
+from metrics import STARTUP_SECONDS, log, start_metrics_server
+from shards import NOTIFY_SHARDS, run_sharded
+from slots import due_slots
+from storage import get_storage
+
+
+def ready(command):
+    """Record how long the process took to get ready to run `command`."""
+    seconds = time.perf_counter() - STARTED
+    STARTUP_SECONDS.observe(seconds, command=command)
+    log("startup", command=command, seconds=round(seconds, 4))
+
+
+def window_slots(minutes):
+    """
+    The send slots that came due in the last `minutes`, so a cron job running every `minutes`
+    sends the same slots as the scheduler's ticks. None (every contact) without a window.
+    """
+    if not minutes:
+        return None
+    storage = get_storage()
+    end = datetime.now(timezone.utc)
+    return due_slots(storage.send_groups(), end - timedelta(minutes=minutes), end)
+
+
+def run_once(args):
+    import app
+
+    ready("run-once")
+    start_metrics_server()
+    storage = get_storage()
+    storage.create_schema()  # Once per process: the runs themselves take no DDL locks
+    # A pass over every contact also covers the task changes logged before it started
+    feed = ChangeFeed(storage)
+    covered = feed.latest() if not args.window else None
+    try:
+        slots = window_slots(args.window)
+        if app.NOTIFY_MODE == "outbox":
+            queued = app.enqueue_due_notifications(slots)
+            result = None
+        elif args.shards > 1:
+            result = run_sharded(args.shards, slots)
+        else:
+            result = app.check_and_notify(slots)
+    finally:
+        app.close_dispatcher()
+    if covered is not None:
+        feed.clear(covered)
+    else:
+        feed.prune()
+    if result is None:
+        print(f"Queued {queued} reminder(s) for the outbox workers.")
+        return 0
+    print(f"Sent {result['sent']} reminder(s), {result['failed']} failed.")
+    # Failed reminders stay due for the next run; the exit status lets the job runner report them
+    return 1 if result["failed"] else 0
+
+
+def serve(args):
+    import app
+
+    ready("serve")
+    app.serve()
+    return 0
+
+
+def watch(args):
+    import app
+
+    ready("watch")
+    get_storage().create_schema()
+    start_metrics_server()
+    try:
+        app.watch_changes(args.poll)
+    except KeyboardInterrupt:
+        print("Change watcher stopped.")
+    finally:
+        app.close_dispatcher()
+    return 0
+
+
+def dry_run(args):
+    """Query and render the due reminders without sending them or recording them in the ledger."""
+    import app
+
+    ready("dry-run")
+    get_storage().create_schema()  # Like every run, add missing tables (the ledger included) to older databases
+    fetch, enrich, render = app.notify_stages()
+    emails = 0
+    for chunk in app.iter_slot_chunks(fetch, window_slots(args.window)):
+        # The LLM is only called when asked for, so a dry run needs no API key
+        messages = enrich(chunk) if args.llm else {}
+        for email in render(chunk, messages):
+            if emails < args.limit:
+                email = email.rendered()
+                print(f"{email.to}\t{email.subject}")
+            emails += 1
+    print(f"{emails} email(s) would be sent. Nothing was sent or recorded.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send deadline reminders for due tasks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    window = argparse.ArgumentParser(add_help=False)
+    window.add_argument("--window", type=int, metavar="MINUTES",
+                        help="only contacts whose send slot came due in the last MINUTES (default: every contact)")
+
+    once = commands.add_parser("run-once", parents=[window], help="send everything due now and exit (for cron jobs)")
+    once.add_argument("--shards", type=int, default=NOTIFY_SHARDS, help="split the run into N processes by contact")
+    once.set_defaults(run=run_once)
+
+    commands.add_parser("serve", help="run the scheduler (and the change watcher) until stopped").set_defaults(run=serve)
+
+    watcher = commands.add_parser("watch", help="remind about added or re-dated tasks as they change, until stopped")
+    watcher.add_argument("--poll", type=float, default=CHANGE_POLL_SECONDS,
+                         help="seconds between checks on SQLite; the longest wait for a NOTIFY on Postgres")
+    watcher.set_defaults(run=watch)
+
+    dry = commands.add_parser("dry-run", parents=[window], help="show the reminders that would be sent, without sending them")
+    dry.add_argument("--limit", type=int, default=20, help="reminders listed (default 20); all are counted")
+    dry.add_argument("--llm", action="store_true", help="also generate the LLM messages")
+    dry.set_defaults(run=dry_run)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
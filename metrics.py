@@ -0,0 +1,294 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json" (one JSON object per line)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the HTTP endpoint
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "1000"))  # Finished spans kept for /traces
+
+# Seconds; covers a cached render (~microseconds) up to a slow LLM call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_print_lock = threading.Lock()
+
+
+def log(event, **fields):
+    """Write one structured log line: JSON with LOG_FORMAT=json, `event key=value ...` otherwise."""
+    if LOG_FORMAT == "json":
+        line = json.dumps({"ts": round(time.time(), 6), "event": event, **fields}, default=str)
+    else:
+        line = " ".join([event] + [f"{key}={value}" for key, value in fields.items()])
+    with _print_lock:
+        print(line, flush=True)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+
+    def prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.samples():
+            lines.append(f"{self.name}{_labels(labels)} {value}")
+        return lines
+
+    def snapshot(self):
+        return [{"labels": labels, "value": value} for labels, value in self.samples()]
+
+    def export(self):
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values):
+        """Add counts exported by another process."""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        """Yield (labels, cumulative bucket counts, count, sum) per label set."""
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            cumulative, total = [], 0
+            for count in values[:-1]:
+                total += count
+                cumulative.append(total)
+            yield dict(zip(self.labelnames, key)), cumulative, total, values[-1]
+
+    def quantile(self, q, cumulative, count):
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if not count:
+            return None
+        rank = q * count
+        for bound, seen in zip(self.buckets, cumulative):
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def prometheus(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, cumulative, count, total in self.samples():
+            for bound, seen in zip(self.buckets + ("+Inf",), cumulative):
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': bound})} {seen}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+    def snapshot(self):
+        return [
+            {
+                "labels": labels,
+                "count": count,
+                "sum": round(total, 6),
+                "mean": round(total / count, 6) if count else None,
+                "p50": self.quantile(0.5, cumulative, count),
+                "p99": self.quantile(0.99, cumulative, count),
+            }
+            for labels, cumulative, count, total in self.samples()
+        ]
+
+    def export(self):
+        with self._lock:
+            return {key: list(values) for key, values in self._series.items()}
+
+    def merge(self, series):
+        """Add observations exported by another process."""
+        with self._lock:
+            for key, values in series.items():
+                mine = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+                for i, value in enumerate(values):
+                    mine[i] += value
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+# Notify path metrics
+STAGE_SECONDS = Histogram(
+    "notify_stage_seconds", "Time per unit of work: query chunk, LLM request, render chunk, send request", ["stage"]
+)
+TASKS = Counter("notify_tasks_total", "Due tasks fetched from the database")
+EMAILS = Counter("notify_emails_total", "Reminder emails by outcome", ["status"])
+LLM_REQUESTS = Counter("notify_llm_requests_total", "LLM requests by outcome", ["status"])
+RETRIES = Counter("notify_retries_total", "Retried operations", ["kind"])
+RUNS = Counter("notify_runs_total", "Notify runs by outcome", ["status"])
+STARTUP_SECONDS = Histogram("notify_startup_seconds", "Time from process start until a command is ready to run", ["command"])
+
+METRICS = [STAGE_SECONDS, TASKS, EMAILS, LLM_REQUESTS, RETRIES, RUNS, STARTUP_SECONDS]
+
+
+def prometheus_text():
+    return "\n".join(line for metric in METRICS for line in metric.prometheus()) + "\n"
+
+
+def snapshot():
+    return {metric.name: metric.snapshot() for metric in METRICS}
+
+
+def export_metrics():
+    """Raw metric values, picklable, for merging into another process with merge_metrics."""
+    return {metric.name: metric.export() for metric in METRICS}
+
+
+def merge_metrics(exported):
+    for metric in METRICS:
+        metric.merge(exported.get(metric.name, {}))
+
+
+# Tracing: spans carry a trace ID shared by everything in one run
+_current_span = contextvars.ContextVar("current_span", default=None)
+_finished_spans = deque(maxlen=TRACE_BUFFER)
+
+
+class SpanContext(NamedTuple):
+    """Identifies a span in another process, so spans there can join its trace."""
+    trace_id: str
+    span_id: str
+
+
+class Span:
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def context(self):
+        return SpanContext(self.trace_id, self.span_id)
+
+    def finish(self, duration=None):
+        self.duration = time.time() - self.start if duration is None else duration
+        record = self.to_dict()
+        _finished_spans.append(record)
+        log("span", **{key: value for key, value in record.items() if key != "attributes"}, **record["attributes"])
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+        }
+
+
+@contextmanager
+def span(name, parent=None, **attributes):
+    """Trace a block as a child of `parent` (a SpanContext), the current span, or as a new trace."""
+    current = Span(name, parent or _current_span.get(), **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=str(e) or type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+def record_span(name, duration, **attributes):
+    """Record an already-finished child of the current span, e.g. one task's send."""
+    Span(name, _current_span.get(), **attributes).finish(duration)
+
+
+def recent_spans():
+    return list(_finished_spans)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = prometheus_text().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(snapshot()).encode(), "application/json"
+        elif self.path == "/traces":
+            body, content_type = json.dumps(recent_spans(), default=str).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve /metrics (Prometheus text), /metrics.json and /traces from a background thread."""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    log("metrics_server_started", url=f"http://{host}:{server.server_port}/metrics")
+    return server
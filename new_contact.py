@@ -1,134 +1,183 @@
+import re
 import streamlit as st
-import psycopg2
 import pandas as pd
+from zoneinfo import available_timezones
 from dotenv import load_dotenv
-import os
+from contacts import (EMAIL_PATTERN, PHONE_PATTERN, format_phone, import_contacts, read_contacts_file,
+                      validate_contact, validate_contacts)
+from storage import CONTACT_MANAGER_DB_BACKEND, StorageError, get_storage
 
 # Load environment variables
 load_dotenv()
 
-def get_db_connection():
-    """Create connection to Neon PostgreSQL"""
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        port=os.getenv('DB_PORT'),
-        sslmode='require'
-    )
+# Input fields of the contact form (session state keys) and their empty values
+CONTACT_FORM = {"contact_name": "", "contact_phone": "", "contact_email": "", "contact_address": "",
+                "contact_timezone": None, "contact_preferred_hour": None}
+DUPLICATE_CHECK_SECONDS = 60  # How long a duplicate check is reused; saving a contact clears it
 
-def insert_contact(name, phone, email, address):
+def insert_contact(name, phone, email, address, timezone=None, preferred_hour=None):
     """Insert new contact and return the created record"""
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                # Insert and return the new contact
-                cur.execute("""
-                    INSERT INTO CONTACTS (NAME, PHONE, EMAIL, ADDRESS)
-                    VALUES (%s, %s, %s, %s)
-                    RETURNING id, name, phone, email, address
-                """, (name, phone, email, address))
-                
-                new_contact = cur.fetchone()
-                conn.commit()
-                return new_contact
-                
-    except psycopg2.Error as e:
+        # Connections come from the shared pool, so the Neon TLS handshake is not repeated per insert
+        return get_storage(CONTACT_MANAGER_DB_BACKEND).insert_contact(name, phone, email, address, timezone, preferred_hour)
+    except StorageError as e:
         st.error(f"Database error: {str(e)}")
         return None
 
+@st.cache_data(ttl=DUPLICATE_CHECK_SECONDS, show_spinner=False)
+def find_duplicates(phone, email):
+    """Existing contacts with this phone or email (two index lookups)"""
+    return get_storage(CONTACT_MANAGER_DB_BACKEND).find_duplicate_contacts(phone, email)
+
+def save_contact():
+    """Validate and insert the contact on the form, then clear the form for the next one"""
+    form = {key: st.session_state[key] for key in CONTACT_FORM}
+    errors = validate_contact(form["contact_name"], form["contact_phone"], form["contact_email"])
+    if errors:
+        st.session_state.contact_errors = errors
+        return
+    result = insert_contact(
+        form["contact_name"].strip(),
+        int(form["contact_phone"]),
+        form["contact_email"].strip(),
+        form["contact_address"].strip() or None,
+        form["contact_timezone"],
+        form["contact_preferred_hour"]
+    )
+    if result:
+        st.session_state.saved_contact = result
+        st.session_state.update(CONTACT_FORM)
+        # The new contact counts in later duplicate checks and shows up in the contact browser
+        st.cache_data.clear()
+
 # Streamlit Page Configuration
 st.set_page_config(page_title="Contact Manager", layout="wide")
 
 # Contact Form Section
 st.header("📝 Add New Contact")
 
-with st.form("contact_form", clear_on_submit=True):
-    cols = st.columns(2)
-    with cols[0]:
-        name = st.text_input("Full Name*", help="Required field")
-        phone = st.text_input("Phone Number*", 
-                            max_chars=10, 
-                            help="10 digits without country code")
-    with cols[1]:
-        email = st.text_input("Email Address*")
-        address = st.text_input("Physical Address")
+# Plain inputs rather than an st.form, so each entry reruns the page and phone and email
+# are checked for duplicates as they are filled in, before saving
+cols = st.columns(2)
+with cols[0]:
+    name = st.text_input("Full Name*", key="contact_name", help="Required field")
+    phone = st.text_input("Phone Number*", 
+                        key="contact_phone",
+                        max_chars=10, 
+                        help="10 digits without country code")
+with cols[1]:
+    email = st.text_input("Email Address*", key="contact_email")
+    address = st.text_input("Physical Address", key="contact_address")
+# Reminders arrive at the preferred hour in the contact's timezone (server defaults when left unset)
+with cols[0]:
+    timezone = st.selectbox("Timezone", [None] + sorted(available_timezones()), key="contact_timezone",
+                            format_func=lambda zone: zone or "Default")
+with cols[1]:
+    preferred_hour = st.selectbox("Preferred Reminder Hour", [None] + list(range(24)), key="contact_preferred_hour",
+                                  format_func=lambda hour: "Default" if hour is None else f"{hour:02d}:00")
+
+# Only complete values are looked up, so partial input never queries the database
+check_phone = int(phone) if re.fullmatch(PHONE_PATTERN, phone) else None
+check_email = email.strip() if re.search(EMAIL_PATTERN, email) else None
+if check_phone or check_email:
+    try:
+        duplicates = find_duplicates(check_phone, check_email)
+    except StorageError as e:
+        st.error(f"Database error: {str(e)}")
+        duplicates = []
+    for contact in duplicates:
+        st.warning(f"Already a contact: {contact.name}, {format_phone(contact.phone)}, {contact.email} (ID {contact.id})")
+
+st.button("💾 Save Contact", on_click=save_contact)
+
+# Validation (same rules as the bulk importer) ran in save_contact
+for error in st.session_state.pop("contact_errors", []):
+    st.error(error)
+
+result = st.session_state.pop("saved_contact", None)
+if result:
+    st.success("Contact created successfully! 🎉")
+    st.balloons()
+    
+    # Display the created contact
+    st.subheader("New Contact Details", divider="green")
+    
+    # Create DataFrame for display
+    contact_df = pd.DataFrame([{
+        "ID": result[0],
+        "Name": result[1],
+        "Phone": format_phone(result[2]),
+        "Email": result[3],
+        "Address": result[4] if result[4] else "N/A",
+        "Timezone": result.timezone or "Default",
+        "Preferred Hour": f"{result.preferred_hour:02d}:00" if result.preferred_hour is not None else "Default"
+    }])
     
-    submitted = st.form_submit_button("💾 Save Contact")
+    # Show styled dataframe
+    st.dataframe(
+        contact_df,
+        use_container_width=True,
+        column_config={
+            "ID": st.column_config.NumberColumn("ID"),
+            "Phone": "Phone Number",
+            "Email": "Email Address"
+        },
+        hide_index=True
+    )
     
-    if submitted:
-        # Validation
-        errors = []
-        if not name: errors.append("Name is required")
-        if not phone: errors.append("Phone is required")
-        if not email: errors.append("Email is required")
-        
-        if phone and (not phone.isdigit() or len(phone) != 10):
-            errors.append("Phone must be 10 digits")
-            
-        if email and '@' not in email:
-            errors.append("Invalid email format")
-        
-        if errors:
-            for error in errors:
-                st.error(error)
-        else:
-            # Convert phone to integer
-            try:
-                phone_int = int(phone)
-            except ValueError:
-                st.error("Phone number must contain only digits")
-                st.stop()
-            
-            # Insert into Neon
-            result = insert_contact(
-                name.strip(),
-                phone_int,
-                email.strip(),
-                address.strip() if address else None
-            )
-            
-            if result:
-                st.success("Contact created successfully! 🎉")
-                st.balloons()
-                
-                # Display the created contact
-                st.subheader("New Contact Details", divider="green")
-                
-                # Format phone number
-                phone_str = str(result[2]).zfill(10)
-                formatted_phone = f"({phone_str[:3]}) {phone_str[3:6]}-{phone_str[6:]}"
-                
-                # Create DataFrame for display
-                contact_df = pd.DataFrame([{
-                    "ID": result[0],
-                    "Name": result[1],
-                    "Phone": formatted_phone,
-                    "Email": result[3],
-                    "Address": result[4] if result[4] else "N/A"
-                }])
-                
-                # Show styled dataframe
-                st.dataframe(
-                    contact_df,
-                    use_container_width=True,
-                    column_config={
-                        "ID": st.column_config.NumberColumn("ID"),
-                        "Phone": "Phone Number",
-                        "Email": "Email Address"
-                    },
-                    hide_index=True
-                )
-                
-                # Show raw JSON response
-                with st.expander("View Raw Database Response"):
-                    st.json({
-                        "id": result[0],
-                        "name": result[1],
-                        "phone": result[2],
-                        "email": result[3],
-                        "address": result[4]
-                    })
+    # Show raw JSON response
+    with st.expander("View Raw Database Response"):
+        st.json({
+            "id": result[0],
+            "name": result[1],
+            "phone": result[2],
+            "email": result[3],
+            "address": result[4],
+            "timezone": result.timezone,
+            "preferred_hour": result.preferred_hour
+        })
+
+# Bulk Import Section
+st.header("📥 Bulk Import Contacts")
+st.caption("Upload a CSV or Excel file with Name, Phone, Email and (optional) Address columns.")
+
+uploaded_file = st.file_uploader("Contacts file", type=["csv", "xlsx"])
+
+if uploaded_file is not None and st.button("📤 Import Contacts"):
+    try:
+        frame = read_contacts_file(uploaded_file)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+
+    # Validate every row at once, then load the valid ones in a single bulk insert
+    report = validate_contacts(frame)
+    try:
+        report = import_contacts(report, get_storage(CONTACT_MANAGER_DB_BACKEND))
+    except StorageError as e:
+        st.error(f"Database error: {str(e)}")
+        st.stop()
+
+    accepted = int((report["Status"] == "Accepted").sum())
+    metric_cols = st.columns(3)
+    metric_cols[0].metric("Rows", len(report))
+    metric_cols[1].metric("Accepted", accepted)
+    metric_cols[2].metric("Rejected", len(report) - accepted)
+
+    st.dataframe(
+        report,
+        use_container_width=True,
+        column_config={
+            "Row": st.column_config.NumberColumn("File Row"),
+            "ID": st.column_config.NumberColumn("ID")
+        },
+        hide_index=True
+    )
+    st.download_button(
+        "⬇️ Download Import Report",
+        report.to_csv(index=False),
+        file_name="contact_import_report.csv",
+        mime="text/csv"
+    )
 
 # To run: streamlit run your_app.py
\ No newline at end of file
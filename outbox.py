@@ -0,0 +1,155 @@
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from ledger import UPSERT_NOTIFICATION
+from metrics import RETRIES
+
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))  # Visibility timeout for claimed jobs
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "60"))
+
+ENQUEUE_JOB = """
+INSERT INTO OUTBOX (TASK_ID, LEAD_DAYS, DEADLINE, TITLE, RECIPIENT, RECIPIENT_NAME, AVAILABLE_AT)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (TASK_ID, LEAD_DAYS, DEADLINE, RECIPIENT) DO NOTHING
+"""
+
+CLAIMABLE = """
+SELECT ID FROM OUTBOX
+WHERE STATUS IN ('Pending', 'Claimed') AND AVAILABLE_AT <= ?
+ORDER BY AVAILABLE_AT
+LIMIT ?
+"""
+
+CLAIM_JOBS = """
+UPDATE OUTBOX
+SET STATUS = 'Claimed', CLAIMED_BY = ?, AVAILABLE_AT = ?, ATTEMPTS = ATTEMPTS + 1
+WHERE ID IN ({claimable})
+RETURNING ID, TASK_ID, TITLE, DEADLINE, RECIPIENT, RECIPIENT_NAME, LEAD_DAYS, ATTEMPTS
+"""
+
+# Only the worker holding the lease may settle a job
+SETTLE_JOB = """
+UPDATE OUTBOX SET STATUS = ?, AVAILABLE_AT = ?, LAST_ERROR = ? WHERE ID = ? AND CLAIMED_BY = ?
+"""
+
+
+@dataclass
+class OutboxJob:
+    id: int
+    task_id: int
+    title: str
+    deadline: str | datetime  # As stored: a datetime on Postgres
+    recipient: str
+    recipient_name: str
+    lead_days: int
+    attempts: int
+
+    def task_row(self):
+        """The job in the row shape produced by the due-task query, with the deadline as stored."""
+        return (self.task_id, self.title, self.deadline, self.recipient, self.recipient_name, self.lead_days)
+
+
+class Outbox:
+    """
+    Durable queue of notification jobs shared by the scheduler and any number of workers.
+    Workers claim jobs in batches under a lease: with FOR UPDATE SKIP LOCKED on Postgres, and
+    inside a BEGIN IMMEDIATE write transaction on SQLite, so no job is handed to two workers.
+    """
+
+    def __init__(self, storage, lease_seconds=OUTBOX_LEASE_SECONDS, max_attempts=OUTBOX_MAX_ATTEMPTS,
+                 retry_base_seconds=OUTBOX_RETRY_BASE_SECONDS):
+        self.storage = storage
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+
+    def _run(self, func):
+        with self.storage.connection(immediate=True) as conn:
+            return func(conn.cursor())
+
+    def enqueue(self, tasks):
+        """Add due-task rows as pending jobs; reminders already queued are left untouched."""
+        now = time.time()
+        rows = [
+            (task_id, lead_days, deadline, title, email, name, now)
+            for task_id, title, deadline, email, name, lead_days in tasks
+        ]
+        self._run(lambda cursor: self.storage.execute(cursor, "enqueue_job", ENQUEUE_JOB, rows, many=True))
+        return len(rows)
+
+    def claim(self, worker_id, limit):
+        """Lease up to `limit` available jobs (new, due for retry, or with an expired lease) to a worker."""
+        now = time.time()
+        claimable = CLAIMABLE
+        if self.storage.backend == "postgres":
+            claimable += " FOR UPDATE SKIP LOCKED"
+        query = CLAIM_JOBS.format(claimable=claimable)
+
+        def claim_jobs(cursor):
+            self.storage.execute(cursor, "claim_jobs", query, (worker_id, now + self.lease_seconds, now, limit))
+            return [OutboxJob(*row) for row in cursor.fetchall()]
+
+        return self._run(claim_jobs)
+
+    def retry_delay(self, attempts):
+        return self.retry_base_seconds * 2 ** (attempts - 1)
+
+    def complete(self, worker_id, jobs, results):
+        """
+        Settle claimed jobs from their send results: successes are marked done, failures are
+        rescheduled with exponential backoff until max_attempts, then marked failed.
+        Each outcome is recorded in the NOTIFICATIONS ledger in the same transaction.
+        Jobs whose lease was lost to another worker are left alone.
+        """
+        # Keyed like the queue itself: a task re-dated while its old job is leased has a second job
+        by_key = {(job.task_id, job.lead_days, job.deadline, job.recipient): job for job in jobs}
+        now = time.time()
+
+        def settle(cursor):
+            for result in results:
+                task_id, lead_days, deadline = result.email.key
+                job = by_key.get((task_id, lead_days, deadline, result.email.to))
+                if job is None:
+                    continue
+                if result.ok:
+                    status, available_at = "Done", now
+                elif job.attempts >= self.max_attempts:
+                    status, available_at = "Failed", now
+                else:
+                    status, available_at = "Pending", now + self.retry_delay(job.attempts)
+                self.storage.execute(
+                    cursor, "settle_job", SETTLE_JOB, (status, available_at, result.error, job.id, worker_id)
+                )
+                if not cursor.rowcount:
+                    continue
+                if status == "Pending":
+                    RETRIES.inc(kind="outbox")
+                else:
+                    self.storage.execute(cursor, "upsert_notification", UPSERT_NOTIFICATION, (
+                        task_id, lead_days, deadline, result.email.to,
+                        "Sent" if result.ok else "Failed", result.message_id, result.error
+                    ))
+
+        self._run(settle)
+
+    def release(self, worker_id, jobs, error):
+        """Put claimed jobs back for retry (or fail them once out of attempts), e.g. when the batch failed before sending."""
+        now = time.time()
+        self._run(lambda cursor: self.storage.execute(
+            cursor, "settle_job", SETTLE_JOB,
+            [
+                ("Failed" if job.attempts >= self.max_attempts else "Pending",
+                 now + self.retry_delay(job.attempts), error, job.id, worker_id)
+                for job in jobs
+            ],
+            many=True
+        ))
+
+    def counts(self):
+        with self.storage.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT STATUS, COUNT(*) FROM OUTBOX GROUP BY STATUS")
+            return dict(cursor.fetchall())
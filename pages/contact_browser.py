@@ -0,0 +1,78 @@
+import streamlit as st
+import pandas as pd
+from dotenv import load_dotenv
+from contacts import format_phone
+from storage import CONTACT_MANAGER_DB_BACKEND, StorageError, get_storage
+
+# Load environment variables
+load_dotenv()
+
+PAGE_SIZES = [25, 50, 100]
+SEARCH_CACHE_SECONDS = 60  # How long a page of results is reused; saving a contact clears it
+
+@st.cache_data(ttl=SEARCH_CACHE_SECONDS, show_spinner=False)
+def search_contacts(query, after, limit):
+    """One page of matching contacts and the keyset of the next page"""
+    return get_storage(CONTACT_MANAGER_DB_BACKEND).search_contacts(query, after, limit)
+
+def next_page(after):
+    st.session_state.browser_pages.append(after)
+
+def previous_page():
+    st.session_state.browser_pages.pop()
+
+# Streamlit Page Configuration
+st.set_page_config(page_title="Contact Browser", layout="wide")
+
+st.header("📇 Browse Contacts")
+
+cols = st.columns([3, 1])
+with cols[0]:
+    query = st.text_input("Search", placeholder="Name or email",
+                          help="Matches names and emails containing the text (starting with it, for 1-2 characters)")
+with cols[1]:
+    page_size = st.selectbox("Contacts per Page", PAGE_SIZES, index=1)
+
+# Pages are fetched by keyset (the name and ID of the previous page's last contact), so every
+# page is one index range however deep it is. The keysets of the pages visited so far make
+# the way back; a new search or page size starts over from the first page.
+if st.session_state.get("browser_search") != (query, page_size):
+    st.session_state.browser_search = (query, page_size)
+    st.session_state.browser_pages = [None]
+pages = st.session_state.browser_pages
+
+try:
+    contacts, after = search_contacts(query, pages[-1], page_size)
+except StorageError as e:
+    st.error(f"Database error: {str(e)}")
+    st.stop()
+
+if not contacts:
+    st.info("No contacts found.")
+else:
+    contacts_df = pd.DataFrame([{
+        "ID": contact.id,
+        "Name": contact.name,
+        "Phone": format_phone(contact.phone),
+        "Email": contact.email,
+        "Address": contact.address or "N/A",
+        "Timezone": contact.timezone or "Default",
+        "Preferred Hour": f"{contact.preferred_hour:02d}:00" if contact.preferred_hour is not None else "Default"
+    } for contact in contacts])
+
+    st.dataframe(
+        contacts_df,
+        use_container_width=True,
+        column_config={
+            "ID": st.column_config.NumberColumn("ID"),
+            "Phone": "Phone Number",
+            "Email": "Email Address"
+        },
+        hide_index=True
+    )
+
+# No total count: counting every match would scan them all on each page
+nav_cols = st.columns([1, 1, 6])
+nav_cols[0].button("⬅️ Previous", on_click=previous_page, disabled=len(pages) == 1)
+nav_cols[1].button("Next ➡️", on_click=next_page, args=(after,), disabled=after is None)
+nav_cols[2].caption(f"Page {len(pages)}")
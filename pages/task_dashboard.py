@@ -0,0 +1,94 @@
+import streamlit as st
+import pandas as pd
+from dotenv import load_dotenv
+from analytics import contact_names, get_task_snapshot
+from dependencies import format_hours
+from storage import CONTACT_MANAGER_DB_BACKEND, StorageError, get_storage
+
+# Load environment variables
+load_dotenv()
+
+# Streamlit Page Configuration
+st.set_page_config(page_title="Task Dashboard", layout="wide")
+
+st.header("📊 Task Workload")
+
+try:
+    storage = get_storage(CONTACT_MANAGER_DB_BACKEND)
+except StorageError as e:
+    st.error(f"Database error: {str(e)}")
+    st.stop()
+# The snapshot is shared by every session of this server and only re-reads changed tasks
+if st.button("🔄 Refresh Now"):
+    snapshot = get_task_snapshot(storage, max_age=0)
+else:
+    snapshot = get_task_snapshot(storage)
+
+if snapshot.refreshed_at is None:
+    st.error("Task data could not be loaded; check the database settings.")
+    st.stop()
+if snapshot.frame.empty:
+    st.info("No tasks yet.")
+    st.stop()
+
+summary = snapshot.summary()
+metric_cols = st.columns(5)
+metric_cols[0].metric("Open Tasks", summary["open"])
+metric_cols[1].metric("Overdue", summary["overdue"])
+metric_cols[2].metric("Finished", summary["completed"])
+metric_cols[3].metric("Median Cycle Time",
+                      format_hours(summary["cycle_hours_p50"]) if summary["cycle_hours_p50"] is not None else "N/A")
+metric_cols[4].metric("Actual / Estimate",
+                      f"{summary['estimate_ratio_p50']:.2f}×" if summary["estimate_ratio_p50"] is not None else "N/A",
+                      help="Median of time taken over estimated time, for finished tasks")
+
+# Workload Section: only the rows shown are looked up by name
+st.subheader("Workload by Assignee", divider="blue")
+top = st.slider("Assignees shown (most overdue first)", 5, 100, 20)
+workload = snapshot.workload().head(top)
+try:
+    names = contact_names(workload.index, storage)
+except StorageError as e:
+    st.warning(f"Contact names unavailable: {str(e)}")
+    names = {}
+workload_df = pd.DataFrame({
+    "Assignee": [f"{names.get(contact_id, 'Contact')} (#{contact_id})" for contact_id in workload.index],
+    "Overdue": workload["overdue"].to_numpy(),
+    "Open": workload["open"].to_numpy(),
+    "Finished": workload["completed"].to_numpy(),
+    "Median Cycle Hours": workload["cycle_hours"].round(1).to_numpy(),
+    "Actual / Estimate": workload["estimate_ratio"].round(2).to_numpy()
+})
+st.bar_chart(workload_df.set_index("Assignee")[["Overdue", "Open"]], stack=False)
+st.dataframe(workload_df, use_container_width=True, hide_index=True)
+
+cols = st.columns(2)
+with cols[0]:
+    st.subheader("Cycle Time by Priority", divider="blue")
+    cycle_times = snapshot.cycle_times()
+    st.dataframe(
+        pd.DataFrame({
+            "Priority": cycle_times.index.astype(str),
+            "Finished": cycle_times["completed"].to_numpy(),
+            "Median": [format_hours(hours) if pd.notna(hours) else "N/A" for hours in cycle_times["p50_hours"]],
+            "90th Percentile": [format_hours(hours) if pd.notna(hours) else "N/A" for hours in cycle_times["p90_hours"]]
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+with cols[1]:
+    st.subheader("Estimates vs Actual Time", divider="blue")
+    accuracy = snapshot.estimate_accuracy()
+    st.dataframe(
+        pd.DataFrame({
+            "Estimate": [format_hours(hours) for hours in accuracy.index],
+            "Finished": accuracy["completed"].to_numpy(),
+            "Actual / Estimate": accuracy["estimate_ratio"].round(2).to_numpy(),
+            "Over Estimate": accuracy["over_estimate"].to_numpy()
+        }),
+        use_container_width=True,
+        column_config={"Over Estimate": st.column_config.ProgressColumn("Over Estimate", format="percent", min_value=0, max_value=1)},
+        hide_index=True
+    )
+
+st.caption(f"{summary['tasks']} tasks, snapshot updated {snapshot.refreshed_at:%Y-%m-%d %H:%M:%S}")
@@ -0,0 +1,69 @@
+import os
+import queue
+import threading
+
+FETCH_CHUNK_SIZE = int(os.getenv("FETCH_CHUNK_SIZE", "500"))  # Rows pulled from the database per fetchmany
+PIPELINE_DEPTH = int(os.getenv("PIPELINE_DEPTH", "2"))  # Chunks each stage may run ahead of the next
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, depth=PIPELINE_DEPTH):
+    """
+    Run `iterable` on a background thread, handing items over through a queue bounded at `depth`.
+    The producer blocks once it is `depth` items ahead, so a fast stage never floods a slow one,
+    and exceptions raised by the producer are re-raised in the consumer.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                while not stop.is_set():
+                    try:
+                        items.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+            final = _DONE
+        except BaseException as e:
+            final = _Failure(e)
+        finally:
+            # Close generators on the thread that ran them (sqlite3 connections are thread-bound)
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        while not stop.is_set():
+            try:
+                items.put(final, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def stage(func, iterable, depth=PIPELINE_DEPTH):
+    """Apply func to each item on its own thread, running at most `depth` items ahead of the consumer."""
+    return prefetch((func(item) for item in iterable), depth)
@@ -0,0 +1,206 @@
+import heapq
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+
+from metrics import RETRIES, log
+
+# Requests per second allowed to each provider before any 429 is seen (burst = one second's worth);
+# providers not listed here (e.g. the offline stub LLM) are not limited until they return a 429
+RATE_LIMITS = {
+    "sendgrid": float(os.getenv("SENDGRID_RATE_LIMIT", "100")),
+    "gemini": float(os.getenv("GEMINI_RATE_LIMIT", "10")),
+    "smtp": float(os.getenv("SMTP_RATE_LIMIT", "100")),
+}
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "0.5"))
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "60"))
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread calling one provider, adapting to its real limit:
+    a 429 halves the rate and pauses all callers for the Retry-After period, and each
+    success recovers 1% of the configured rate (additive increase, multiplicative decrease).
+    A rate of 0 means unlimited, apart from Retry-After pauses.
+    """
+
+    def __init__(self, name, rate, burst=None, min_rate=None):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or max(rate / 100, 0.1)
+        self.burst = burst or max(1, int(rate))
+        self._tat = time.monotonic()  # Theoretical arrival time of the next request
+        self._paused_until = 0.0
+        self._last_throttle = float("-inf")
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the caller may send one request."""
+        while True:
+            if not self.rate:
+                start = self._paused_until
+                if start > time.monotonic():
+                    time.sleep(start - time.monotonic())
+                return
+            with self._lock:
+                now = time.monotonic()
+                interval = 1 / self.rate
+                start = max(now, self._tat - self.burst * interval, self._paused_until)
+                self._tat = max(self._tat, start) + interval
+            if start > now:
+                time.sleep(start - now)
+            # A 429 seen by another thread while we slept pauses us too
+            if self._paused_until <= time.monotonic():
+                return
+
+    def throttle(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            # Concurrent requests tend to be throttled together; count them as one congestion signal
+            decreased = self.rate and now - self._last_throttle >= 1.0
+            if decreased:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._last_throttle = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+        if decreased:
+            log("rate_limited", provider=self.name, rate=round(self.rate, 2), retry_after=retry_after)
+
+    def scale(self, fraction):
+        with self._lock:
+            self.max_rate *= fraction
+            self.rate *= fraction
+            self.min_rate *= fraction
+            self.burst = max(1, int(self.max_rate))
+
+    def success(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider):
+    """Return the process-wide RateLimiter for a provider."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter(provider, RATE_LIMITS.get(provider, 0))
+        return _limiters[provider]
+
+
+def share_limits(fraction):
+    """Scale every provider's rate, for one of several processes sending from the same accounts."""
+    for provider in RATE_LIMITS:
+        RATE_LIMITS[provider] *= fraction
+    with _limiters_lock:
+        for limiter in _limiters.values():
+            limiter.scale(fraction)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryQueue:
+    """Holds work waiting out its backoff; a single timer thread releases it when due."""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay, callback):
+        with self._cond:
+            self._counter += 1
+            heapq.heappush(self._heap, (time.monotonic() + delay, self._counter, callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="retry-queue")
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, callback = heapq.heappop(self._heap)
+            callback()
+
+
+retry_queue = RetryQueue()
+
+
+class Retrier:
+    """
+    Runs calls to one provider on an executor under its rate limiter. `classify(result, error)`
+    returns None when the outcome is final, or (throttled, retry_after) when it should be
+    retried; retries wait in the retry queue with exponential backoff and full jitter, so
+    they do not hold an executor thread while waiting.
+    """
+
+    def __init__(self, limiter, classify, max_attempts=RETRY_MAX_ATTEMPTS,
+                 base_seconds=RETRY_BASE_SECONDS, max_seconds=RETRY_MAX_SECONDS, queue=retry_queue):
+        self.limiter = limiter
+        self.classify = classify
+        self.max_attempts = max_attempts
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.queue = queue
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_seconds, self.base_seconds * 2 ** (attempt - 1)))
+        return max(delay, retry_after or 0)
+
+    def submit(self, executor, func, *args):
+        """Return a Future for func(*args), resolved with its final outcome."""
+        outcome = Future()
+
+        def attempt(number):
+            self.limiter.acquire()
+            result = error = None
+            try:
+                result = func(*args)
+            except Exception as e:
+                error = e
+            retry = self.classify(result, error)
+            if retry is not None and number < self.max_attempts:
+                throttled, retry_after = retry
+                if throttled:
+                    self.limiter.throttle(retry_after)
+                RETRIES.inc(kind=self.limiter.name)
+                self.queue.schedule(self.backoff(number, retry_after), lambda: resubmit(number + 1))
+                return
+            if retry is None:
+                self.limiter.success()
+            if error is not None:
+                outcome.set_exception(error)
+            else:
+                outcome.set_result(result)
+
+        def resubmit(number):
+            try:
+                executor.submit(attempt, number)
+            except RuntimeError as e:  # Executor shut down while the retry was waiting
+                outcome.set_exception(e)
+
+        resubmit(1)
+        return outcome
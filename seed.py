@@ -0,0 +1,182 @@
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from storage import DB_BACKEND, Storage
+
+# Rows per executemany / COPY call; everything is still loaded in one transaction
+SEED_CHUNK_SIZE = 50000
+
+FIRST_NAMES = ["Aarav", "Ananya", "Diya", "Ishaan", "Kabir", "Meera", "Rohan", "Saanvi", "Vihaan", "Zara",
+               "John", "Maria", "Wei", "Fatima", "Lucas", "Sofia", "Omar", "Emma", "Noah", "Priya"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Khan", "Singh", "Patel", "Iyer", "Reddy", "Das", "Mehta",
+              "Smith", "Garcia", "Chen", "Ali", "Silva", "Rossi", "Kim", "Brown", "Nguyen", "Joshi"]
+CITIES = ["Delhi", "Mumbai", "Jaipur", "Bengaluru", "Pune", "Chennai", "New York", "London", "Berlin", "Singapore"]
+TIMEZONES = {"New York": "America/New_York", "London": "Europe/London", "Berlin": "Europe/Berlin",
+             "Singapore": "Asia/Singapore"}  # Other cities are in Asia/Kolkata
+PREFERRED_HOURS = ([None, 8, 9, 10, 17], [60, 10, 15, 10, 5])  # None: DEFAULT_SEND_HOUR
+
+CATEGORIES = ["Project Management", "Technical", "Creative", "QA", "Operations", "Finance", "Research"]
+VERBS = ["Plan", "Design", "Build", "Review", "Test", "Deploy", "Document", "Migrate", "Audit", "Prepare"]
+SUBJECTS = ["database schema", "landing page", "API gateway", "quarterly report", "onboarding flow",
+            "billing service", "mobile app", "data pipeline", "security policy", "release notes"]
+DURATIONS = ["2 hours", "1 day", "3 days", "5 days", "1 week", "2 weeks"]
+
+PRIORITIES = (["Low", "Medium", "High"], [30, 50, 20])
+OPEN_STATUSES = (["Not Started", "In Progress", "On Hold"], [50, 40, 10])
+CLOSED_STATUSES = (["Completed", "Reviewed & Approved"], [80, 20])
+
+DEPENDENCY_RATE = 0.3  # Share of tasks depending on an earlier task
+DEPENDENCY_WINDOW = 50  # Dependencies point at one of the last N tasks, forming chains
+
+TASK_COLUMNS = [
+    "TITLE", "DESCRIPTION", "CATEGORY", "PRIORITY", "EXPECTED_OUTCOME", "DEADLINE",
+    "ASSIGNED_TO", "DEPENDENCIES", "REQUIRED_RESOURCES", "ESTIMATED_TIME",
+    "INSTRUCTIONS", "REVIEW_PROCESS", "PERFORMANCE_METRICS", "SUPPORT_CONTACT",
+    "NOTES", "STATUS", "STARTED_AT", "COMPLETED_AT"
+]
+CONTACT_COLUMNS = ["NAME", "PHONE", "EMAIL", "ADDRESS", "TIMEZONE", "PREFERRED_HOUR"]
+
+
+# Function to generate contacts with unique phones and emails
+def generate_contacts(rng, count):
+    phones = rng.sample(range(2000000000, 10000000000), count)
+    for i, phone in enumerate(phones):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        city = rng.choice(CITIES)
+        yield (
+            f"{first} {last}",
+            phone,
+            f"{first.lower()}.{last.lower()}.{i}@example.com",
+            f"{rng.randint(1, 999)}, {city}" if rng.random() < 0.8 else None,
+            TIMEZONES.get(city, "Asia/Kolkata"),
+            rng.choices(*PREFERRED_HOURS)[0]
+        )
+
+
+# Function to draw a deadline: mostly in the coming two weeks, some overdue, some far out
+def random_deadline(rng, today):
+    bucket = rng.random()
+    if bucket < 0.6:
+        days = rng.randint(0, 14)
+    elif bucket < 0.85:
+        days = -rng.randint(1, 60)
+    else:
+        days = rng.randint(15, 180)
+    if rng.random() < 0.3:
+        hour, minute = 23, 59  # End-of-day deadlines
+    else:
+        hour, minute = rng.randint(9, 18), rng.choice([0, 15, 30, 45])
+    return today + timedelta(days=days, hours=hour, minutes=minute)
+
+
+# Function to generate tasks assigned to the given contact IDs
+def generate_tasks(rng, count, contact_ids, today):
+    recent_titles = []
+    for i in range(count):
+        title = f"{rng.choice(VERBS)} {rng.choice(SUBJECTS)} #{i + 1}"
+        deadline = random_deadline(rng, today)
+        overdue = deadline < today
+
+        # Overdue tasks are mostly done; upcoming ones mostly still open
+        statuses = CLOSED_STATUSES if rng.random() < (0.7 if overdue else 0.1) else OPEN_STATUSES
+        status = rng.choices(*statuses)[0]
+        started_at = completed_at = None
+        if status != "Not Started":
+            started = deadline - timedelta(days=rng.randint(1, 20), hours=rng.randint(0, 8))
+            started_at = started.strftime('%Y-%m-%d %H:%M')
+            if statuses is CLOSED_STATUSES:
+                completed_at = (started + (deadline - started) * rng.random()).strftime('%Y-%m-%d %H:%M')
+
+        dependency = "None"
+        if recent_titles and rng.random() < DEPENDENCY_RATE:
+            dependency = rng.choice(recent_titles)
+        recent_titles.append(title)
+        if len(recent_titles) > DEPENDENCY_WINDOW:
+            recent_titles.pop(0)
+
+        assignee = rng.choice(contact_ids)
+        yield (
+            title,
+            f"{title} for the {rng.choice(CATEGORIES).lower()} team",
+            rng.choice(CATEGORIES),
+            rng.choices(*PRIORITIES)[0],
+            f"{title} delivered",
+            deadline.strftime('%Y-%m-%d %H:%M'),
+            assignee,
+            dependency,
+            None,
+            rng.choice(DURATIONS),
+            None,
+            "Review by lead",
+            None,
+            assignee if rng.random() < 0.5 else rng.choice(contact_ids),
+            None,
+            status,
+            started_at,
+            completed_at
+        )
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+# Function to bulk load rows: COPY on Postgres, executemany on SQLite
+def bulk_load(storage, cursor, table, columns, rows):
+    count = 0
+    for chunk in chunked(rows, SEED_CHUNK_SIZE):
+        if storage.backend == "postgres":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(chunk)
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            placeholders = ", ".join(["?"] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", chunk)
+        count += len(chunk)
+    return count
+
+
+def seed(storage, contacts, tasks, seed_value, today):
+    """Generate and load `contacts` contacts and `tasks` tasks in one transaction; the same seed and date give the same data."""
+    rng = random.Random(seed_value)
+    storage.create_schema()
+    with storage.connection(immediate=True) as conn:
+        cursor = conn.cursor()
+        contact_rows = list(generate_contacts(rng, contacts))
+        bulk_load(storage, cursor, "CONTACTS", CONTACT_COLUMNS, contact_rows)
+
+        # Look up the generated IDs in generation order, so assignments do not depend on existing rows
+        cursor.execute("SELECT PHONE, ID FROM CONTACTS")
+        id_by_phone = dict(cursor.fetchall())
+        contact_ids = [id_by_phone[phone] for _, phone, *_ in contact_rows]
+
+        return bulk_load(storage, cursor, "TASKS", TASK_COLUMNS, generate_tasks(rng, tasks, contact_ids, today))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with synthetic contacts and tasks for load testing.")
+    parser.add_argument("--contacts", type=int, default=1000, help="Number of contacts to generate")
+    parser.add_argument("--tasks", type=int, default=10000, help="Number of tasks to generate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed reproduces the same data")
+    parser.add_argument("--today", help="Date deadlines are generated around, YYYY-MM-DD (default: today)")
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], help="Overrides DB_BACKEND")
+    args = parser.parse_args()
+
+    today = datetime.strptime(args.today, "%Y-%m-%d") if args.today else datetime.combine(datetime.now().date(), datetime.min.time())
+    storage = Storage(args.backend or DB_BACKEND)
+    started = time.perf_counter()
+    loaded = seed(storage, args.contacts, args.tasks, args.seed, today)
+    storage.close()
+    print(f"Inserted {args.contacts} contacts and {loaded} tasks in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
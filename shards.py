@@ -0,0 +1,89 @@
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from metrics import export_metrics, log, merge_metrics, span, start_metrics_server
+from storage import get_storage
+
+# Processes used by each scheduled inline run; 1 runs it in the scheduler process itself
+NOTIFY_SHARDS = int(os.getenv("NOTIFY_SHARDS", "1"))
+
+
+class Shard(NamedTuple):
+    """The contacts with ASSIGNED_TO % count == index, with all of their tasks."""
+    index: int
+    count: int
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard(value):
+    """Parse 'i/N' (0 <= i < N) into a Shard."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got '{value}'")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 0 and {count - 1}")
+    return Shard(index, count)
+
+
+def run_shard(shard, slots=None, parent=None):
+    """
+    Run one shard of a notify pass in this process and return ({"sent", "failed"}, exported metrics).
+    Provider rate limits are divided between the shards, so together they stay within them.
+    """
+    import app
+    from ratelimit import share_limits
+
+    share_limits(1 / shard.count)
+    try:
+        with span("notify_shard", parent=parent, shard=str(shard)):
+            result = app.check_and_notify(slots, shard)
+    finally:
+        app.close_dispatcher()
+    return result, export_metrics()
+
+
+# Function to run a notify pass as `count` shards, one fresh process each. Every shard sends
+# and records its own reminders; results and metrics are merged into this process at the end,
+# so /metrics here covers the whole run.
+def run_sharded(count=NOTIFY_SHARDS, slots=None):
+    with span("notify_sharded", shards=count) as run:
+        pool = ProcessPoolExecutor(max_workers=count, mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1)
+        with pool:
+            futures = [pool.submit(run_shard, Shard(index, count), slots, run.context()) for index in range(count)]
+            totals, failed_shards = {"sent": 0, "failed": 0}, []
+            for index, future in enumerate(futures):
+                try:
+                    result, metrics = future.result()
+                except Exception as e:
+                    log("shard_error", shard=str(Shard(index, count)), error=str(e))
+                    failed_shards.append(index)
+                    continue
+                merge_metrics(metrics)
+                for key in totals:
+                    totals[key] += result[key]
+        run.set(**totals, failed_shards=len(failed_shards))
+    if failed_shards:
+        # Reminders the failed shards did not send stay due, so the next run picks them up
+        raise RuntimeError(f"{len(failed_shards)} of {count} shard(s) failed: {failed_shards}")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one notify pass split into shards by contact.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--shards", type=int, help="run all N shards here, one process each")
+    group.add_argument("--shard", type=parse_shard, help="run only shard i of N (e.g. 0/4), for one node of several")
+    args = parser.parse_args()
+    get_storage().create_schema()
+    start_metrics_server()
+    if args.shard:
+        result, _ = run_shard(args.shard)
+    else:
+        result = run_sharded(args.shards)
+    print(f"Sent {result['sent']} reminder(s), {result['failed']} failed.")
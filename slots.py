@@ -0,0 +1,134 @@
+import os
+from datetime import datetime, time, timedelta, timezone
+from typing import NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from metrics import log
+
+# Contacts without their own settings get reminders at DEFAULT_SEND_HOUR in DEFAULT_TIMEZONE
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
+DEFAULT_SEND_HOUR = int(os.getenv("DEFAULT_SEND_HOUR", "9"))
+# Each contact's send slot is a fixed minute within SEND_SPREAD_MINUTES after their preferred hour
+SEND_SPREAD_MINUTES = int(os.getenv("SEND_SPREAD_MINUTES", "60"))
+# How often the scheduler sends the slots that have come due, and the random delay added to each tick
+SCHEDULE_TICK_MINUTES = int(os.getenv("SCHEDULE_TICK_MINUTES", "5"))
+SCHEDULE_JITTER_SECONDS = int(os.getenv("SCHEDULE_JITTER_SECONDS", "30"))
+# Later ticks that send a slot again after some of its reminders failed (the ledger skips the sent ones)
+SLOT_RETRIES = int(os.getenv("SLOT_RETRIES", "12"))
+
+
+class SendSlot(NamedTuple):
+    """
+    Contacts in `timezone` with preferred `hour` whose slot minute is in [first_minute, end_minute),
+    reminded for deadlines relative to their `local_date`.
+    """
+    timezone: str
+    hour: int
+    local_date: object
+    first_minute: int
+    end_minute: int
+
+
+_unknown_zones = set()
+
+
+def zone(name):
+    """Return the ZoneInfo for a timezone name, falling back to DEFAULT_TIMEZONE for unknown names."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        if name not in _unknown_zones:
+            _unknown_zones.add(name)
+            log("unknown_timezone", timezone=name, using=DEFAULT_TIMEZONE)
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def due_slots(groups, start, end, spread=SEND_SPREAD_MINUTES):
+    """
+    Return the SendSlots whose time falls in the UTC interval (start, end], for
+    (timezone, hour) groups of contacts. A contact's slot on a local date is
+    `hour` o'clock local time plus its slot minute (0 <= minute < spread).
+    """
+    slots = []
+    for name, hour in groups:
+        tz = zone(name)
+        # The interval covers at most two local dates, plus the day before for spreads past midnight
+        first_day = start.astimezone(tz).date() - timedelta(days=1)
+        for day in range((end.astimezone(tz).date() - first_day).days + 1):
+            local_date = first_day + timedelta(days=day)
+            base = datetime.combine(local_date, time(hour), tzinfo=tz).astimezone(timezone.utc)
+            # Slot minute m is due when start < base + m minutes <= end
+            first = max(0, int((start - base).total_seconds() // 60) + 1)
+            stop = min(spread, int((end - base).total_seconds() // 60) + 1)
+            if first < stop:
+                slots.append(SendSlot(name, hour, local_date, first, stop))
+    return slots
+
+
+class SlotClock:
+    """
+    Hands out consecutive UTC intervals, one per scheduler tick, so every slot is sent by exactly
+    one tick. The clock only moves past an interval once its run has finished, so a tick that fails
+    is covered again by the next one. The first tick also covers the `catch_up` before it; slots
+    missed while the scheduler was down for longer than that wait for the next day.
+
+    Slots whose run had failed sends are retried by up to `retries` later ticks on their local date.
+    """
+
+    def __init__(self, catch_up=timedelta(minutes=SCHEDULE_TICK_MINUTES), retries=SLOT_RETRIES):
+        self.catch_up = catch_up
+        self.retries = retries
+        self.last = None
+        self._retry = {}  # SendSlot -> retries left
+
+    def pending(self, now=None):
+        """Return the interval (start, end] not sent yet, without moving the clock."""
+        now = now or datetime.now(timezone.utc)
+        if self.last is None:
+            self.last = now - self.catch_up  # Pinned, so a failed first tick is also covered again
+        return self.last, now
+
+    def finish(self, end, slots=(), failed=False):
+        """Move the clock to `end` after a run of `slots`; with `failed` sends, they are retried later."""
+        self.last = end
+        for slot in slots:
+            if failed:
+                self._retry.setdefault(slot, self.retries)
+            else:
+                self._retry.pop(slot, None)
+
+    def advance(self, now=None):
+        start, end = self.pending(now)
+        self.finish(end)
+        return start, end
+
+    def retry_slots(self, now=None):
+        """Return the earlier slots to send again on this tick; each call uses up one of their retries."""
+        now = now or datetime.now(timezone.utc)
+        slots = []
+        for slot, left in list(self._retry.items()):
+            # Past its local date the slot's lead-time windows no longer match the day
+            if left <= 0 or now.astimezone(zone(slot.timezone)).date() != slot.local_date:
+                del self._retry[slot]
+            else:
+                self._retry[slot] = left - 1
+                slots.append(slot)
+        return slots
+
+
+def todays_slots(groups, now=None, spread=SEND_SPREAD_MINUTES):
+    """
+    Return a SendSlot per (timezone, hour) group covering the contacts whose slot has already
+    come today in their own timezone. Used for tasks that change after their slot was sent;
+    contacts whose slot is still ahead are left to it.
+    """
+    now = now or datetime.now(timezone.utc)
+    slots = []
+    for name, hour in groups:
+        tz = zone(name)
+        local_date = now.astimezone(tz).date()
+        base = datetime.combine(local_date, time(hour), tzinfo=tz).astimezone(timezone.utc)
+        stop = min(spread, int((now - base).total_seconds() // 60) + 1)
+        if stop > 0:
+            slots.append(SendSlot(name, hour, local_date, 0, stop))
+    return slots
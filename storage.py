@@ -0,0 +1,968 @@
+import csv
+import io
+import os
+import queue
+import re
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+from ledger import NOT_YET_SENT
+from metrics import log
+from slots import DEFAULT_SEND_HOUR, DEFAULT_TIMEZONE, SEND_SPREAD_MINUTES
+
+load_dotenv()
+
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")  # "sqlite" (DATABASE_PATH) or "postgres" (Neon, DB_* settings)
+# The Streamlit contact manager (new_contact.py and pages/) has always written to Neon, so it
+# uses Postgres unless DB_BACKEND is set
+CONTACT_MANAGER_DB_BACKEND = os.getenv("DB_BACKEND", "postgres")
+DATABASE_PATH = os.getenv("DATABASE_PATH", "test.db")
+DB_SSLMODE = os.getenv("DB_SSLMODE", "require")  # Neon requires SSL
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+
+CONTACTS_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS CONTACTS (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    NAME VARCHAR(100) NOT NULL,
+    PHONE INTEGER UNIQUE NOT NULL CHECK(LENGTH(PHONE) = 10),
+    EMAIL VARCHAR(100) UNIQUE NOT NULL,
+    ADDRESS TEXT,
+    TIMEZONE VARCHAR(64),
+    PREFERRED_HOUR INTEGER CHECK(PREFERRED_HOUR BETWEEN 0 AND 23)
+);
+"""
+
+CONTACTS_TABLE_POSTGRES = """
+CREATE TABLE IF NOT EXISTS CONTACTS (
+    ID SERIAL PRIMARY KEY,
+    NAME VARCHAR(100) NOT NULL,
+    PHONE BIGINT UNIQUE NOT NULL CHECK(PHONE BETWEEN 1000000000 AND 9999999999),
+    EMAIL VARCHAR(100) UNIQUE NOT NULL,
+    ADDRESS TEXT,
+    TIMEZONE VARCHAR(64),
+    PREFERRED_HOUR INT CHECK(PREFERRED_HOUR BETWEEN 0 AND 23)
+);
+"""
+
+# Columns added after the first release, for databases created before them: (table, column, definition)
+ADDED_COLUMNS = [
+    ("CONTACTS", "TIMEZONE", "VARCHAR(64)"),
+    ("CONTACTS", "PREFERRED_HOUR", "INTEGER CHECK(PREFERRED_HOUR BETWEEN 0 AND 23)"),
+    ("TASKS", "UPDATED_AT", "TIMESTAMP"),
+]
+
+# Send slots are looked up per (timezone, preferred hour) group on every scheduler tick
+CONTACTS_SLOT_INDEX = "CREATE INDEX IF NOT EXISTS IDX_CONTACTS_SEND_SLOT ON CONTACTS (TIMEZONE, PREFERRED_HOUR);"
+
+# The contact browser pages through contacts in name order by keyset, and the contact form looks up
+# emails case-insensitively. On Postgres, pg_trgm's GIN indexes also serve name and email searches,
+# substring and prefix patterns alike; they are skipped where the extension is not available.
+CONTACTS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS IDX_CONTACTS_NAME ON CONTACTS (LOWER(NAME), ID);",
+    "CREATE INDEX IF NOT EXISTS IDX_CONTACTS_EMAIL ON CONTACTS (LOWER(EMAIL));",
+]
+CONTACTS_SEARCH_INDEXES_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+    "CREATE INDEX IF NOT EXISTS IDX_CONTACTS_NAME_TRGM ON CONTACTS USING GIN (LOWER(NAME) gin_trgm_ops);",
+    "CREATE INDEX IF NOT EXISTS IDX_CONTACTS_EMAIL_TRGM ON CONTACTS USING GIN (LOWER(EMAIL) gin_trgm_ops);",
+]
+
+TASKS_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS TASKS (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    TITLE VARCHAR(255) NOT NULL,
+    DESCRIPTION TEXT,
+    CATEGORY VARCHAR(50),
+    PRIORITY TEXT CHECK(PRIORITY IN ('Low', 'Medium', 'High')),
+    EXPECTED_OUTCOME TEXT,
+    DEADLINE DATETIME NOT NULL,
+    ASSIGNED_TO INTEGER NOT NULL,
+    DEPENDENCIES TEXT,
+    REQUIRED_RESOURCES TEXT,
+    ESTIMATED_TIME TEXT NOT NULL,
+    INSTRUCTIONS TEXT,
+    REVIEW_PROCESS TEXT,
+    PERFORMANCE_METRICS TEXT,
+    SUPPORT_CONTACT INTEGER,
+    NOTES TEXT,
+    STATUS TEXT CHECK(STATUS IN ('Not Started', 'In Progress', 'On Hold', 'Completed', 'Reviewed & Approved')) NOT NULL DEFAULT 'Not Started',
+    STARTED_AT DATETIME,
+    COMPLETED_AT DATETIME,
+    UPDATED_AT DATETIME,
+    FOREIGN KEY (ASSIGNED_TO) REFERENCES CONTACTS(ID),
+    FOREIGN KEY (SUPPORT_CONTACT) REFERENCES CONTACTS(ID)
+);
+"""
+
+TASKS_TABLE_POSTGRES = """
+CREATE TABLE IF NOT EXISTS TASKS (
+    ID SERIAL PRIMARY KEY,
+    TITLE VARCHAR(255) NOT NULL,
+    DESCRIPTION TEXT,
+    CATEGORY VARCHAR(50),
+    PRIORITY TEXT CHECK(PRIORITY IN ('Low', 'Medium', 'High')),
+    EXPECTED_OUTCOME TEXT,
+    DEADLINE TIMESTAMP NOT NULL,
+    ASSIGNED_TO INT NOT NULL REFERENCES CONTACTS(ID),
+    DEPENDENCIES TEXT,
+    REQUIRED_RESOURCES TEXT,
+    ESTIMATED_TIME TEXT NOT NULL,
+    INSTRUCTIONS TEXT,
+    REVIEW_PROCESS TEXT,
+    PERFORMANCE_METRICS TEXT,
+    SUPPORT_CONTACT INT REFERENCES CONTACTS(ID),
+    NOTES TEXT,
+    STATUS TEXT CHECK(STATUS IN ('Not Started', 'In Progress', 'On Hold', 'Completed', 'Reviewed & Approved')) NOT NULL DEFAULT 'Not Started',
+    STARTED_AT TIMESTAMP,
+    COMPLETED_AT TIMESTAMP,
+    UPDATED_AT TIMESTAMP
+);
+"""
+
+# Indexes for the due-task lookup: open tasks by deadline (partial, so finished tasks never
+# enter the index), plus per-assignee deadlines for the foreign key and per-contact lookups
+TASKS_INDEXES = [
+    """
+    CREATE INDEX IF NOT EXISTS IDX_TASKS_OPEN_DEADLINE ON TASKS (DEADLINE, ASSIGNED_TO)
+    WHERE STATUS NOT IN ('Completed', 'Reviewed & Approved');
+    """,
+    "CREATE INDEX IF NOT EXISTS IDX_TASKS_ASSIGNED_DEADLINE ON TASKS (ASSIGNED_TO, DEADLINE);",
+    # Dependency references are resolved to tasks by normalized title (see dependencies.py)
+    "CREATE INDEX IF NOT EXISTS IDX_TASKS_TITLE ON TASKS (LOWER(TRIM(TITLE)));",
+]
+
+# Dependency index, derived from TASKS.DEPENDENCIES by dependencies.py. One edge per reference
+# (normalized title) a task lists; DEPENDS_ON is NULL until a task with that title exists.
+# TASK_DEPENDENCY_SOURCES holds the title and text each task had when it was last indexed,
+# so only tasks changed since then are parsed again.
+DEPENDENCY_TABLES = {
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS TASK_DEPENDENCIES (
+            TASK_ID INTEGER NOT NULL,
+            REFERENCE VARCHAR(255) NOT NULL,
+            DEPENDS_ON INTEGER,
+            PRIMARY KEY (TASK_ID, REFERENCE)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS TASK_DEPENDENCY_SOURCES (
+            TASK_ID INTEGER PRIMARY KEY,
+            TITLE VARCHAR(255) NOT NULL,
+            DEPENDENCIES TEXT
+        );
+        """,
+    ],
+    "postgres": [
+        """
+        CREATE TABLE IF NOT EXISTS TASK_DEPENDENCIES (
+            TASK_ID INT NOT NULL,
+            REFERENCE VARCHAR(255) NOT NULL,
+            DEPENDS_ON INT,
+            PRIMARY KEY (TASK_ID, REFERENCE)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS TASK_DEPENDENCY_SOURCES (
+            TASK_ID INT PRIMARY KEY,
+            TITLE VARCHAR(255) NOT NULL,
+            DEPENDENCIES TEXT
+        );
+        """,
+    ],
+}
+DEPENDENCY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS IDX_TASK_DEPENDENCIES_DEPENDS_ON ON TASK_DEPENDENCIES (DEPENDS_ON);",
+    "CREATE INDEX IF NOT EXISTS IDX_TASK_DEPENDENCIES_REFERENCE ON TASK_DEPENDENCIES (REFERENCE);",
+]
+
+# One row per reminder: a task's deadline, reminded at a lead time, to a recipient.
+# A row with STATUS 'Sent' means that reminder is done; 'Failed' rows are retried by the next run.
+NOTIFICATIONS_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS NOTIFICATIONS (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    TASK_ID INTEGER NOT NULL,
+    LEAD_DAYS INTEGER NOT NULL,
+    DEADLINE DATETIME NOT NULL,
+    RECIPIENT VARCHAR(100) NOT NULL,
+    STATUS TEXT CHECK(STATUS IN ('Sent', 'Failed')) NOT NULL,
+    PROVIDER_MESSAGE_ID TEXT,
+    ERROR TEXT,
+    UPDATED_AT DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (TASK_ID, LEAD_DAYS, DEADLINE, RECIPIENT),
+    FOREIGN KEY (TASK_ID) REFERENCES TASKS(ID)
+);
+"""
+
+NOTIFICATIONS_TABLE_POSTGRES = """
+CREATE TABLE IF NOT EXISTS NOTIFICATIONS (
+    ID SERIAL PRIMARY KEY,
+    TASK_ID INT NOT NULL REFERENCES TASKS(ID),
+    LEAD_DAYS INT NOT NULL,
+    DEADLINE TIMESTAMP NOT NULL,
+    RECIPIENT VARCHAR(100) NOT NULL,
+    STATUS TEXT CHECK(STATUS IN ('Sent', 'Failed')) NOT NULL,
+    PROVIDER_MESSAGE_ID TEXT,
+    ERROR TEXT,
+    UPDATED_AT TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (TASK_ID, LEAD_DAYS, DEADLINE, RECIPIENT)
+);
+"""
+
+# Pending notification jobs. AVAILABLE_AT (epoch seconds) is when a job may next be claimed:
+# for 'Pending' jobs it implements retry backoff, for 'Claimed' jobs it is the lease expiry,
+# after which another worker may take the job over.
+OUTBOX_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS OUTBOX (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    TASK_ID INTEGER NOT NULL,
+    LEAD_DAYS INTEGER NOT NULL,
+    DEADLINE DATETIME NOT NULL,
+    TITLE VARCHAR(255) NOT NULL,
+    RECIPIENT VARCHAR(100) NOT NULL,
+    RECIPIENT_NAME VARCHAR(100),
+    STATUS TEXT CHECK(STATUS IN ('Pending', 'Claimed', 'Done', 'Failed')) NOT NULL DEFAULT 'Pending',
+    ATTEMPTS INTEGER NOT NULL DEFAULT 0,
+    AVAILABLE_AT REAL NOT NULL,
+    CLAIMED_BY TEXT,
+    LAST_ERROR TEXT,
+    CREATED_AT DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (TASK_ID, LEAD_DAYS, DEADLINE, RECIPIENT),
+    FOREIGN KEY (TASK_ID) REFERENCES TASKS(ID)
+);
+"""
+
+OUTBOX_TABLE_POSTGRES = """
+CREATE TABLE IF NOT EXISTS OUTBOX (
+    ID BIGSERIAL PRIMARY KEY,
+    TASK_ID INT NOT NULL REFERENCES TASKS(ID),
+    LEAD_DAYS INT NOT NULL,
+    DEADLINE TIMESTAMP NOT NULL,
+    TITLE VARCHAR(255) NOT NULL,
+    RECIPIENT VARCHAR(100) NOT NULL,
+    RECIPIENT_NAME VARCHAR(100),
+    STATUS TEXT CHECK(STATUS IN ('Pending', 'Claimed', 'Done', 'Failed')) NOT NULL DEFAULT 'Pending',
+    ATTEMPTS INT NOT NULL DEFAULT 0,
+    AVAILABLE_AT DOUBLE PRECISION NOT NULL,
+    CLAIMED_BY TEXT,
+    LAST_ERROR TEXT,
+    CREATED_AT TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (TASK_ID, LEAD_DAYS, DEADLINE, RECIPIENT)
+);
+"""
+
+# Only claimable jobs are indexed, so finished jobs never slow the claim query down
+OUTBOX_INDEX = """
+CREATE INDEX IF NOT EXISTS IDX_OUTBOX_CLAIMABLE ON OUTBOX (AVAILABLE_AT)
+WHERE STATUS IN ('Pending', 'Claimed');
+"""
+
+# Change capture: triggers log every open task that is added, re-dated, reassigned or reopened,
+# so the change watcher (see changes.py) only has to look at those tasks. On Postgres the trigger
+# also wakes listeners with a NOTIFY; the log table stays the source of truth.
+TASK_CHANGES_CHANNEL = "task_changes"
+
+TASK_CHANGES_TABLE_SQLITE = """
+CREATE TABLE IF NOT EXISTS TASK_CHANGES (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    TASK_ID INTEGER NOT NULL,
+    CHANGED_AT DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+TASK_CHANGES_TABLE_POSTGRES = """
+CREATE TABLE IF NOT EXISTS TASK_CHANGES (
+    ID BIGSERIAL PRIMARY KEY,
+    TASK_ID INT NOT NULL,
+    CHANGED_AT TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+TASK_CHANGE_TRIGGERS = {
+    "sqlite": [
+        """
+        CREATE TRIGGER IF NOT EXISTS TASKS_ADDED AFTER INSERT ON TASKS
+        WHEN NEW.STATUS NOT IN ('Completed', 'Reviewed & Approved')
+        BEGIN
+            INSERT INTO TASK_CHANGES (TASK_ID) VALUES (NEW.ID);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS TASKS_CHANGED AFTER UPDATE OF DEADLINE, ASSIGNED_TO, STATUS ON TASKS
+        WHEN NEW.STATUS NOT IN ('Completed', 'Reviewed & Approved')
+          AND (NEW.DEADLINE IS NOT OLD.DEADLINE OR NEW.ASSIGNED_TO IS NOT OLD.ASSIGNED_TO OR NEW.STATUS IS NOT OLD.STATUS)
+        BEGIN
+            INSERT INTO TASK_CHANGES (TASK_ID) VALUES (NEW.ID);
+        END;
+        """,
+    ],
+    # Identical notifications in one transaction are delivered once, so a bulk load wakes listeners only once
+    "postgres": [
+        f"""
+        CREATE OR REPLACE FUNCTION RECORD_TASK_CHANGE() RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO TASK_CHANGES (TASK_ID) VALUES (NEW.ID);
+            PERFORM pg_notify('{TASK_CHANGES_CHANNEL}', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """,
+        # Triggers are only created when missing: (re)creating one locks TASKS against writes
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'tasks_added' AND tgrelid = 'tasks'::regclass) THEN
+                CREATE TRIGGER TASKS_ADDED AFTER INSERT ON TASKS
+                FOR EACH ROW WHEN (NEW.STATUS NOT IN ('Completed', 'Reviewed & Approved'))
+                EXECUTE FUNCTION RECORD_TASK_CHANGE();
+            END IF;
+        END;
+        $$;
+        """,
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'tasks_changed' AND tgrelid = 'tasks'::regclass) THEN
+                CREATE TRIGGER TASKS_CHANGED AFTER UPDATE OF DEADLINE, ASSIGNED_TO, STATUS ON TASKS
+                FOR EACH ROW WHEN (
+                    NEW.STATUS NOT IN ('Completed', 'Reviewed & Approved')
+                    AND (NEW.DEADLINE IS DISTINCT FROM OLD.DEADLINE OR NEW.ASSIGNED_TO IS DISTINCT FROM OLD.ASSIGNED_TO
+                         OR NEW.STATUS IS DISTINCT FROM OLD.STATUS)
+                )
+                EXECUTE FUNCTION RECORD_TASK_CHANGE();
+            END IF;
+        END;
+        $$;
+        """,
+    ],
+}
+
+# TASKS.UPDATED_AT lets readers keep a copy of TASKS current by re-reading only the rows changed
+# since their last read (see analytics.py). It is stamped by the database clock on every update and,
+# on Postgres, on insert too. SQLite does not need the insert stamp: it runs one write transaction
+# at a time, so rows added since a read are exactly those above the largest ID it saw.
+TASKS_UPDATED_INDEX = "CREATE INDEX IF NOT EXISTS IDX_TASKS_UPDATED_AT ON TASKS (UPDATED_AT);"
+# The database clock less an overlap in seconds, taken before such a read: the UPDATED_AT the next
+# read starts from. On Postgres rows are stamped when written, not when their transaction commits,
+# so the overlap must cover the longest write transaction.
+TASKS_UPDATED_MARK = {
+    "sqlite": "SELECT strftime('%Y-%m-%d %H:%M:%f', 'now', '-' || ? || ' seconds')",
+    "postgres": "SELECT clock_timestamp()::timestamp - make_interval(secs => ?)",
+}
+TASK_UPDATE_TRIGGERS = {
+    "sqlite": [
+        """
+        CREATE TRIGGER IF NOT EXISTS TASKS_TOUCHED AFTER UPDATE ON TASKS
+        WHEN NEW.UPDATED_AT IS OLD.UPDATED_AT
+        BEGIN
+            UPDATE TASKS SET UPDATED_AT = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE ID = NEW.ID;
+        END;
+        """,
+    ],
+    "postgres": [
+        """
+        CREATE OR REPLACE FUNCTION TOUCH_TASK() RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.UPDATED_AT := clock_timestamp()::timestamp;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """,
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'tasks_touched' AND tgrelid = 'tasks'::regclass) THEN
+                CREATE TRIGGER TASKS_TOUCHED BEFORE INSERT OR UPDATE ON TASKS
+                FOR EACH ROW EXECUTE FUNCTION TOUCH_TASK();
+            END IF;
+        END;
+        $$;
+        """,
+    ],
+}
+
+SCHEMA = {
+    "sqlite": [CONTACTS_TABLE_SQLITE, *CONTACTS_INDEXES, TASKS_TABLE_SQLITE, *TASKS_INDEXES,
+               NOTIFICATIONS_TABLE_SQLITE, OUTBOX_TABLE_SQLITE, OUTBOX_INDEX,
+               *DEPENDENCY_TABLES["sqlite"], *DEPENDENCY_INDEXES,
+               TASK_CHANGES_TABLE_SQLITE, *TASK_CHANGE_TRIGGERS["sqlite"]],
+    "postgres": [CONTACTS_TABLE_POSTGRES, *CONTACTS_INDEXES, TASKS_TABLE_POSTGRES, *TASKS_INDEXES,
+                 NOTIFICATIONS_TABLE_POSTGRES, OUTBOX_TABLE_POSTGRES, OUTBOX_INDEX,
+                 *DEPENDENCY_TABLES["postgres"], *DEPENDENCY_INDEXES,
+                 TASK_CHANGES_TABLE_POSTGRES, *TASK_CHANGE_TRIGGERS["postgres"]],
+}
+
+# Concurrent create_schema calls (e.g. from shards) are serialized on Postgres, where two
+# sessions creating or replacing the same object at once can fail
+SCHEMA_LOCK_ID = 7326101
+
+
+# The DEADLINE column is compared against plain range bounds (never wrapped in a function),
+# so each lead-time window is an index range scan on IDX_TASKS_OPEN_DEADLINE.
+# Reminders already recorded as sent in the NOTIFICATIONS ledger are skipped. DEADLINE is returned
+# as stored, since the ledger and outbox are keyed on (and anti-joined against) the exact value.
+DUE_TASKS_SQLITE = """
+WITH WINDOWS (LEAD_DAYS, WINDOW_START, WINDOW_END) AS (
+    VALUES {windows}
+)
+SELECT t.ID, t.TITLE, t.DEADLINE, c.EMAIL, c.NAME, w.LEAD_DAYS{extra_columns}
+FROM WINDOWS w
+JOIN TASKS t ON t.DEADLINE >= w.WINDOW_START AND t.DEADLINE < w.WINDOW_END
+JOIN CONTACTS c ON t.ASSIGNED_TO = c.ID
+WHERE t.STATUS NOT IN ('Completed', 'Reviewed & Approved')
+  AND {not_yet_sent}{slot_filter}{shard_filter}{change_filter}
+{order_by}
+"""
+
+DUE_TASKS_POSTGRES = """
+SELECT t.ID, t.TITLE, t.DEADLINE, c.EMAIL, c.NAME, w.LEAD_DAYS{extra_columns}
+FROM unnest(%s::int[], %s::timestamp[], %s::timestamp[]) AS w (LEAD_DAYS, WINDOW_START, WINDOW_END)
+JOIN TASKS t ON t.DEADLINE >= w.WINDOW_START AND t.DEADLINE < w.WINDOW_END
+JOIN CONTACTS c ON t.ASSIGNED_TO = c.ID
+WHERE t.STATUS NOT IN ('Completed', 'Reviewed & Approved')
+  AND {not_yet_sent}{slot_filter}{shard_filter}{change_filter}
+{order_by}
+"""
+
+# Scheduled runs only fetch the contacts of one send slot (see slots.py): a (timezone, preferred hour)
+# group, and within it the contacts whose slot minute falls in a range. The minute is derived from the
+# contact ID and the date, so a group's contacts are spread evenly and change places from day to day.
+SLOT_FILTER_SQLITE = """
+  AND COALESCE(c.TIMEZONE, ?) = ? AND COALESCE(c.PREFERRED_HOUR, ?) = ?
+  AND (c.ID * 7 + ?) % ? >= ? AND (c.ID * 7 + ?) % ? < ?"""
+
+SLOT_FILTER_POSTGRES = """
+  AND COALESCE(c.TIMEZONE, %s) = %s AND COALESCE(c.PREFERRED_HOUR, %s) = %s
+  AND MOD(c.ID * 7 + %s, %s) >= %s AND MOD(c.ID * 7 + %s, %s) < %s"""
+
+# Sharded runs (see shards.py) split contacts by ASSIGNED_TO modulo the shard count. IDs are
+# sequential, so shards get an even share, and all of a contact's tasks land in the same shard.
+SHARD_FILTER_SQLITE = """
+  AND t.ASSIGNED_TO % ? = ?"""
+
+SHARD_FILTER_POSTGRES = """
+  AND MOD(t.ASSIGNED_TO, %s) = %s"""
+
+# Change-driven runs (see changes.py) only look at the tasks logged in TASK_CHANGES up to a change ID
+CHANGE_FILTER_SQLITE = """
+  AND t.ID IN (SELECT TASK_ID FROM TASK_CHANGES WHERE ID <= ?)"""
+
+CHANGE_FILTER_POSTGRES = """
+  AND t.ID IN (SELECT TASK_ID FROM TASK_CHANGES WHERE ID <= %s)"""
+
+SEND_GROUPS = """
+SELECT DISTINCT COALESCE(TIMEZONE, ?), COALESCE(PREFERRED_HOUR, ?)
+FROM CONTACTS
+"""
+
+# Digest mode: the same rows grouped per assignee, most urgent first within each contact
+DIGEST_COLUMNS = ", t.ASSIGNED_TO, t.PRIORITY"
+DIGEST_ORDER = """
+ORDER BY t.ASSIGNED_TO,
+         CASE t.PRIORITY WHEN 'High' THEN 0 WHEN 'Medium' THEN 1 ELSE 2 END,
+         t.DEADLINE, t.ID
+"""
+
+INSERT_CONTACT = """
+INSERT INTO CONTACTS (NAME, PHONE, EMAIL, ADDRESS, TIMEZONE, PREFERRED_HOUR)
+VALUES (?, ?, ?, ?, ?, ?)
+RETURNING ID, NAME, PHONE, EMAIL, ADDRESS, TIMEZONE, PREFERRED_HOUR
+"""
+
+# Contact browser pages: contacts after the (LOWER(NAME), ID) keyset of the previous page's last row,
+# one more than the page size to tell whether another page follows
+SEARCH_CONTACTS = """
+SELECT ID, NAME, PHONE, EMAIL, ADDRESS, TIMEZONE, PREFERRED_HOUR, LOWER(NAME)
+FROM CONTACTS
+WHERE (LOWER(NAME), ID) > (?, ?)
+{search_filter}
+ORDER BY LOWER(NAME), ID
+LIMIT ?
+"""
+SEARCH_FILTER = "AND (LOWER(NAME) LIKE LOWER(?) ESCAPE '\\' OR LOWER(EMAIL) LIKE LOWER(?) ESCAPE '\\')"
+# Shorter searches match prefixes only: a trigram index cannot narrow a substring of one or two characters
+SUBSTRING_SEARCH_MIN = 3
+
+# Each branch is a lookup on its own index (the unique phone constraint, IDX_CONTACTS_EMAIL)
+DUPLICATE_CONTACTS = """
+SELECT ID, NAME, PHONE, EMAIL, ADDRESS, TIMEZONE, PREFERRED_HOUR FROM CONTACTS WHERE PHONE = ?
+UNION
+SELECT ID, NAME, PHONE, EMAIL, ADDRESS, TIMEZONE, PREFERRED_HOUR FROM CONTACTS WHERE LOWER(EMAIL) = LOWER(?)
+ORDER BY ID
+"""
+
+
+# Bulk contact import: rows are loaded into a staging table (with COPY on Postgres),
+# checked against existing contacts, then merged in a single INSERT ... SELECT
+CONTACTS_STAGING_SQLITE = """
+CREATE TEMP TABLE CONTACTS_STAGING (ROW_NUMBER INTEGER, NAME TEXT, PHONE INTEGER, EMAIL TEXT, ADDRESS TEXT)
+"""
+
+CONTACTS_STAGING_POSTGRES = """
+CREATE TEMP TABLE CONTACTS_STAGING (ROW_NUMBER INT, NAME VARCHAR(100), PHONE BIGINT, EMAIL VARCHAR(100), ADDRESS TEXT)
+ON COMMIT DROP
+"""
+
+# Emails are compared case-insensitively (on IDX_CONTACTS_EMAIL), as the importer's in-file check does
+STAGED_CONFLICTS = """
+SELECT s.ROW_NUMBER,
+       CASE WHEN EXISTS (SELECT 1 FROM CONTACTS c WHERE c.PHONE = s.PHONE)
+            THEN 'Phone already exists' ELSE 'Email already exists' END
+FROM CONTACTS_STAGING s
+WHERE EXISTS (SELECT 1 FROM CONTACTS c WHERE c.PHONE = s.PHONE)
+   OR EXISTS (SELECT 1 FROM CONTACTS c WHERE LOWER(c.EMAIL) = LOWER(s.EMAIL))
+"""
+
+MERGE_STAGED_CONTACTS = """
+INSERT INTO CONTACTS (NAME, PHONE, EMAIL, ADDRESS)
+SELECT s.NAME, s.PHONE, s.EMAIL, s.ADDRESS
+FROM CONTACTS_STAGING s
+WHERE NOT EXISTS (SELECT 1 FROM CONTACTS c WHERE c.PHONE = s.PHONE)
+  AND NOT EXISTS (SELECT 1 FROM CONTACTS c WHERE LOWER(c.EMAIL) = LOWER(s.EMAIL))
+ON CONFLICT DO NOTHING
+RETURNING ID, PHONE
+"""
+
+
+class DueTask(NamedTuple):
+    task_id: int
+    title: str
+    deadline: str | datetime  # As stored: a datetime on Postgres
+    email: str
+    name: str
+    lead_days: int
+
+
+class DigestTask(NamedTuple):
+    task_id: int
+    title: str
+    deadline: str | datetime  # As stored: a datetime on Postgres
+    priority: str
+    lead_days: int
+
+
+class Digest(NamedTuple):
+    """All of one contact's due tasks, in priority then deadline order."""
+    contact_id: int
+    email: str
+    name: str
+    tasks: list
+
+
+class Contact(NamedTuple):
+    id: int
+    name: str
+    phone: int
+    email: str
+    address: str
+    timezone: str = None
+    preferred_hour: int = None
+
+
+class StorageError(Exception):
+    """A database error from either backend."""
+
+
+def _database_errors():
+    errors = [sqlite3.Error]
+    try:
+        import psycopg2
+        errors.append(psycopg2.Error)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+class SQLitePool:
+    """A small pool of SQLite connections, with the same getconn/putconn interface as psycopg2.pool."""
+
+    def __init__(self, path):
+        self.path = path
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = 1")
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def getconn(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def putconn(self, conn, close=False):
+        if close:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    def closeall(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class Storage:
+    """
+    Database access shared by the notifier, the workers and the contact manager.
+    Connections come from a pool (psycopg2's ThreadedConnectionPool for Postgres), so the
+    TLS handshake to Neon is paid once per pooled connection rather than once per request.
+    Frequently run statements go through `execute`, which prepares them once per connection
+    on Postgres; SQLite's per-connection statement cache gives the same effect for reused connections.
+    Queries are written with `?` placeholders and translated for psycopg2.
+    """
+
+    def __init__(self, backend=DB_BACKEND, path=DATABASE_PATH, min_connections=DB_POOL_MIN, max_connections=DB_POOL_MAX):
+        self.backend = backend
+        self.path = path
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.errors = _database_errors()
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        # Statement names prepared on each connection, dropped with the connection itself
+        self._prepared = weakref.WeakKeyDictionary()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                if self.backend == "postgres":
+                    from psycopg2.pool import ThreadedConnectionPool
+
+                    self._pool = ThreadedConnectionPool(self.min_connections, self.max_connections, **self._postgres_settings())
+                    # psycopg2 closes returned connections beyond minconn; keeping them idle up to maxconn
+                    # means each one pays its TLS handshake (and statement preparation) only once
+                    self._pool.minconn = self.max_connections
+                else:
+                    self._pool = SQLitePool(self.path)
+            return self._pool
+
+    @staticmethod
+    def _postgres_settings():
+        return {
+            "host": os.getenv('DB_HOST'),
+            "database": os.getenv('DB_NAME'),
+            "user": os.getenv('DB_USER'),
+            "password": os.getenv('DB_PASSWORD'),
+            "port": os.getenv('DB_PORT'),
+            "sslmode": DB_SSLMODE
+        }
+
+    def listen(self, channel):
+        """
+        Open a dedicated autocommit connection (Postgres only, outside the pool) that receives
+        NOTIFYs on `channel`. The caller waits on it with select() and closes it when done.
+        """
+        import psycopg2
+
+        try:
+            conn = psycopg2.connect(**self._postgres_settings())
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {channel}")
+        except self.errors as e:
+            raise StorageError(str(e)) from e
+        return conn
+
+    def sql(self, query):
+        """Translate `?` placeholders to the backend's parameter style."""
+        return query.replace("?", "%s") if self.backend == "postgres" else query
+
+    @contextmanager
+    def connection(self, immediate=False):
+        """
+        Borrow a pooled connection for one transaction, committed on success and rolled back on error.
+        On SQLite, `immediate=True` takes the write lock up front (BEGIN IMMEDIATE).
+        Database errors are re-raised as StorageError.
+        """
+        pool = self._get_pool()
+        self._slots.acquire()
+        conn = pool.getconn()
+        discard = False
+        try:
+            if self.backend == "sqlite":
+                conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            yield conn
+            conn.commit()
+        except BaseException as e:
+            try:
+                conn.rollback()
+            except self.errors:
+                discard = True
+            if self.backend == "postgres" and conn.closed:
+                discard = True
+            if isinstance(e, self.errors):
+                raise StorageError(str(e)) from e
+            raise
+        finally:
+            if discard:
+                self._prepared.pop(conn, None)
+            pool.putconn(conn, close=discard)
+            self._slots.release()
+
+    def execute(self, cursor, name, query, params=(), many=False):
+        """Run a frequently used statement, prepared once per connection on Postgres."""
+        if self.backend == "postgres":
+            prepared = self._prepared.setdefault(cursor.connection, set())
+            if name not in prepared:
+                numbered = iter(range(1, query.count("?") + 1))
+                cursor.execute(f"PREPARE {name} AS " + re.sub(r"\?", lambda _: f"${next(numbered)}", query))
+                prepared.add(name)
+            count = query.count("?")
+            query = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * count)})" if count else "")
+        if many:
+            cursor.executemany(query, params)
+        else:
+            cursor.execute(query, params)
+        return cursor
+
+    def copy_out(self, cursor, query, params=()):
+        """
+        Return the rows of `query` as CSV text, for pandas' C parser to turn into columns: via
+        COPY ... TO STDOUT on Postgres, and on SQLite by csv.writer consuming the cursor (both
+        without a Python-level loop over the rows).
+        """
+        buffer = io.StringIO()
+        if self.backend == "postgres":
+            cursor.copy_expert(f"COPY ({cursor.mogrify(self.sql(query), params).decode()}) TO STDOUT WITH (FORMAT csv)", buffer)
+        else:
+            cursor.execute(query, params)
+            csv.writer(buffer).writerows(cursor)
+        buffer.seek(0)
+        return buffer
+
+    def create_schema(self):
+        with self.connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            if self.backend == "postgres":
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+            for statement in SCHEMA[self.backend]:
+                cursor.execute(statement)
+            self._add_missing_columns(cursor)
+            cursor.execute(CONTACTS_SLOT_INDEX)
+            cursor.execute(TASKS_UPDATED_INDEX)
+            for statement in TASK_UPDATE_TRIGGERS[self.backend]:
+                cursor.execute(statement)
+            if self.backend == "postgres":
+                self._create_search_indexes(cursor)
+
+    def _create_search_indexes(self, cursor):
+        # Searches still work without pg_trgm (e.g. where extensions cannot be installed), by scanning
+        cursor.execute("SAVEPOINT search_indexes")
+        try:
+            for statement in CONTACTS_SEARCH_INDEXES_POSTGRES:
+                cursor.execute(statement)
+        except self.errors as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT search_indexes")
+            log("search_indexes_skipped", error=str(e).splitlines()[0])
+        cursor.execute("RELEASE SAVEPOINT search_indexes")
+
+    def _add_missing_columns(self, cursor):
+        # Only columns that are actually missing are altered: on Postgres even ADD COLUMN IF NOT EXISTS
+        # takes an ACCESS EXCLUSIVE lock, which would queue behind every open read of the table
+        for table, column, definition in ADDED_COLUMNS:
+            if column not in self._table_columns(cursor, table):
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _table_columns(self, cursor, table):
+        if self.backend == "postgres":
+            cursor.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s",
+                (table.lower(),)
+            )
+            return {row[0].upper() for row in cursor.fetchall()}
+        cursor.execute(f"PRAGMA table_info({table})")
+        return {row[1].upper() for row in cursor.fetchall()}
+
+    def send_groups(self, default_timezone=DEFAULT_TIMEZONE, default_hour=DEFAULT_SEND_HOUR):
+        """Return the distinct (timezone, preferred hour) pairs of all contacts, defaults filled in."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql(SEND_GROUPS), (default_timezone, default_hour))
+            return cursor.fetchall()
+
+    @staticmethod
+    def _slot_params(slot):
+        day = slot.local_date.toordinal()
+        return (DEFAULT_TIMEZONE, slot.timezone, DEFAULT_SEND_HOUR, slot.hour,
+                day, SEND_SPREAD_MINUTES, slot.first_minute, day, SEND_SPREAD_MINUTES, slot.end_minute)
+
+    def _iter_due_rows(self, windows, chunk_size, extra_columns="", order_by="", slot=None, shard=None, changes=None):
+        slot_params = self._slot_params(slot) if slot else ()
+        shard_params = (shard[1], shard[0]) if shard else ()
+        change_params = (changes,) if changes is not None else ()
+        with self.connection() as conn:
+            if self.backend == "postgres":
+                cursor = conn.cursor(name="due_tasks")
+                cursor.itersize = chunk_size
+                cursor.execute(
+                    DUE_TASKS_POSTGRES.format(
+                        not_yet_sent=NOT_YET_SENT, extra_columns=extra_columns, order_by=order_by,
+                        slot_filter=SLOT_FILTER_POSTGRES if slot else "", shard_filter=SHARD_FILTER_POSTGRES if shard else "",
+                        change_filter=CHANGE_FILTER_POSTGRES if changes is not None else ""
+                    ),
+                    ([w[0] for w in windows], [w[1] for w in windows], [w[2] for w in windows],
+                     *slot_params, *shard_params, *change_params)
+                )
+            else:
+                cursor = conn.cursor()
+                cursor.execute(
+                    DUE_TASKS_SQLITE.format(
+                        windows=", ".join(["(?, ?, ?)"] * len(windows)), not_yet_sent=NOT_YET_SENT,
+                        extra_columns=extra_columns, order_by=order_by,
+                        slot_filter=SLOT_FILTER_SQLITE if slot else "", shard_filter=SHARD_FILTER_SQLITE if shard else "",
+                        change_filter=CHANGE_FILTER_SQLITE if changes is not None else ""
+                    ),
+                    [value for window in windows for value in window] + list(slot_params) + list(shard_params) + list(change_params)
+                )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def iter_due_tasks(self, windows, chunk_size, slot=None, shard=None, changes=None):
+        """
+        Yield lists of DueTask for open tasks whose deadline falls in one of the
+        (lead_days, start, end) windows, streamed `chunk_size` rows at a time
+        (through a server-side cursor on Postgres). With a SendSlot, only the
+        tasks of contacts in that slot are returned, with an (index, count)
+        shard only those of contacts in that shard, and with a change ID only
+        tasks logged in TASK_CHANGES up to that ID.
+        """
+        for rows in self._iter_due_rows(windows, chunk_size, slot=slot, shard=shard, changes=changes):
+            yield [DueTask(*row) for row in rows]
+
+    def iter_due_digests(self, windows, chunk_size, slot=None, shard=None, changes=None):
+        """
+        Like iter_due_tasks, but yield lists of Digest: one per contact with all of their
+        due tasks. Rows come back ordered by assignee, so each chunk holds whole digests
+        of about `chunk_size` tasks in total.
+        """
+        chunk, size, current = [], 0, None
+        for rows in self._iter_due_rows(windows, chunk_size, DIGEST_COLUMNS, DIGEST_ORDER, slot, shard, changes):
+            for task_id, title, deadline, email, name, lead_days, contact_id, priority in rows:
+                if current is None or current.contact_id != contact_id:
+                    if size >= chunk_size:
+                        yield chunk
+                        chunk, size = [], 0
+                    current = Digest(contact_id, email, name, [])
+                    chunk.append(current)
+                current.tasks.append(DigestTask(task_id, title, deadline, priority, lead_days))
+                size += 1
+        if chunk:
+            yield chunk
+
+    def insert_contact(self, name, phone, email, address, timezone=None, preferred_hour=None):
+        """Insert a contact and return the stored record."""
+        with self.connection() as conn:
+            cursor = self.execute(
+                conn.cursor(), "insert_contact", INSERT_CONTACT, (name, phone, email, address, timezone, preferred_hour)
+            )
+            return Contact(*cursor.fetchone())
+
+    def search_contacts(self, query="", after=None, limit=50):
+        """
+        Return (contacts, after) for one page of up to `limit` Contacts in name order, where `after`
+        is the keyset to pass for the next page (None on the last one). A query matches names and
+        emails containing it, or starting with it when shorter than SUBSTRING_SEARCH_MIN.
+        """
+        query = query.strip()
+        params = list(after or ("", 0))
+        if query:
+            pattern = re.sub(r"([\\%_])", r"\\\1", query)
+            pattern = f"%{pattern}%" if len(query) >= SUBSTRING_SEARCH_MIN else f"{pattern}%"
+            params += [pattern, pattern]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                self.sql(SEARCH_CONTACTS.format(search_filter=SEARCH_FILTER if query else "")), (*params, limit + 1)
+            )
+            rows = cursor.fetchall()
+        if len(rows) <= limit:
+            return [Contact(*row[:-1]) for row in rows], None
+        last = rows[limit - 1]
+        return [Contact(*row[:-1]) for row in rows[:limit]], (last[-1], last[0])
+
+    def find_duplicate_contacts(self, phone=None, email=None):
+        """Return the Contacts that already have this phone number or (in any case) this email."""
+        with self.connection() as conn:
+            cursor = self.execute(conn.cursor(), "duplicate_contacts", DUPLICATE_CONTACTS, (phone, email))
+            return [Contact(*row) for row in cursor.fetchall()]
+
+    def import_contacts(self, rows):
+        """
+        Bulk insert (row_number, name, phone, email, address) rows with one COPY (Postgres) or
+        executemany (SQLite) into a staging table and one merge into CONTACTS.
+        Returns {row_number: (status, contact_id, reason)} with status 'Accepted' or 'Rejected'.
+        """
+        rows = [(int(row), name, int(phone), email, address) for row, name, phone, email, address in rows]
+        outcomes = {}
+        if not rows:
+            return outcomes
+        with self.connection(immediate=True) as conn:
+            cursor = conn.cursor()
+            if self.backend == "postgres":
+                cursor.execute(CONTACTS_STAGING_POSTGRES)
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    "COPY CONTACTS_STAGING (ROW_NUMBER, NAME, PHONE, EMAIL, ADDRESS) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+            else:
+                cursor.execute(CONTACTS_STAGING_SQLITE)
+                cursor.executemany("INSERT INTO CONTACTS_STAGING VALUES (?, ?, ?, ?, ?)", rows)
+
+            cursor.execute(STAGED_CONFLICTS)
+            for row, reason in cursor.fetchall():
+                outcomes[row] = ("Rejected", None, reason)
+            cursor.execute(MERGE_STAGED_CONTACTS)
+            row_by_phone = {phone: row for row, _, phone, _, _ in rows}
+            for contact_id, phone in cursor.fetchall():
+                outcomes[row_by_phone[phone]] = ("Accepted", contact_id, "")
+            if self.backend == "sqlite":
+                cursor.execute("DROP TABLE temp.CONTACTS_STAGING")
+
+        # Rows that lost a race with a concurrent insert hit ON CONFLICT DO NOTHING
+        for row, *_ in rows:
+            outcomes.setdefault(row, ("Rejected", None, "Phone or email already exists"))
+        return outcomes
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._prepared.clear()
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage(backend=None):
+    """
+    Return the process-wide Storage, opened for `backend` (DB_BACKEND by default) on first use.
+    Asking for another backend than the one it was opened for is an error, not a silent switch.
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = Storage(backend or DB_BACKEND)
+        elif backend is not None and backend != _storage.backend:
+            raise StorageError(f"Storage is already open for {_storage.backend}, not {backend}")
+        return _storage
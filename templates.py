@@ -0,0 +1,126 @@
+import html
+import os
+import re
+import threading
+
+from metrics import log
+
+TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+
+# Placeholders look like {{ task_title }}
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class Template:
+    """
+    A text template compiled once into literal segments and substitution tags.
+    `tagged` is the source with each placeholder replaced by its tag (e.g. -task_title-),
+    which is what the provider fills in for batched sends.
+    """
+
+    def __init__(self, source, tag_format="-{}-"):
+        parts = PLACEHOLDER.split(source)
+        self.literals = parts[0::2]
+        self.fields = parts[1::2]
+        self.tags = [tag_format.format(field) for field in self.fields]
+        self.tagged = self.render({tag: tag for tag in self.tags})
+
+    def render(self, substitutions):
+        """Fill in the template from a tag -> value mapping in one pass."""
+        out = [self.literals[0]]
+        for tag, literal in zip(self.tags, self.literals[1:]):
+            out.append(substitutions[tag])
+            out.append(literal)
+        return "".join(out)
+
+
+class EmailTemplate:
+    """
+    Subject, plain-text and HTML templates read from `<name>.subject.txt`, `<name>.txt`
+    and `<name>.html` in the template directory. Values are HTML-escaped for the HTML
+    body: it uses its own `-field_html-` tags, so escaping also holds in batch mode.
+
+    With `item_fields`, `<name>.item.txt` and `<name>.item.html` are rendered once per item
+    of a list and joined into the `{{ items }}` placeholder.
+    """
+
+    def __init__(self, name, fields, directory=TEMPLATE_DIR, item_fields=()):
+        self.name = name
+        self.fields = tuple(fields)
+        self.item_fields = tuple(item_fields)
+        self.paths = template_paths(name, directory, bool(item_fields))
+        subject, plain_text, html_body, *item_parts = [self._read(path) for path in self.paths]
+        self.subject = Template(subject.strip())
+        self.plain_text = Template(plain_text.rstrip("\n"))
+        self.html = Template(html_body, tag_format="-{}_html-")
+        self.item_plain_text = self.item_html = None
+        if item_parts:
+            self.item_plain_text = Template(item_parts[0].rstrip("\n"))
+            self.item_html = Template(item_parts[1].rstrip("\n"), tag_format="-{}_html-")
+
+        known = set(self.fields) | ({"items"} if item_fields else set())
+        unknown = {field for part in (self.subject, self.plain_text, self.html) for field in part.fields} - known
+        if item_parts:
+            unknown |= {field for part in (self.item_plain_text, self.item_html) for field in part.fields} - set(self.item_fields)
+        if unknown:
+            raise ValueError(f"Template '{name}' uses unknown placeholder(s): {', '.join(sorted(unknown))}")
+
+    @staticmethod
+    def _read(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    @staticmethod
+    def _escaped(fields, values):
+        substitutions = {}
+        for field in fields:
+            value = str(values.get(field) or "")
+            substitutions[f"-{field}-"] = value
+            substitutions[f"-{field}_html-"] = html.escape(value)
+        return substitutions
+
+    def substitutions(self, values, items=()):
+        """Tag -> value mapping for one recipient, with escaped copies for the HTML body."""
+        substitutions = self._escaped(self.fields, values)
+        if self.item_fields:
+            rendered = [self._escaped(self.item_fields, item) for item in items]
+            substitutions["-items-"] = "\n".join(self.item_plain_text.render(item) for item in rendered)
+            substitutions["-items_html-"] = "".join(self.item_html.render(item) for item in rendered)
+        return substitutions
+
+    def render(self, substitutions):
+        """Return (subject, plain_text, html) for one recipient."""
+        return (
+            self.subject.render(substitutions),
+            self.plain_text.render(substitutions),
+            self.html.render(substitutions)
+        )
+
+
+def template_paths(name, directory, with_items=False):
+    suffixes = [".subject.txt", ".txt", ".html"] + ([".item.txt", ".item.html"] if with_items else [])
+    return [os.path.join(directory, name + suffix) for suffix in suffixes]
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(name, fields, directory=TEMPLATE_DIR, item_fields=()):
+    """
+    Return the compiled EmailTemplate, compiling it on first use and again only
+    when one of its files has changed, so edits apply without a restart.
+    """
+    mtimes = tuple(os.stat(path).st_mtime_ns for path in template_paths(name, directory, bool(item_fields)))
+    key = (name, directory)
+    with _templates_lock:
+        cached = _templates.get(key)
+        if cached is None:
+            cached = _templates[key] = (mtimes, EmailTemplate(name, fields, directory, item_fields))
+        elif cached[0] != mtimes:
+            try:
+                cached = _templates[key] = (mtimes, EmailTemplate(name, fields, directory, item_fields))
+            except (OSError, ValueError) as e:
+                # Keep sending with the last good version until the edit is fixed
+                log("template_reload_error", template=name, error=str(e))
+        return cached[1]
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import storage as storage_module
+from dispatch import EmailDispatcher, SendResult, classify_send
+from llm import DIGEST_PROMPT, MessageGenerator, StubBackend
+from storage import Storage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """A fresh SQLite database with the full schema, also returned by get_storage()."""
+    db = Storage(backend="sqlite", path=str(tmp_path / "tasks.db"))
+    db.create_schema()
+    monkeypatch.setattr(storage_module, "_storage", db)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def app_module(storage, tmp_path, monkeypatch):
+    """The app module, run against the `storage` database from a scratch working directory."""
+    monkeypatch.chdir(tmp_path)
+    import app
+
+    return app
+
+
+@pytest.fixture
+def add_contact(storage):
+    """Insert a contact and return its ID; phone and email default to unique values."""
+    count = iter(range(1, 10000))
+
+    def add(name="Asha Rao", phone=None, email=None, timezone=None, preferred_hour=None):
+        n = next(count)
+        contact = storage.insert_contact(name, phone or 9000000000 + n, email or f"contact{n}@example.com",
+                                         None, timezone, preferred_hour)
+        return contact.id
+
+    return add
+
+
+@pytest.fixture
+def add_task(storage):
+    """Insert a task and return its ID; the deadline defaults to three days from now."""
+
+    def add(assigned_to, title="Write report", deadline=None, status="Not Started", estimated_time="1 day",
+            dependencies=None, priority="Medium", started_at=None, completed_at=None):
+        deadline = deadline or datetime.now() + timedelta(days=3)
+        with storage.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO TASKS (TITLE, DEADLINE, ASSIGNED_TO, ESTIMATED_TIME, STATUS, DEPENDENCIES, PRIORITY,"
+                " STARTED_AT, COMPLETED_AT) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) RETURNING ID",
+                (title, deadline.strftime("%Y-%m-%d %H:%M"), assigned_to, estimated_time, status, dependencies,
+                 priority, started_at, completed_at)
+            )
+            return cursor.fetchone()[0]
+
+    return add
+
+
+class FakeTransport:
+    """Records the rendered emails it is given; recipients in `failing` get that status code instead of 202."""
+
+    provider = "fake"
+
+    def __init__(self):
+        self.sent = []
+        self.failing = {}
+        self.calls = 0
+
+    def send(self, email):
+        return self.send_batch([email])[0]
+
+    def send_batch(self, emails):
+        self.calls += 1
+        results = []
+        for email in emails:
+            status = self.failing.get(email.to, 202)
+            if status == 202:
+                self.sent.append(email.rendered())
+            results.append(SendResult(email, status, f"msg-{len(self.sent)}", None if status == 202 else "rejected", 0.0))
+        return results
+
+    @staticmethod
+    def classify(result, error):
+        return classify_send(result, error)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def transport(app_module, monkeypatch):
+    """A FakeTransport behind the app's dispatcher, with the offline LLM backend."""
+    transport = FakeTransport()
+    monkeypatch.setattr(app_module, "_dispatcher", EmailDispatcher(transport, max_workers=2))
+    monkeypatch.setattr(app_module, "_message_generator", MessageGenerator(StubBackend()))
+    monkeypatch.setattr(app_module, "_digest_generator", MessageGenerator(StubBackend(), prompt=DIGEST_PROMPT))
+    yield transport
+    app_module.close_dispatcher()
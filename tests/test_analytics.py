@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pytest
+
+import analytics
+from analytics import TaskSnapshot, get_task_snapshot
+
+
+def update(storage, task_id, **columns):
+    with storage.connection() as conn:
+        conn.cursor().execute(
+            f"UPDATE TASKS SET {', '.join(f'{name.upper()} = ?' for name in columns)} WHERE ID = ?", (*columns.values(), task_id)
+        )
+
+
+def test_first_refresh_loads_typed_columns(storage, add_contact, add_task):
+    contact = add_contact()
+    task_id = add_task(contact, deadline=datetime(2026, 5, 3, 9), estimated_time="2 days", priority="High")
+    add_task(contact, estimated_time="soon")
+    snapshot = TaskSnapshot(storage)
+    assert snapshot.refresh() == 2
+    frame = snapshot.frame
+    assert frame.loc[task_id, "deadline"] == datetime(2026, 5, 3, 9) and frame.loc[task_id, "priority"] == "High"
+    assert str(frame["status"].dtype) == "category" and frame["assigned_to"].dtype == "int64"
+    assert frame.loc[task_id, "estimate_hours"] == analytics.duration_hours("2 days")
+    assert frame["estimate_hours"].isna().sum() == 1
+
+
+def test_later_refreshes_pick_up_added_and_updated_tasks(storage, add_contact, add_task):
+    contact = add_contact()
+    first = add_task(contact)
+    snapshot = TaskSnapshot(storage)
+    snapshot.refresh()
+    added = add_task(contact, priority="Low")
+    update(storage, first, status="Completed")
+    snapshot.refresh()
+    assert sorted(snapshot.frame.index) == [first, added]
+    assert snapshot.frame.loc[first, "status"] == "Completed" and snapshot.frame.loc[added, "priority"] == "Low"
+
+
+def test_only_changed_tasks_are_read_again(storage, add_contact, add_task):
+    contact = add_contact()
+    for _ in range(5):
+        add_task(contact)
+    snapshot = TaskSnapshot(storage, overlap=-3600)  # No overlap window: unchanged tasks are not re-read
+    assert snapshot.refresh() == 5
+    add_task(contact)
+    assert snapshot.refresh() == 1 and len(snapshot.frame) == 6
+
+
+def test_deleted_tasks_trigger_a_full_reload(storage, add_contact, add_task):
+    contact = add_contact()
+    kept, deleted = add_task(contact), add_task(contact)
+    snapshot = TaskSnapshot(storage, overlap=-3600)
+    snapshot.refresh()
+    with storage.connection() as conn:
+        conn.cursor().execute("DELETE FROM TASKS WHERE ID = ?", (deleted,))
+    assert snapshot.refresh() == 1
+    assert list(snapshot.frame.index) == [kept]
+
+
+def test_summary_and_workload_use_whole_columns(storage, add_contact, add_task):
+    asha, ravi = add_contact(), add_contact()
+    now = datetime(2026, 5, 10, 12)
+    add_task(asha, deadline=datetime(2026, 5, 1), status="In Progress")  # Overdue
+    add_task(asha, deadline=datetime(2026, 5, 20))
+    add_task(ravi, deadline=datetime(2026, 5, 1), status="Completed", estimated_time="1 day",
+             started_at="2026-04-01 09:00:00", completed_at="2026-04-03 09:00:00")
+    snapshot = TaskSnapshot(storage)
+    snapshot.refresh()
+    summary = snapshot.summary(now)
+    assert (summary["tasks"], summary["open"], summary["overdue"], summary["completed"]) == (3, 2, 1, 1)
+    assert summary["cycle_hours_p50"] == 48.0
+    assert summary["estimate_ratio_p50"] == pytest.approx(48.0 / analytics.duration_hours("1 day"))
+    workload = snapshot.workload(now)
+    assert list(workload.index) == [asha, ravi] and workload.loc[asha, "overdue"] == 1
+    assert snapshot.cycle_times().loc["Medium", "completed"] == 1
+
+
+def test_get_task_snapshot_refreshes_only_when_stale(storage, add_contact, add_task, monkeypatch):
+    monkeypatch.setattr(analytics, "_snapshot", None)
+    add_task(add_contact())
+    snapshot = get_task_snapshot(storage)
+    refreshed_at = snapshot.refreshed_at
+    assert get_task_snapshot(storage) is snapshot and snapshot.refreshed_at == refreshed_at
+    assert get_task_snapshot(storage, max_age=0).refreshed_at > refreshed_at
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_importing_app_creates_no_clients_or_files(tmp_path):
+    # A fresh interpreter, since other tests may already have imported (and used) app
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "DB_BACKEND": "sqlite", "DATABASE_PATH": str(tmp_path / "tasks.db")}
+    code = "import app; assert app._dispatcher is None and app._message_generator is None"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, check=True)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_generators_are_created_once_and_share_the_cache(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "_message_generator", None)
+    monkeypatch.setattr(app_module, "_digest_generator", None)
+    generator = app_module.get_message_generator()
+    assert app_module.get_message_generator() is generator
+    assert app_module.get_digest_generator().cache is generator.cache
+    assert app_module.get_digest_generator().backend is generator.backend
+
+
+def test_closed_dispatcher_is_replaced_on_next_use(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "_dispatcher", None)
+    dispatcher = app_module.get_dispatcher()
+    app_module.close_dispatcher()
+    assert app_module._dispatcher is None
+    assert app_module.get_dispatcher() is not dispatcher
+    app_module.close_dispatcher()
+
+
+def test_cli_imports_no_app_or_heavy_clients_before_a_command_runs(tmp_path):
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "DB_BACKEND": "sqlite", "DATABASE_PATH": str(tmp_path / "tasks.db")}
+    code = ("import sys, main; heavy = {'app', 'google.generativeai', 'sendgrid', 'pandas', 'streamlit'} & set(sys.modules); "
+            "assert not heavy, heavy")
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, check=True)
+
+
+def due_in(days):
+    return datetime.combine(date.today() + timedelta(days=days), time(12, 0))
+
+
+def test_dry_run_renders_without_sending_or_recording(app_module, transport, add_contact, add_task, capsys):
+    import main
+
+    add_task(add_contact(email="asha@example.com"), title="Plan", deadline=due_in(2))
+    assert main.main(["dry-run"]) == 0
+    out = capsys.readouterr().out
+    assert "asha@example.com\t" in out and "1 email(s) would be sent." in out
+    assert transport.sent == [] and app_module.get_due_tasks()
+
+
+def test_run_once_exit_status_reports_failed_reminders(app_module, transport, add_contact, add_task, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "start_metrics_server", lambda: None)
+    add_task(add_contact(email="asha@example.com"), deadline=due_in(2))
+    add_task(add_contact(email="ravi@example.com"), deadline=due_in(2))
+    transport.failing["ravi@example.com"] = 400
+    assert main.main(["run-once", "--shards", "1"]) == 1
+    transport.failing.clear()
+    monkeypatch.setattr(app_module, "_dispatcher", app_module.EmailDispatcher(transport, max_workers=1))
+    assert main.main(["run-once", "--shards", "1"]) == 0
+    assert sorted(email.to for email in transport.sent) == ["asha@example.com", "ravi@example.com"]
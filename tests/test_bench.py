@@ -0,0 +1,80 @@
+import http.client
+import json
+import smtplib
+import time
+import types
+
+import pytest
+
+import fakes
+from bench import Recorder, measure
+from fakes import FakeGemini, FakeSendGrid, FakeSMTP
+
+
+def post(server, path, body):
+    conn = http.client.HTTPConnection("127.0.0.1", server._server.server_port)
+    conn.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, dict(response.getheaders()), response.read()
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(server):
+        started.append(server.start())
+        return server
+
+    yield start
+    for server in started:
+        server.stop()
+
+
+def test_recorder_reports_call_latency_percentiles():
+    recorder = Recorder()
+    recorder.durations = [n / 1000 for n in range(1, 101)]
+    assert recorder.latency_ms() == {"calls": 100, "p50": 51.0, "p99": 100.0, "max": 100.0}
+    assert Recorder().latency_ms()["calls"] == 0
+    assert list(recorder.timed_iter(iter("ab"))) == ["a", "b"] and len(recorder.durations) == 102
+
+
+def test_measure_reports_items_and_throughput():
+    recorder = Recorder()
+    output, stage = measure(lambda: [recorder.wrap(str)(n) for n in range(10)], len, recorder)
+    assert output == [str(n) for n in range(10)]
+    assert stage["items"] == 10 and stage["latency_ms"]["calls"] == 10
+    assert set(stage) == {"items", "seconds", "throughput_per_s", "latency_ms", "peak_memory_mb"}
+
+
+def test_fake_sendgrid_counts_recipients_and_throttles(servers, monkeypatch):
+    monkeypatch.setattr(fakes, "time", types.SimpleNamespace(time=lambda: 1000.0, sleep=time.sleep))
+    sendgrid = servers(FakeSendGrid(rate_limit=2))
+    body = {"personalizations": [{"to": [{"email": "a@example.com"}]}, {"to": [{"email": "b@example.com"}]}]}
+    replies = [post(sendgrid, "/v3/mail/send", body) for _ in range(3)]
+    assert [status for status, _, _ in replies] == [202, 202, 429]
+    assert replies[2][1]["Retry-After"] == "1"
+    assert (sendgrid.recipients, sendgrid.throttled) == (4, 1)
+    assert replies[0][1]["X-Message-Id"] == "fake-1"
+
+
+def test_fake_sendgrid_injects_errors_reproducibly(servers):
+    first, second = servers(FakeSendGrid(error_rate=0.5, seed=3)), servers(FakeSendGrid(error_rate=0.5, seed=3))
+    statuses = [[post(server, "/v3/mail/send", {})[0] for _ in range(10)] for server in (first, second)]
+    assert statuses[0] == statuses[1] and 500 in statuses[0] and 202 in statuses[0]
+
+
+def test_fake_gemini_answers_with_structured_messages(servers):
+    gemini = servers(FakeGemini())
+    prompt = 'Tasks (JSON):\n[{"task_id": 4, "title": "Plan", "deadline": "2026-05-01 09:00", "assigned_to": "Asha"}]'
+    status, _, data = post(gemini, "/v1beta/models/m:generateContent", {"contents": [{"parts": [{"text": prompt}]}]})
+    text = json.loads(data)["candidates"][0]["content"]["parts"][0]["text"]
+    assert status == 200 and json.loads(text)["messages"][0]["task_id"] == 4
+
+
+def test_fake_smtp_accepts_messages_over_one_connection(servers):
+    sink = servers(FakeSMTP())
+    with smtplib.SMTP("127.0.0.1", sink.port) as smtp:
+        for n in range(3):
+            smtp.sendmail("from@example.com", [f"to{n}@example.com"], b"Subject: hi\r\n\r\nhello")
+    assert (sink.requests, sink.recipients, sink.connections) == (3, 3, 1)
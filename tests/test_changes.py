@@ -0,0 +1,73 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from changes import ChangeFeed
+from slots import SendSlot, SlotClock
+
+
+def logged(storage):
+    with storage.connection() as conn:
+        return [row[0] for row in conn.cursor().execute("SELECT TASK_ID FROM TASK_CHANGES ORDER BY ID")]
+
+
+def age(storage, task_id, hours):
+    with storage.connection() as conn:
+        conn.cursor().execute(
+            "UPDATE TASK_CHANGES SET CHANGED_AT = datetime('now', ?) WHERE TASK_ID = ?", (f"-{hours} hours", task_id)
+        )
+
+
+def test_added_and_redated_tasks_are_logged(storage, add_contact, add_task):
+    task_id = add_task(add_contact())
+    with storage.connection() as conn:
+        conn.cursor().execute("UPDATE TASKS SET DEADLINE = '2030-01-01 09:00:00' WHERE ID = ?", (task_id,))
+        conn.cursor().execute("UPDATE TASKS SET PRIORITY = 'High' WHERE ID = ?", (task_id,))
+    assert logged(storage) == [task_id, task_id]
+
+
+def test_clear_removes_only_the_handled_batch(storage, add_contact, add_task):
+    feed = ChangeFeed(storage)
+    first = add_task(add_contact())
+    last_change = feed.latest()
+    second = add_task(add_contact())
+    feed.clear(last_change)
+    assert logged(storage) == [second]
+    assert first != second
+
+
+def test_prune_drops_only_old_changes(storage, add_contact, add_task):
+    old, recent = add_task(add_contact()), add_task(add_contact())
+    age(storage, old, 72)
+    assert ChangeFeed(storage).prune(max_age_hours=48) == 1
+    assert logged(storage) == [recent]
+
+
+def test_scheduler_ticks_prune_the_log_without_a_watcher(storage, app_module, add_contact, add_task):
+    old = add_task(add_contact())
+    age(storage, old, 72)
+    app_module.notify_due_slots()
+    assert logged(storage) == []
+
+
+def test_change_batches_and_scheduler_ticks_never_send_a_reminder_twice(app_module, transport, add_contact, add_task,
+                                                                        monkeypatch):
+    slot = SendSlot("UTC", 9, date.today(), 0, 60)
+    monkeypatch.setattr(app_module, "slot_clock", SlotClock())
+    monkeypatch.setattr(app_module, "due_slots", lambda groups, start, end: [slot])
+    monkeypatch.setattr(app_module, "todays_slots", lambda groups: [slot])
+    send_batch = transport.send_batch
+
+    def slow_send_batch(emails):
+        time.sleep(0.2)  # Both runs have queried before either records its send
+        return send_batch(emails)
+
+    monkeypatch.setattr(transport, "send_batch", slow_send_batch)
+    add_task(add_contact(email="asha@example.com"), deadline=datetime.combine(date.today() + timedelta(days=2), datetime.min.time()))
+    feed = ChangeFeed(app_module.get_storage())
+    runs = [threading.Thread(target=app_module.notify_changes, args=(feed,)), threading.Thread(target=app_module.notify_due_slots)]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join(timeout=10)
+    assert [email.to for email in transport.sent] == ["asha@example.com"]
@@ -0,0 +1,56 @@
+from storage import DUPLICATE_CONTACTS, SEARCH_CONTACTS
+
+
+def pages(storage, query="", limit=2):
+    """Follow the keyset from page to page, returning the names on each."""
+    result, after = [], None
+    while True:
+        contacts, after = storage.search_contacts(query, after, limit)
+        result.append([contact.name for contact in contacts])
+        if after is None:
+            return result
+
+
+def test_pages_walk_every_contact_once_in_name_order(storage, add_contact):
+    for name in ("carol", "Asha", "bob", "Asha", "dev", "Eve"):
+        add_contact(name=name)
+    assert pages(storage) == [["Asha", "Asha"], ["bob", "carol"], ["dev", "Eve"]]
+    assert storage.search_contacts(limit=10)[1] is None
+
+
+def test_long_queries_match_substrings_of_names_and_emails(storage, add_contact):
+    add_contact(name="Asha Rao", email="asha@example.com")
+    add_contact(name="Ravi", email="ravi.rao@example.com")
+    add_contact(name="Meera", email="meera@example.com")
+    assert pages(storage, "rao ", limit=1) == [["Asha Rao"], ["Ravi"]]
+    assert pages(storage, "MEERA@") == [["Meera"]]
+
+
+def test_short_queries_match_prefixes_only(storage, add_contact):
+    add_contact(name="Asha Rao")
+    add_contact(name="Ravi")
+    assert pages(storage, "ra") == [["Ravi"]]
+
+
+def test_like_wildcards_in_the_query_are_literal(storage, add_contact):
+    add_contact(name="Asha", email="asha_1@example.com")
+    add_contact(name="Ravi", email="ravix1@example.com")
+    assert pages(storage, "a_1") == [["Asha"]]
+    assert pages(storage, "100%") == [[]]
+
+
+def test_duplicates_are_found_by_phone_or_email_in_any_case(storage, add_contact):
+    first = add_contact(phone=9123456789)
+    second = add_contact(email="Asha@Example.com")
+    assert [contact.id for contact in storage.find_duplicate_contacts(9123456789, "ASHA@example.COM")] == [first, second]
+    assert storage.find_duplicate_contacts(9000000999, "nobody@example.com") == []
+
+
+def test_search_and_duplicate_lookups_use_the_contact_indexes(storage):
+    with storage.connection() as conn:
+        cursor = conn.cursor()
+        search = SEARCH_CONTACTS.format(search_filter="")
+        search_plan = " ".join(row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + search, ("", 0, 51)))
+        duplicate_plan = " ".join(row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + DUPLICATE_CONTACTS, (1, "a")))
+    assert "IDX_CONTACTS_NAME" in search_plan and "TEMP B-TREE" not in search_plan
+    assert "IDX_CONTACTS_EMAIL" in duplicate_plan
@@ -0,0 +1,55 @@
+import io
+
+from contacts import import_contacts, read_contacts_file, validate_contact, validate_contacts
+
+
+def upload(text, name="contacts.csv"):
+    """An in-memory stand-in for a Streamlit upload."""
+    uploaded = io.BytesIO(text.encode())
+    uploaded.name = name
+    return uploaded
+
+
+def test_form_rejects_a_phone_starting_with_zero():
+    assert validate_contact("Asha", "0123456789", "asha@example.com") == ["Phone must be 10 digits, not starting with 0"]
+    assert validate_contact("Asha", "9123456789", "asha@example.com") == []
+
+
+def test_form_rejects_a_blank_name_like_the_importer():
+    assert validate_contact("   ", "9123456789", "asha@example.com") == ["Name is required"]
+    assert validate_contact(" Asha ", " 9123456789 ", " asha@example.com ") == []
+    report = validate_contacts(read_contacts_file(upload("Name,Phone,Email\n   ,9123456789,asha@example.com\n")))
+    assert report.loc[0, "Reason"] == "Name is required"
+
+
+def test_file_rows_are_validated_and_reported_by_line():
+    report = validate_contacts(read_contacts_file(upload(
+        "name,phone,email\n"
+        "Asha,9123456789,asha@example.com\n"
+        "Ravi,0123456789,ravi@example.com\n"
+        "Meera,9123456789,ASHA@example.com\n"
+    )))
+    assert list(report["Row"]) == [2, 3, 4]
+    assert list(report["Status"]) == ["Valid", "Rejected", "Rejected"]
+    assert report.loc[1, "Reason"] == "Phone must be 10 digits, not starting with 0"
+    assert report.loc[2, "Reason"] == "Duplicate phone in file; Duplicate email in file"
+
+
+def test_import_reports_every_row_even_with_a_leading_zero(storage):
+    report = validate_contacts(read_contacts_file(upload(
+        "Name,Phone,Email\nAsha,9123456789,asha@example.com\nRavi,0123456789,ravi@example.com\n"
+    )))
+    report = import_contacts(report, storage)
+    assert list(report["Status"]) == ["Accepted", "Rejected"]
+    assert report.loc[0, "ID"] > 0
+
+
+def test_import_rejects_an_email_that_differs_only_in_case(storage, add_contact):
+    add_contact(phone=9000000001, email="Asha@Example.com")
+    report = validate_contacts(read_contacts_file(upload(
+        "Name,Phone,Email\nAsha,9123456789,asha@example.com\nRavi,9000000001,ravi@example.com\n"
+    )))
+    report = import_contacts(report, storage)
+    assert list(report["Status"]) == ["Rejected", "Rejected"]
+    assert list(report["Reason"]) == ["Email already exists", "Phone already exists"]
+    assert storage.find_duplicate_contacts(email="ASHA@EXAMPLE.COM")[0].phone == 9000000001
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import dependencies
+from dependencies import DependencyGraph, DependencyIndex, get_dependency_graph, parse_dependencies
+
+
+def edges(storage):
+    with storage.connection() as conn:
+        return sorted(conn.cursor().execute("SELECT TASK_ID, REFERENCE, DEPENDS_ON FROM TASK_DEPENDENCIES").fetchall())
+
+
+@pytest.fixture
+def fresh_graph(monkeypatch):
+    monkeypatch.setattr(dependencies, "_graph", (None, dependencies.EMPTY_GRAPH))
+    monkeypatch.setattr(dependencies, "_index", None)
+
+
+def test_dependency_text_is_parsed_into_titles():
+    assert parse_dependencies("'Project Planning' and 'UI Design'") == ["project planning", "ui design"]
+    assert parse_dependencies("Project Planning; UI design, project planning") == ["project planning", "ui design"]
+    assert parse_dependencies("N/A") == parse_dependencies(None) == []
+
+
+def test_refresh_reindexes_only_changed_tasks(storage, add_contact, add_task):
+    contact = add_contact()
+    planning = add_task(contact, title="Project Planning")
+    design = add_task(contact, title="UI Design", dependencies="Project Planning")
+    index = DependencyIndex(storage)
+    assert index.refresh() == 2
+    assert edges(storage) == [(design, "project planning", planning)]
+    assert index.refresh() == 0
+
+    with storage.connection() as conn:
+        conn.cursor().execute("UPDATE TASKS SET STATUS = 'In Progress' WHERE ID = ?", (planning,))
+    assert index.refresh() == 0  # Updated, but neither title nor dependencies changed
+
+    build = add_task(contact, title="Build", dependencies="'UI Design', 'Testing'")
+    assert index.refresh() == 1
+    assert edges(storage)[-2:] == [(build, "testing", None), (build, "ui design", design)]
+    testing = add_task(contact, title="Testing")
+    assert index.refresh() == 1
+    assert (build, "testing", testing) in edges(storage)
+
+
+def test_refresh_drops_deleted_tasks(storage, add_contact, add_task):
+    contact = add_contact()
+    planning = add_task(contact, title="Project Planning")
+    design = add_task(contact, title="UI Design", dependencies="Project Planning")
+    index = DependencyIndex(storage)
+    index.refresh()
+    with storage.connection() as conn:
+        conn.cursor().execute("DELETE FROM TASKS WHERE ID = ?", (design,))
+    assert index.refresh() == 1
+    assert edges(storage) == []
+    assert planning
+
+
+def test_refresh_after_a_restart_compares_every_task(storage, add_contact, add_task):
+    contact = add_contact()
+    add_task(contact, title="Project Planning")
+    DependencyIndex(storage).refresh()
+    with storage.connection() as conn:
+        # An edit that left UPDATED_AT alone, as made before the column existed
+        conn.cursor().execute("DROP TRIGGER TASKS_TOUCHED")
+        conn.cursor().execute("UPDATE TASKS SET DEPENDENCIES = 'Design'")
+    assert DependencyIndex(storage).refresh() == 1
+
+
+def test_graph_is_loaded_right_after_boot(storage, add_contact, add_task, fresh_graph, monkeypatch):
+    # time.monotonic() counts from boot: on a host up for seconds it is below max_age
+    monkeypatch.setattr(dependencies.time, "monotonic", lambda: 10.0)
+    contact = add_contact()
+    planning = add_task(contact, title="Project Planning")
+    add_task(contact, title="UI Design", dependencies="Project Planning")
+    graph = get_dependency_graph(storage)
+    assert graph is not dependencies.EMPTY_GRAPH
+    assert graph.dependents[planning]
+    assert get_dependency_graph(storage) is graph
+
+
+def test_slack_and_critical_path():
+    now = datetime(2026, 5, 1, 9)
+    nodes = {1: (now + timedelta(days=2), 24), 2: (now + timedelta(days=2), 24), 3: (now + timedelta(days=10), 8)}
+    graph = DependencyGraph(nodes, [(2, 1), (3, 1)], now)
+    assert graph.slack[1] == 0 and graph.slack[2] == 0
+    assert graph.critical_path() == [1, 2]
+    assert graph.transitive_dependents(1) == {2, 3}
+    assert "2 other task(s)" in graph.escalation(1, threshold=1)
+    assert graph.escalation(2, threshold=1) == ""
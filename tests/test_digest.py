@@ -0,0 +1,62 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+
+def due_in(days, at=time(12, 0)):
+    return datetime.combine(date.today() + timedelta(days=days), at)
+
+
+def digests(storage, app_module, lead_times, today, chunk_size=100):
+    return [digest for chunk in storage.iter_due_digests(app_module.deadline_windows(lead_times, today), chunk_size)
+            for digest in chunk]
+
+
+@pytest.fixture
+def digest_mode(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "DIGEST_MODE", True)
+
+
+def test_due_tasks_are_grouped_per_contact_most_urgent_first(storage, app_module, add_contact, add_task):
+    asha, ravi = add_contact(name="Asha"), add_contact(name="Ravi")
+    low = add_task(asha, title="Low", deadline=datetime(2026, 5, 3, 9), priority="Low")
+    later = add_task(asha, title="High later", deadline=datetime(2026, 5, 3, 17), priority="High")
+    sooner = add_task(asha, title="High sooner", deadline=datetime(2026, 5, 3, 8), priority="High")
+    today = add_task(asha, title="Today", deadline=datetime(2026, 5, 1, 18), priority="Medium")
+    ravis = add_task(ravi, deadline=datetime(2026, 5, 3, 9))
+    found = digests(storage, app_module, [0, 2], date(2026, 5, 1))
+    assert [digest.contact_id for digest in found] == [asha, ravi]
+    assert [task.task_id for task in found[0].tasks] == [sooner, later, today, low]
+    assert {task.task_id: task.lead_days for task in found[0].tasks}[today] == 0
+    assert [task.task_id for task in found[1].tasks] == [ravis]
+
+
+def test_chunks_hold_whole_digests(storage, app_module, add_contact, add_task):
+    contacts = [add_contact() for _ in range(3)]
+    for contact, count in zip(contacts, (3, 1, 2)):
+        for hour in range(count):
+            add_task(contact, deadline=datetime(2026, 5, 3, 9 + hour))
+    chunks = list(storage.iter_due_digests(app_module.deadline_windows([2], date(2026, 5, 1)), 2))
+    assert [[len(digest.tasks) for digest in chunk] for chunk in chunks] == [[3], [1, 2]]
+
+
+def test_each_contact_gets_one_email_listing_all_their_tasks(app_module, digest_mode, transport, add_contact, add_task):
+    asha = add_contact(name="Asha", email="asha@example.com")
+    add_task(asha, title="Plan <Q3>", deadline=due_in(2), priority="High")
+    add_task(asha, title="Ship", deadline=due_in(2, time(9, 0)))
+    add_task(add_contact(name="Ravi", email="ravi@example.com"), title="Review", deadline=due_in(2))
+    assert app_module.check_and_notify() == {"sent": 2, "failed": 0}
+    by_recipient = {email.to: email for email in transport.sent}
+    assert by_recipient["asha@example.com"].subject == "Task Digest: 2 task(s) due soon"
+    assert "Plan &lt;Q3&gt;" in by_recipient["asha@example.com"].html
+    assert "Ship" in by_recipient["asha@example.com"].plain_text
+    assert "Review" in by_recipient["ravi@example.com"].plain_text
+
+
+def test_digest_tasks_are_recorded_so_a_rerun_sends_nothing(app_module, digest_mode, transport, add_contact, add_task):
+    asha = add_contact(email="asha@example.com")
+    add_task(asha, title="Plan", deadline=due_in(2))
+    add_task(asha, title="Ship", deadline=due_in(2))
+    assert app_module.check_and_notify() == {"sent": 1, "failed": 0}
+    assert app_module.check_and_notify() == {"sent": 0, "failed": 0}
+    assert len(transport.sent) == 1
@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dispatch import Email, EmailDispatcher, SendGridTransport, SendResult, classify_send, classify_smtp
+from fakes import FakeSendGrid
+from ratelimit import RateLimiter, Retrier
+
+
+def reply(status, to="asha@example.com"):
+    return SendResult(Email(to, "s", "p", "h"), status)
+
+
+@pytest.fixture
+def sendgrid():
+    server = FakeSendGrid().start()
+    yield server
+    server.stop()
+
+
+def emails(count):
+    return [Email(f"user{n}@example.com", "Reminder", "Hi", "<p>Hi</p>") for n in range(count)]
+
+
+class ImmediateQueue:
+    """Runs retries right away instead of after the backoff delay."""
+
+    def schedule(self, delay, callback):
+        callback()
+
+
+@pytest.mark.parametrize("status", [421, 450, 451, 452])
+def test_smtp_throttling_replies_back_off_the_limiter(status):
+    assert classify_smtp(reply(status), None) == (True, None)
+
+
+@pytest.mark.parametrize("status", [None, 403, 454, 471])
+def test_other_transient_smtp_failures_are_retried_without_throttling(status):
+    assert classify_smtp(reply(status), None) == (False, None)
+
+
+@pytest.mark.parametrize("status", [250, 550, 554])
+def test_delivered_and_permanent_smtp_replies_are_final(status):
+    assert classify_smtp(reply(status), None) is None
+
+
+def test_smtp_batch_is_retried_only_when_nothing_got_through():
+    assert classify_smtp([reply(451), reply(None)], None) == (True, None)
+    assert classify_smtp([reply(451), reply(250)], None) is None
+
+
+def test_sendgrid_retries_429_and_5xx_only():
+    assert classify_send(reply(429), None) == (True, None)
+    assert classify_send(reply(503), None) == (False, None)
+    assert classify_send(reply(400), None) is None
+
+
+def test_transient_smtp_failures_are_retried_a_bounded_number_of_times():
+    limiter, calls = RateLimiter("test-smtp", 0), []
+
+    def send(email):
+        calls.append(email)
+        return reply(454)
+
+    retrier = Retrier(limiter, classify_smtp, max_attempts=3, queue=ImmediateQueue())
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        result = retrier.submit(pool, send, "message").result(timeout=5)
+    assert len(calls) == 3
+    assert result.status_code == 454
+
+
+def test_dispatcher_returns_results_in_input_order():
+    class EchoTransport:
+        provider = "test-echo"
+        classify = staticmethod(classify_send)
+
+        def send(self, email):
+            return SendResult(email, 202)
+
+        def send_batch(self, emails):
+            return [SendResult(email, 202) for email in reversed(emails)]
+
+        def close(self):
+            pass
+
+    emails = [Email(f"user{n}@example.com", "s", "p", "h") for n in range(7)]
+    for mode in ("single", "batch"):
+        dispatcher = EmailDispatcher(EchoTransport(), max_workers=2, mode=mode, batch_size=3)
+        assert [result.email for result in dispatcher.dispatch(emails)] == emails
+        dispatcher.close()
+
+
+def test_sendgrid_sends_reuse_one_connection_per_worker(sendgrid):
+    transport = SendGridTransport("key", base_url=sendgrid.url)
+    dispatcher = EmailDispatcher(transport, max_workers=2)
+    results = dispatcher.dispatch(emails(20))
+    assert all(result.ok for result in results)
+    assert sendgrid.requests == sendgrid.recipients == 20
+    assert 1 <= len(transport._connections) <= 2
+    dispatcher.close()
+    assert transport._connections == []
+
+
+def test_failed_sendgrid_requests_are_retried_then_reported(sendgrid):
+    sendgrid.error_rate = 1.0
+    retrier = Retrier(RateLimiter("test-sendgrid", 0), classify_send, max_attempts=2, queue=ImmediateQueue())
+    dispatcher = EmailDispatcher(SendGridTransport("key", base_url=sendgrid.url), max_workers=2, retrier=retrier)
+    results = dispatcher.dispatch(emails(3))
+    assert [result.status_code for result in results] == [500] * 3
+    assert "Injected failure" in results[0].error
+    assert sendgrid.requests == 6
+    dispatcher.close()
+
+
+def test_batch_mode_sends_one_request_per_template_batch(sendgrid):
+    tagged = [Email(f"user{n}@example.com", "Hi -name-", "Hi -name-", "<p>Hi -name-</p>", f"User {n}",
+                    substitutions={"-name-": f"User {n}"}) for n in range(7)]
+    other = Email("other@example.com", "Other", "Other", "<p>Other</p>")
+    dispatcher = EmailDispatcher(SendGridTransport("key", base_url=sendgrid.url), max_workers=2, mode="batch", batch_size=3)
+    results = dispatcher.dispatch(tagged + [other])
+    assert [result.email for result in results] == tagged + [other]
+    assert all(result.ok for result in results)
+    assert sendgrid.requests == 4  # 3 + 3 + 1 tagged, and the other template on its own
+    assert sendgrid.recipients == 8
+    dispatcher.close()
+
+
+def test_batch_message_carries_one_personalization_per_recipient():
+    tagged = [Email(f"user{n}@example.com", "Hi -name-", "Hi -name-", "<p>Hi -name-</p>", f"User {n}",
+                    substitutions={"-name-": f"User {n}"}) for n in range(2)]
+    payload = SendGridTransport("key").build_batch_message(tagged).get()
+    assert payload["subject"] == "Hi -name-"
+    assert sorted((p["to"][0]["email"], p["substitutions"]) for p in payload["personalizations"]) == [
+        ("user0@example.com", {"-name-": "User 0"}), ("user1@example.com", {"-name-": "User 1"})
+    ]
@@ -0,0 +1,45 @@
+from datetime import date, datetime
+
+from storage import DUE_TASKS_SQLITE, NOT_YET_SENT
+
+
+def due(storage, app_module, lead_times, today, chunk_size=100):
+    return [task for chunk in storage.iter_due_tasks(app_module.deadline_windows(lead_times, today), chunk_size)
+            for task in chunk]
+
+
+def test_windows_are_half_open_days_per_lead_time(app_module):
+    assert app_module.deadline_windows([2, 0, 2], date(2026, 5, 30)) == [
+        (0, "2026-05-30", "2026-05-31"), (2, "2026-06-01", "2026-06-02")
+    ]
+
+
+def test_open_tasks_due_on_each_lead_day_are_found(storage, app_module, add_contact, add_task):
+    contact = add_contact()
+    today = date(2026, 5, 1)
+    in_two_days = add_task(contact, deadline=datetime(2026, 5, 3, 0, 0))
+    last_minute = add_task(contact, deadline=datetime(2026, 5, 3, 23, 59))
+    today_task = add_task(contact, deadline=datetime(2026, 5, 1, 18, 0))
+    add_task(contact, deadline=datetime(2026, 5, 4, 0, 0))  # Midnight after the window
+    add_task(contact, deadline=datetime(2026, 5, 3, 12, 0), status="Completed")
+    found = due(storage, app_module, [0, 2], today)
+    assert sorted((task.task_id, task.lead_days) for task in found) == sorted(
+        [(in_two_days, 2), (last_minute, 2), (today_task, 0)]
+    )
+    assert {task.deadline for task in found} >= {"2026-05-03 00:00", "2026-05-03 23:59"}
+
+
+def test_results_are_streamed_in_chunks(storage, app_module, add_contact, add_task):
+    contact = add_contact()
+    for hour in range(7):
+        add_task(contact, deadline=datetime(2026, 5, 3, hour, 0))
+    chunks = list(storage.iter_due_tasks(app_module.deadline_windows([2], date(2026, 5, 1)), 3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+
+
+def test_the_deadline_lookup_uses_the_open_deadline_index(storage):
+    query = DUE_TASKS_SQLITE.format(windows="(?, ?, ?)", not_yet_sent=NOT_YET_SENT, extra_columns="", order_by="",
+                                    slot_filter="", shard_filter="", change_filter="")
+    with storage.connection() as conn:
+        plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, (2, "2026-05-03", "2026-05-04")))
+    assert "IDX_TASKS_OPEN_DEADLINE (DEADLINE>? AND DEADLINE<?)" in plan
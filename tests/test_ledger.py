@@ -0,0 +1,49 @@
+from datetime import date, datetime, time, timedelta
+
+
+def due_in(days, at=time(12, 0)):
+    """A deadline `days` from today, inside that day's lead-time window."""
+    return datetime.combine(date.today() + timedelta(days=days), at)
+
+
+def statuses(storage):
+    with storage.connection() as conn:
+        return conn.cursor().execute("SELECT TASK_ID, STATUS FROM NOTIFICATIONS ORDER BY TASK_ID").fetchall()
+
+
+def test_a_reminder_is_sent_once_across_runs(app_module, transport, add_contact, add_task):
+    task_id = add_task(add_contact(), deadline=due_in(2))
+    assert app_module.check_and_notify() == {"sent": 1, "failed": 0}
+    assert app_module.check_and_notify() == {"sent": 0, "failed": 0}
+    assert len(transport.sent) == 1
+    assert transport.sent[0].key[0] == task_id
+
+
+def test_failed_reminders_stay_due(app_module, transport, storage, add_contact, add_task):
+    task_id = add_task(add_contact(email="asha@example.com"), deadline=due_in(2))
+    transport.failing["asha@example.com"] = 400
+    assert app_module.check_and_notify() == {"sent": 0, "failed": 1}
+    assert statuses(storage) == [(task_id, "Failed")]
+    transport.failing.clear()
+    assert app_module.check_and_notify() == {"sent": 1, "failed": 0}
+    assert statuses(storage) == [(task_id, "Sent")]
+
+
+def test_a_redated_task_is_reminded_again(app_module, transport, storage, add_contact, add_task):
+    task_id = add_task(add_contact(), deadline=due_in(2))
+    app_module.check_and_notify()
+    with storage.connection() as conn:
+        conn.cursor().execute("UPDATE TASKS SET DEADLINE = ? WHERE ID = ?", (due_in(2, time(17, 30)).strftime("%Y-%m-%d %H:%M"), task_id))
+    assert app_module.check_and_notify() == {"sent": 1, "failed": 0}
+    assert "05:30 PM" in transport.sent[-1].plain_text
+
+
+def test_the_ledger_is_keyed_on_the_stored_deadline(app_module, transport, storage, add_contact, add_task):
+    deadline = due_in(2, time(9, 15))
+    add_task(add_contact(), deadline=deadline)
+    app_module.check_and_notify()
+    with storage.connection() as conn:
+        recorded, stored = conn.cursor().execute(
+            "SELECT n.DEADLINE, t.DEADLINE FROM NOTIFICATIONS n JOIN TASKS t ON t.ID = n.TASK_ID"
+        ).fetchone()
+    assert recorded == stored == deadline.strftime("%Y-%m-%d %H:%M")
@@ -0,0 +1,69 @@
+import json
+import threading
+
+from llm import (TASK_PROMPT, MessageGenerator, StubBackend, build_prompt, chunk_tasks, estimate_tokens, parse_messages,
+                 task_payload)
+
+
+def tasks(count, title="Write report"):
+    return [(n, f"{title} {n}", "2026-05-01 09:00", "Asha") for n in range(1, count + 1)]
+
+
+class CountingBackend(StubBackend):
+    """The stub backend, recording the task IDs in each prompt; prompts holding `failing` raise."""
+
+    def __init__(self, failing=None):
+        self.prompts = []
+        self.failing = failing
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        ids = [item["task_id"] for item in json.loads(prompt.rsplit("Tasks (JSON):\n", 1)[1])]
+        with self._lock:
+            self.prompts.append(ids)
+        if self.failing in ids:
+            raise ValueError("malformed response")
+        return super().generate(prompt)
+
+
+def test_chunks_stay_within_the_task_limit_and_token_budget():
+    chunks = list(chunk_tasks(tasks(60), token_budget=100_000, max_tasks=25))
+    assert [len(chunk) for chunk in chunks] == [25, 25, 10]
+    assert [task for chunk in chunks for task in chunk] == tasks(60)
+
+    budget = 600 + estimate_tokens(TASK_PROMPT.header + "Tasks (JSON):\n")
+    long_chunks = list(chunk_tasks(tasks(60, title="A long task title " * 5), token_budget=budget, max_tasks=25))
+    assert len(long_chunks) > 3
+    for chunk in long_chunks:
+        assert sum(estimate_tokens(json.dumps(task_payload(task))) for task in chunk) <= 600
+
+
+def test_an_oversized_task_still_gets_a_chunk_of_its_own():
+    assert list(chunk_tasks(tasks(2, title="x" * 10_000), token_budget=100)) == [[task] for task in tasks(2, title="x" * 10_000)]
+
+
+def test_responses_are_parsed_by_task_id():
+    text = '```json\n{"messages": [{"task_id": "2", "message": " Hi "}, {"task_id": 3}, {"message": "orphan"}]}\n```'
+    assert parse_messages(text) == {2: "Hi"}
+    assert parse_messages('[{"digest_id": 7, "message": "Hello"}]', "digest_id") == {7: "Hello"}
+
+
+def test_every_task_gets_a_message_from_concurrent_chunks():
+    backend = CountingBackend()
+    messages = MessageGenerator(backend, max_tasks=10, concurrency=3).generate(tasks(45))
+    assert sorted(messages) == list(range(1, 46))
+    assert "Write report 7" in messages[7]
+    assert sorted(len(ids) for ids in backend.prompts) == [5, 10, 10, 10, 10]
+
+
+def test_a_failed_chunk_only_drops_its_own_tasks():
+    messages = MessageGenerator(CountingBackend(failing=12), max_tasks=10).generate(tasks(30))
+    assert sorted(messages) == list(range(1, 11)) + list(range(21, 31))
+
+
+def test_prompt_lists_each_task_as_structured_json():
+    prompt = build_prompt(tasks(2))
+    assert prompt.startswith(TASK_PROMPT.header)
+    assert json.loads(prompt.rsplit("Tasks (JSON):\n", 1)[1])[1] == {
+        "task_id": 2, "title": "Write report 2", "deadline": "2026-05-01 09:00", "assigned_to": "Asha"
+    }
@@ -0,0 +1,75 @@
+import types
+
+import pytest
+
+import llm_cache
+from llm import MessageGenerator, StubBackend
+from llm_cache import LLMCache, make_key
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", types.SimpleNamespace(time=clock))  # This module's clock only
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"), ttl=3600, max_entries=3)
+    yield cache
+    cache.close()
+
+
+def test_keys_ignore_cosmetic_differences():
+    assert make_key("m", {"title": "Write  report", "deadline": "d"}) == make_key("m", {"deadline": "d", "title": "Write report"})
+    assert make_key("m", {"title": "Write report"}) != make_key("other", {"title": "Write report"})
+    assert make_key("m", {"title": "Write report"}) != make_key("m", {"title": "Write reports"})
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.put("a", "hello")
+    clock.now += 3599
+    assert cache.get("a") == "hello"
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(cache, clock):
+    for key in "abc":
+        clock.now += 1
+        cache.put(key, key.upper())
+    clock.now += 1
+    cache.get("a")  # Now more recent than b and c
+    clock.now += 1
+    cache.put("d", "D")
+    assert set(cache.get_many("abcd")) == {"a", "c", "d"}
+    assert cache.stats() == {"hits": 4, "misses": 1, "evictions": 1, "size": 3}
+
+
+def test_cached_tasks_skip_the_model(tmp_path):
+    class Backend(StubBackend):
+        prompts = 0
+
+        def generate(self, prompt):
+            Backend.prompts += 1
+            return super().generate(prompt)
+
+    cache = LLMCache(str(tmp_path / "llm_cache.db"))
+    generator = MessageGenerator(Backend(), cache=cache)
+    first = generator.generate([(1, "Write report", "2026-05-01 09:00", "Asha")])
+    # Same content under another row ID hits the cache; a changed deadline does not
+    second = generator.generate([(2, "Write report", "2026-05-01 09:00", "Asha"), (3, "Write report", "2026-05-02 09:00", "Asha")])
+    assert second[2] == first[1]
+    assert "2026-05-02" in second[3]
+    assert Backend.prompts == 2
+    cache.close()
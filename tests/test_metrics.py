@@ -0,0 +1,112 @@
+import json
+import socket
+import urllib.request
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import metrics
+from metrics import Counter, Histogram, SpanContext, record_span, span
+
+
+def test_counter_counts_per_label_set_and_exports_prometheus_text():
+    counter = Counter("emails_total", "Emails", ["status"])
+    counter.inc(status="sent")
+    counter.inc(2, status="sent")
+    counter.inc(status='bad "x"')
+    assert counter.snapshot() == [{"labels": {"status": 'bad "x"'}, "value": 1}, {"labels": {"status": "sent"}, "value": 3}]
+    assert counter.prometheus()[-1] == 'emails_total{status="sent"} 3'
+    assert counter.prometheus()[-2] == 'emails_total{status="bad \\"x\\""} 1'
+
+
+def test_histogram_buckets_are_cumulative_and_quantiles_use_bucket_bounds():
+    histogram = Histogram("stage_seconds", "Stages", ["stage"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value, stage="send")
+    [(labels, cumulative, count, total)] = histogram.samples()
+    assert (labels, cumulative, count, total) == ({"stage": "send"}, [1, 3, 4], 4, 6.05)
+    assert histogram.snapshot()[0]["p50"] == 1 and histogram.snapshot()[0]["p99"] == float("inf")
+    assert 'stage_seconds_bucket{stage="send",le="+Inf"} 4' in histogram.prometheus()
+
+
+def test_exported_metrics_merge_into_another_process():
+    counter, other = Counter("c", "c", ["status"]), Counter("c", "c", ["status"])
+    histogram, other_histogram = Histogram("h", "h", buckets=(1,)), Histogram("h", "h", buckets=(1,))
+    counter.inc(status="sent")
+    other.inc(2, status="sent")
+    histogram.observe(0.5)
+    other_histogram.observe(2)
+    counter.merge(other.export())
+    histogram.merge(other_histogram.export())
+    assert counter.samples() == [({"status": "sent"}, 3)]
+    assert list(histogram.samples()) == [({}, [1, 2], 2, 2.5)]
+
+
+def test_spans_share_the_trace_and_nest_under_the_current_span(capsys):
+    with span("run", command="notify") as run:
+        with span("query") as query:
+            record_span("send", 0.25, task_id=7)
+    recent = {record["name"]: record for record in metrics.recent_spans()[-3:]}
+    assert {record["trace_id"] for record in recent.values()} == {run.trace_id}
+    assert recent["query"]["parent_id"] == run.span_id and recent["send"]["parent_id"] == query.span_id
+    assert recent["send"]["duration_ms"] == 250.0
+    assert "span name=run" in capsys.readouterr().out
+
+
+def test_span_joins_a_trace_from_another_process_and_records_errors():
+    with pytest.raises(RuntimeError):
+        with span("shard", parent=SpanContext("t" * 32, "p" * 16)) as shard:
+            raise RuntimeError("boom")
+    assert (shard.trace_id, shard.parent_id, shard.attributes["error"]) == ("t" * 32, "p" * 16, "boom")
+
+
+def test_json_log_lines(monkeypatch, capsys):
+    monkeypatch.setattr(metrics, "LOG_FORMAT", "json")
+    metrics.log("run_finished", sent=3)
+    line = json.loads(capsys.readouterr().out)
+    assert line["event"] == "run_finished" and line["sent"] == 3
+
+
+def test_metrics_server_serves_prometheus_and_json():
+    assert metrics.start_metrics_server(port=0) is None
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = metrics.start_metrics_server(port=port)
+    try:
+        metrics.RUNS.inc(status="ok")
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert "# TYPE notify_runs_total counter" in response.read().decode()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json") as response:
+            assert "notify_stage_seconds" in json.load(response)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def counts(counter):
+    return {tuple(labels.values()): value for labels, value in counter.samples()}
+
+
+def due_in(days):
+    return datetime.combine(date.today() + timedelta(days=days), time(12, 0))
+
+
+def test_notify_run_records_stages_outcomes_and_spans(app_module, transport, add_contact, add_task, capsys):
+    add_task(add_contact(name="Asha", email="asha@example.com"), title="Plan", deadline=due_in(2))
+    add_task(add_contact(name="Ravi", email="ravi@example.com"), title="Ship", deadline=due_in(2))
+    transport.failing["ravi@example.com"] = 400
+    emails, runs = counts(metrics.EMAILS), counts(metrics.RUNS)
+    stages = {labels["stage"]: count for labels, _, count, _ in metrics.STAGE_SECONDS.samples()}
+
+    assert app_module.check_and_notify() == {"sent": 1, "failed": 1}
+    assert counts(metrics.EMAILS)[("sent",)] == emails.get(("sent",), 0) + 1
+    assert counts(metrics.EMAILS)[("failed",)] == emails.get(("failed",), 0) + 1
+    assert counts(metrics.RUNS)[("ok",)] == runs.get(("ok",), 0) + 1
+    after = {labels["stage"]: count for labels, _, count, _ in metrics.STAGE_SECONDS.samples()}
+    assert all(after[name] > stages.get(name, 0) for name in ("query", "llm", "render"))
+    recent = metrics.recent_spans()
+    run = next(record for record in reversed(recent) if record["name"] == "notify_run")
+    tasks = [record for record in recent if record["name"] == "task" and record["trace_id"] == run["trace_id"]]
+    assert sorted(task["attributes"]["status"] for task in tasks) == ["failed", "sent"]
+    assert run["attributes"]["sent"] == 1 and "span name=notify_run" in capsys.readouterr().out
@@ -0,0 +1,107 @@
+import types
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import outbox as outbox_module
+from dispatch import Email, SendResult
+from outbox import Outbox
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(outbox_module, "time", types.SimpleNamespace(time=clock))  # This module's clock only
+    return clock
+
+
+@pytest.fixture
+def queued(storage, app_module, add_contact, add_task, clock):
+    """Five due tasks queued in the outbox; returns the due-task rows."""
+    for n in range(5):
+        add_task(add_contact(), title=f"Task {n}")
+    tasks = app_module.get_due_tasks(lead_times=[3])
+    Outbox(storage).enqueue(tasks)
+    return tasks
+
+
+def results(jobs, status=202):
+    return [SendResult(Email(job.recipient, "s", "p", "h", key=(job.task_id, job.lead_days, job.deadline)), status,
+                       "msg" if status == 202 else None, None if status == 202 else "rejected") for job in jobs]
+
+
+def test_a_reminder_is_queued_once(storage, queued, clock):
+    queue = Outbox(storage)
+    queue.enqueue(queued)
+    assert queue.counts() == {"Pending": 5}
+
+
+def test_claimed_jobs_go_to_one_worker_until_the_lease_expires(storage, queued, clock):
+    queue = Outbox(storage, lease_seconds=60)
+    first, second = queue.claim("a", 3), queue.claim("b", 10)
+    assert len(first) == 3 and len(second) == 2
+    assert not {job.id for job in first} & {job.id for job in second}
+    assert queue.claim("c", 10) == []
+    clock.now += 61
+    assert len(queue.claim("c", 10)) == 5
+
+
+def test_a_worker_that_lost_its_lease_cannot_settle_the_job(storage, queued, clock):
+    queue = Outbox(storage, lease_seconds=60)
+    jobs = queue.claim("a", 10)
+    clock.now += 61
+    assert len(queue.claim("b", 10)) == 5
+    queue.complete("a", jobs, results(jobs))
+    assert queue.counts() == {"Claimed": 5}
+
+
+def test_sent_jobs_are_done_and_recorded_in_the_ledger(storage, app_module, queued, clock):
+    queue = Outbox(storage)
+    jobs = queue.claim("a", 10)
+    queue.complete("a", jobs, results(jobs))
+    assert queue.counts() == {"Done": 5}
+    assert app_module.get_due_tasks(lead_times=[3]) == []
+
+
+def test_failed_jobs_back_off_then_fail_after_max_attempts(storage, queued, clock):
+    queue = Outbox(storage, max_attempts=2, retry_base_seconds=30)
+    jobs = queue.claim("a", 10)
+    queue.complete("a", jobs, results(jobs, status=400))
+    assert queue.counts() == {"Pending": 5}
+    assert queue.claim("a", 10) == []
+    clock.now += 31
+    jobs = queue.claim("a", 10)
+    assert [job.attempts for job in jobs] == [2] * 5
+    queue.complete("a", jobs, results(jobs, status=400))
+    assert queue.counts() == {"Failed": 5}
+
+
+def test_worker_drains_the_queue(storage, app_module, transport, queued):
+    import worker
+
+    worker.run_worker(batch_size=2, once=True)
+    assert Outbox(storage).counts() == {"Done": 5}
+    assert sorted(email.key[0] for email in transport.sent) == sorted(task[0] for task in queued)
+
+
+def test_jobs_for_a_redated_task_are_settled_separately(storage, app_module, add_contact, add_task, clock):
+    task_id = add_task(add_contact(), deadline=datetime.combine(date.today() + timedelta(days=3), time(9, 0)))
+    queue = Outbox(storage)
+    queue.enqueue(app_module.get_due_tasks(lead_times=[3]))
+    with storage.connection() as conn:
+        conn.cursor().execute("UPDATE TASKS SET DEADLINE = ? WHERE ID = ?",
+                              (f"{date.today() + timedelta(days=3)} 17:00", task_id))
+    queue.enqueue(app_module.get_due_tasks(lead_times=[3]))
+    old, new = sorted(queue.claim("a", 10), key=lambda job: job.id)
+    assert (old.task_id, old.recipient) == (new.task_id, new.recipient) and old.deadline != new.deadline
+    queue.complete("a", [old, new], results([old]) + results([new], status=400))
+    assert queue.counts() == {"Done": 1, "Pending": 1}
+    assert [task.deadline for task in app_module.get_due_tasks(lead_times=[3])] == [new.deadline]
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import prefetch, stage
+
+
+def test_items_come_through_in_order():
+    assert list(prefetch(range(50), depth=2)) == list(range(50))
+    assert list(stage(lambda n: n * n, range(5), depth=1)) == [0, 1, 4, 9, 16]
+
+
+def test_the_producer_runs_at_most_depth_items_ahead():
+    produced = []
+
+    def source():
+        for n in range(20):
+            produced.append(n)
+            yield n
+
+    items = prefetch(source(), depth=2)
+    assert next(items) == 0
+    time.sleep(0.3)
+    # One handed over, two queued, and one waiting to be queued
+    assert len(produced) <= 4
+    items.close()
+
+
+def test_producer_errors_are_raised_in_the_consumer():
+    def source():
+        yield 1
+        raise ValueError("query failed")
+
+    items = prefetch(source())
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="query failed"):
+        next(items)
+
+
+def test_stopping_early_closes_the_source_on_its_own_thread():
+    closed = {}
+
+    def source():
+        try:
+            yield from range(100)
+        finally:
+            closed["thread"] = threading.current_thread()
+
+    items = prefetch(source(), depth=1)
+    assert next(items) == 0
+    items.close()
+    assert closed["thread"] is not threading.current_thread()
+
+
+def test_a_run_sends_every_chunk(app_module, transport, add_contact, add_task, monkeypatch):
+    contacts = [add_contact() for _ in range(3)]
+    for n in range(25):
+        add_task(contacts[n % 3])
+    fetch = app_module.iter_due_task_chunks
+    monkeypatch.setattr(app_module, "iter_due_task_chunks", lambda **kw: fetch(lead_times=[3], chunk_size=4, **kw))
+    assert app_module.check_and_notify() == {"sent": 25, "failed": 0}
+    assert len({email.key for email in transport.sent}) == 25
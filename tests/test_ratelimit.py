@@ -0,0 +1,136 @@
+import types
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter, Retrier, get_limiter, parse_retry_after, share_limits
+
+
+class Clock:
+    """Monotonic time that only moves when the code under test sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def time(self):
+        return self.now
+
+
+class ImmediateQueue:
+    """Runs retries right away, recording the backoff each would have waited."""
+
+    def __init__(self):
+        self.delays = []
+
+    def schedule(self, delay, callback):
+        self.delays.append(delay)
+        callback()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep, time=clock.time))
+    return clock
+
+
+def test_limiter_allows_a_burst_then_paces_requests(clock):
+    limiter = RateLimiter("sendgrid", rate=10)
+    for _ in range(10):
+        limiter.acquire()
+    assert clock.now == pytest.approx(1000.0)
+    for _ in range(10):
+        limiter.acquire()
+    assert clock.now == pytest.approx(1000.9)  # Ten more at 10/s once the burst is spent
+
+
+def test_throttle_halves_the_rate_once_per_second_and_pauses_callers(clock):
+    limiter = RateLimiter("sendgrid", rate=100)
+    limiter.throttle(retry_after=2)
+    limiter.throttle(retry_after=2)  # The same congestion, seen by a concurrent request
+    assert limiter.rate == 50
+    limiter.acquire()
+    assert clock.now == pytest.approx(1002.0)
+    clock.now += 1
+    limiter.throttle()
+    assert limiter.rate == 25
+
+
+def test_successes_recover_the_rate_additively(clock):
+    limiter = RateLimiter("gemini", rate=10)
+    limiter.throttle()
+    for _ in range(3):
+        limiter.success()
+    assert limiter.rate == pytest.approx(5.3)
+    for _ in range(100):
+        limiter.success()
+    assert limiter.rate == 10
+
+
+def test_unlimited_provider_still_honours_retry_after(clock):
+    limiter = RateLimiter("stub", rate=0)
+    limiter.acquire()
+    limiter.throttle(retry_after=3)
+    limiter.acquire()
+    assert (limiter.rate, clock.slept) == (0, [3])
+
+
+def test_share_limits_scales_configured_and_running_limiters(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMITS", {"sendgrid": 100.0})
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    limiter = get_limiter("sendgrid")
+    assert get_limiter("sendgrid") is limiter and get_limiter("stub").rate == 0
+    share_limits(0.25)
+    assert (ratelimit.RATE_LIMITS["sendgrid"], limiter.rate, limiter.burst) == (25.0, 25.0, 25)
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None and parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(later) <= 30
+
+
+def test_backoff_grows_exponentially_with_full_jitter_and_respects_retry_after():
+    retrier = Retrier(RateLimiter("x", 0), lambda result, error: None, base_seconds=1, max_seconds=8)
+    assert all(0 <= retrier.backoff(attempt) <= min(8, 2 ** (attempt - 1)) for attempt in range(1, 8) for _ in range(20))
+    assert retrier.backoff(1, retry_after=5) >= 5
+
+
+def test_retrier_retries_until_success_and_throttles_on_429(clock):
+    replies = iter([429, 500, 202])
+    limiter, queue = RateLimiter("sendgrid", rate=100), ImmediateQueue()
+
+    def classify(status, error):
+        return None if status == 202 else (status == 429, 1.5 if status == 429 else None)
+
+    retrier = Retrier(limiter, classify, queue=queue)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert retrier.submit(pool, lambda: next(replies)).result(timeout=5) == 202
+    assert limiter.rate == 51 and len(queue.delays) == 2 and queue.delays[0] >= 1.5
+
+
+def test_retrier_gives_up_with_the_last_error(clock):
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ConnectionError("reset")
+
+    retrier = Retrier(RateLimiter("smtp", 0), lambda result, error: (False, None), max_attempts=3, queue=ImmediateQueue())
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with pytest.raises(ConnectionError):
+            retrier.submit(pool, fail).result(timeout=5)
+    assert len(calls) == 3
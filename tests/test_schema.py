@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from storage import Storage
+
+OLD_CONTACTS = """
+CREATE TABLE CONTACTS (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    NAME VARCHAR(100) NOT NULL,
+    PHONE INTEGER UNIQUE NOT NULL,
+    EMAIL VARCHAR(100) UNIQUE NOT NULL,
+    ADDRESS TEXT
+)
+"""
+
+
+def statements(storage):
+    """Return the list that collects every statement run on the pooled SQLite connection."""
+    run = []
+    with storage.connection() as conn:
+        conn.set_trace_callback(run.append)
+    return run
+
+
+def test_older_database_gets_the_added_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(OLD_CONTACTS)
+    storage = Storage(backend="sqlite", path=path)
+    storage.create_schema()
+    with storage.connection() as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(CONTACTS)")}
+    assert {"TIMEZONE", "PREFERRED_HOUR"} <= columns
+    storage.close()
+
+
+def test_current_database_is_not_altered(storage):
+    run = statements(storage)
+    storage.create_schema()
+    assert run and not [statement for statement in run if statement.lstrip().upper().startswith("ALTER")]
+
+
+def test_runs_and_ticks_issue_no_ddl(storage, app_module, monkeypatch):
+    def fail():
+        pytest.fail("create_schema called during a run")
+
+    monkeypatch.setattr(storage, "create_schema", fail)
+    assert app_module.check_and_notify() == {"sent": 0, "failed": 0}
+    assert app_module.enqueue_due_notifications() == 0
+    assert app_module.notify_due_slots() is None
@@ -0,0 +1,46 @@
+import random
+import re
+from datetime import datetime
+
+from contacts import EMAIL_PATTERN, PHONE_PATTERN
+from seed import generate_contacts, generate_tasks, seed
+from storage import Storage
+
+TODAY = datetime(2026, 5, 1)
+
+
+def load(path, seed_value):
+    storage = Storage(backend="sqlite", path=str(path))
+    assert seed(storage, 20, 300, seed_value, TODAY) == 300
+    with storage.connection() as conn:
+        contacts = conn.execute("SELECT * FROM CONTACTS ORDER BY ID").fetchall()
+        tasks = conn.execute("SELECT TITLE, DEADLINE, ASSIGNED_TO, STATUS, DEPENDENCIES FROM TASKS ORDER BY ID").fetchall()
+    storage.close()
+    return contacts, tasks
+
+
+def test_the_same_seed_reproduces_the_same_data(tmp_path):
+    first, again, other = load(tmp_path / "a.db", 7), load(tmp_path / "b.db", 7), load(tmp_path / "c.db", 8)
+    assert first == again
+    assert first != other
+
+
+def test_generated_contacts_pass_the_form_rules():
+    contacts = list(generate_contacts(random.Random(1), 500))
+    assert all(re.fullmatch(PHONE_PATTERN, str(phone)) and re.search(EMAIL_PATTERN, email)
+               for _, phone, email, *_ in contacts)
+    assert len({phone for _, phone, *_ in contacts}) == len({email for _, _, email, *_ in contacts}) == 500
+
+
+def test_generated_tasks_look_like_real_work():
+    tasks = list(generate_tasks(random.Random(1), 2000, [1, 2, 3], TODAY))
+    titles = [task[0] for task in tasks]
+    deadlines = [datetime.strptime(task[5], "%Y-%m-%d %H:%M") for task in tasks]
+    statuses = [task[15] for task in tasks]
+    overdue_closed = sum(d < TODAY and s in ("Completed", "Reviewed & Approved") for d, s in zip(deadlines, statuses))
+    assert 0.5 < sum(d >= TODAY for d in deadlines) / len(tasks) < 0.9
+    assert overdue_closed > sum(d < TODAY for d in deadlines) / 2
+    # Dependencies name one of the tasks generated shortly before
+    for i, task in enumerate(tasks):
+        if task[7] != "None":
+            assert task[7] in titles[max(0, i - 50):i]
@@ -0,0 +1,59 @@
+import argparse
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import ratelimit
+from fakes import FakeSMTP
+from shards import Shard, parse_shard, run_shard, run_sharded
+
+
+def due_in(days):
+    return datetime.combine(date.today() + timedelta(days=days), time(12, 0))
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == Shard(1, 4) and str(Shard(1, 4)) == "1/4"
+    for value in ("4/4", "-1/2", "x"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(value)
+
+
+def test_shards_partition_contacts_with_all_of_their_tasks(storage, app_module, add_contact, add_task):
+    contacts = [add_contact() for _ in range(7)]
+    for contact in contacts:
+        add_task(contact, deadline=datetime(2026, 5, 3, 9))
+        add_task(contact, deadline=datetime(2026, 5, 3, 17))
+    windows = app_module.deadline_windows([2], date(2026, 5, 1))
+    shards = [{task.task_id for chunk in storage.iter_due_tasks(windows, 100, shard=Shard(index, 3)) for task in chunk}
+              for index in range(3)]
+    everything = {task.task_id for chunk in storage.iter_due_tasks(windows, 100) for task in chunk}
+    assert sum(map(len, shards)) == len(everything) == 14 and set().union(*shards) == everything
+    assert all(len(tasks) >= 4 for tasks in shards)
+
+
+def test_run_shard_sends_only_its_share_within_a_divided_rate(app_module, transport, add_contact, add_task, monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMITS", {"sendgrid": 100.0})
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    contacts = {add_contact(email=f"contact{n}@example.com"): f"contact{n}@example.com" for n in range(4)}
+    for contact in contacts:
+        add_task(contact, deadline=due_in(2))
+    result, exported = run_shard(Shard(0, 2))
+    assert result == {"sent": 2, "failed": 0} and "notify_emails_total" in exported
+    assert sorted(email.to for email in transport.sent) == sorted(email for contact, email in contacts.items() if contact % 2 == 0)
+    assert ratelimit.RATE_LIMITS["sendgrid"] == 50.0
+
+
+def test_run_sharded_sends_every_reminder_once_across_processes(storage, add_contact, add_task, monkeypatch):
+    for n in range(5):
+        add_task(add_contact(email=f"contact{n}@example.com"), deadline=due_in(2))
+    sink = FakeSMTP().start()
+    try:
+        for name, value in {"DATABASE_PATH": storage.path, "EMAIL_TRANSPORT": "smtp", "SMTP_HOST": "127.0.0.1",
+                            "SMTP_PORT": str(sink.port), "SMTP_SECURITY": "none", "LLM_BACKEND": "stub"}.items():
+            monkeypatch.setenv(name, value)
+        assert run_sharded(2) == {"sent": 5, "failed": 0}
+        assert run_sharded(2) == {"sent": 0, "failed": 0}
+    finally:
+        sink.stop()
+    assert sink.recipients == 5
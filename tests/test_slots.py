@@ -0,0 +1,143 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from slots import SendSlot, SlotClock, due_slots, todays_slots
+from storage import StorageError
+
+UTC = timezone.utc
+
+
+def minutes_sent(groups, start, ticks, tick=timedelta(minutes=5), spread=60):
+    """Run `ticks` consecutive scheduler ticks and return every (timezone, hour, date, minute) they send."""
+    clock, sent = SlotClock(catch_up=timedelta(0)), []
+    clock.advance(start)
+    for n in range(1, ticks + 1):
+        window = clock.advance(start + n * tick)
+        for slot in due_slots(groups, *window, spread=spread):
+            sent += [(slot.timezone, slot.hour, slot.local_date, minute)
+                     for minute in range(slot.first_minute, slot.end_minute)]
+    return sent
+
+
+def test_consecutive_ticks_send_every_slot_minute_exactly_once():
+    groups = [("UTC", 9), ("Asia/Kolkata", 9), ("America/New_York", 23)]
+    sent = minutes_sent(groups, datetime(2026, 3, 10, tzinfo=UTC), ticks=2 * 24 * 12)
+    assert len(sent) == len(set(sent))
+    for name, hour in groups:
+        days = {local_date for tz, h, local_date, _ in sent if (tz, h) == (name, hour)}
+        for local_date in days - {min(days), max(days)}:
+            assert {m for tz, h, d, m in sent if (tz, h, d) == (name, hour, local_date)} == set(range(60))
+
+
+def test_slot_is_at_the_preferred_local_hour():
+    # 09:00 in Kolkata is 03:30 UTC
+    slots = due_slots([("Asia/Kolkata", 9)], datetime(2026, 5, 1, 3, 29, tzinfo=UTC), datetime(2026, 5, 1, 3, 34, tzinfo=UTC))
+    assert slots == [SendSlot("Asia/Kolkata", 9, date(2026, 5, 1), 0, 5)]
+
+
+def test_daylight_saving_change_moves_the_slot_with_local_time():
+    # New York springs forward on 2026-03-08: 09:00 local is 14:00 UTC before and 13:00 UTC after
+    before = due_slots([("America/New_York", 9)], datetime(2026, 3, 7, 13, 55, tzinfo=UTC), datetime(2026, 3, 7, 14, 0, tzinfo=UTC))
+    after = due_slots([("America/New_York", 9)], datetime(2026, 3, 9, 12, 55, tzinfo=UTC), datetime(2026, 3, 9, 13, 0, tzinfo=UTC))
+    assert before == [SendSlot("America/New_York", 9, date(2026, 3, 7), 0, 1)]
+    assert after == [SendSlot("America/New_York", 9, date(2026, 3, 9), 0, 1)]
+
+
+def test_unknown_timezone_falls_back_to_the_default():
+    window = (datetime(2026, 5, 1, 8, 59, tzinfo=UTC), datetime(2026, 5, 1, 9, 0, tzinfo=UTC))
+    assert due_slots([("Mars/Olympus", 9)], *window) == [SendSlot("Mars/Olympus", 9, date(2026, 5, 1), 0, 1)]
+
+
+def test_slot_clock_hands_out_contiguous_intervals():
+    clock = SlotClock(catch_up=timedelta(minutes=5))
+    first = datetime(2026, 1, 1, 12, tzinfo=UTC)
+    assert clock.advance(first) == (first - timedelta(minutes=5), first)
+    assert clock.advance(first + timedelta(minutes=7)) == (first, first + timedelta(minutes=7))
+
+
+def test_todays_slots_cover_only_contacts_whose_slot_has_come():
+    groups = [("UTC", 9), ("UTC", 17)]
+    slots = todays_slots(groups, now=datetime(2026, 5, 1, 9, 20, tzinfo=UTC), spread=60)
+    assert slots == [SendSlot("UTC", 9, date(2026, 5, 1), 0, 21)]
+    assert todays_slots(groups, now=datetime(2026, 5, 1, 8, 0, tzinfo=UTC)) == []
+
+
+def test_a_slot_run_reminds_only_that_slots_contacts_once_across_its_minutes(app_module, transport, add_contact, add_task):
+    today = date.today()
+    deadline = datetime.combine(today + timedelta(days=2), datetime.min.time()).replace(hour=12)
+    kolkata = [add_contact(email=f"kolkata{n}@example.com", timezone="Asia/Kolkata", preferred_hour=9) for n in range(6)]
+    for contact in kolkata + [add_contact(timezone="Asia/Kolkata", preferred_hour=17), add_contact()]:
+        add_task(contact, deadline=deadline)
+    halves = [SendSlot("Asia/Kolkata", 9, today, 0, 30), SendSlot("Asia/Kolkata", 9, today, 30, 60)]
+    sent = [app_module.check_and_notify([slot])["sent"] for slot in halves]
+    assert sum(sent) == 6
+    assert sorted(email.to for email in transport.sent) == sorted(f"kolkata{n}@example.com" for n in range(6))
+
+
+def test_clock_moves_on_only_when_a_run_finishes():
+    clock = SlotClock(catch_up=timedelta(minutes=5))
+    first = datetime(2026, 1, 1, 12, tzinfo=UTC)
+    assert clock.pending(first) == (first - timedelta(minutes=5), first)
+    later = first + timedelta(minutes=5)
+    assert clock.pending(later) == (first - timedelta(minutes=5), later)  # The failed tick is covered again
+    clock.finish(later)
+    assert clock.pending(later + timedelta(minutes=5))[0] == later
+
+
+def test_slots_with_failed_sends_are_retried_on_their_local_date_only():
+    clock = SlotClock(retries=2)
+    now = datetime(2026, 5, 1, 10, tzinfo=UTC)
+    slot = SendSlot("UTC", 9, date(2026, 5, 1), 0, 60)
+    clock.finish(now, [slot], failed=True)
+    assert clock.retry_slots(now) == [slot] and clock.retry_slots(now) == [slot]
+    assert clock.retry_slots(now) == []  # Retries used up
+    clock.finish(now, [slot], failed=True)
+    assert clock.retry_slots(datetime(2026, 5, 2, 0, 1, tzinfo=UTC)) == []  # The next day
+    clock.finish(now, [slot], failed=True)
+    clock.finish(now, [slot])
+    assert clock.retry_slots(now) == []  # Sent in full
+
+
+@pytest.fixture
+def ticks(app_module, monkeypatch):
+    """Scheduler ticks on a fresh clock; one slot is due in the interval the first tick starts."""
+    slot, starts = SendSlot("UTC", 9, date.today(), 0, 60), []
+
+    def offered(groups, start, end):
+        starts.append(start)
+        return [slot] if start == starts[0] else []
+
+    monkeypatch.setattr(app_module, "slot_clock", SlotClock())
+    monkeypatch.setattr(app_module, "due_slots", offered)
+    return app_module.notify_due_slots
+
+
+def due_in_two_days():
+    return datetime.combine(date.today() + timedelta(days=2), datetime.min.time())
+
+
+def test_a_failed_tick_is_covered_by_the_next(app_module, transport, add_contact, add_task, ticks, monkeypatch):
+    add_task(add_contact(email="asha@example.com"), deadline=due_in_two_days())
+
+    def down(slots):
+        raise StorageError("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app_module, "check_and_notify", down)
+        with pytest.raises(StorageError):
+            ticks()
+    assert ticks() == {"sent": 1, "failed": 0}
+    assert ticks() is None
+    assert [email.to for email in transport.sent] == ["asha@example.com"]
+
+
+def test_failed_sends_are_retried_by_later_ticks(app_module, transport, add_contact, add_task, ticks):
+    add_task(add_contact(email="asha@example.com"), deadline=due_in_two_days())
+    add_task(add_contact(email="ravi@example.com"), deadline=due_in_two_days())
+    transport.failing["ravi@example.com"] = 503
+    assert ticks() == {"sent": 1, "failed": 1}
+    transport.failing.clear()
+    assert ticks() == {"sent": 1, "failed": 0}
+    assert ticks() is None  # Sent in full: nothing left to retry
+    assert sorted(email.to for email in transport.sent) == ["asha@example.com", "ravi@example.com"]
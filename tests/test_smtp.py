@@ -0,0 +1,124 @@
+import ipaddress
+import socket
+import ssl
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+controller = pytest.importorskip("aiosmtpd.controller")
+x509 = pytest.importorskip("cryptography.x509")
+
+from aiosmtpd.smtp import AuthResult, LoginPassword
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from dispatch import Email, SMTPTransport
+
+
+def self_signed(tmp_path):
+    """Write a certificate and key for 127.0.0.1; return their paths."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number()).not_valid_before(now - timedelta(minutes=1))
+        .not_valid_after(now + timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = tmp_path / "relay.pem", tmp_path / "relay.key"
+    cert_path.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+    return str(cert_path), str(key_path)
+
+
+class Relay:
+    """Records each delivered message with the connection (client port) it came over and its TLS and login state."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append({"to": envelope.rcpt_tos, "peer": session.peer[1],
+                              "tls": session.ssl is not None, "authenticated": session.authenticated})
+        return "250 OK"
+
+    @property
+    def connections(self):
+        return len({message["peer"] for message in self.messages})
+
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    ok = isinstance(auth_data, LoginPassword) and (auth_data.login, auth_data.password) == (b"bot", b"secret")
+    return AuthResult(success=ok, handled=False)  # Not handled: the relay replies 535 itself
+
+
+@pytest.fixture
+def relay(tmp_path):
+    """A local aiosmtpd relay that requires STARTTLS and AUTH; yields (relay, port, client ssl context)."""
+    cert_path, key_path = self_signed(tmp_path)
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert_path, key_path)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = Relay()
+    smtpd = controller.Controller(
+        handler, hostname="127.0.0.1", port=port, tls_context=server_context, require_starttls=True,
+        authenticator=authenticate, auth_required=True, auth_require_tls=True
+    )
+    smtpd.start()
+    yield handler, port, ssl.create_default_context(cafile=cert_path)
+    smtpd.stop()
+
+
+def transport_for(relay, **settings):
+    _, port, context = relay
+    return SMTPTransport(host="127.0.0.1", port=port, username="bot", password="secret", security="starttls",
+                         from_email="reminders@example.com", ssl_context=context, **settings)
+
+
+def emails(count):
+    return [Email(to=f"user{n}@example.com", subject="Reminder", plain_text="Due soon", html="<p>Due soon</p>")
+            for n in range(count)]
+
+
+def test_messages_go_over_tls_after_login(relay):
+    transport = transport_for(relay)
+    results = transport.send_batch(emails(3))
+    transport.close()
+    handler = relay[0]
+    assert [result.status_code for result in results] == [250] * 3
+    assert [message["to"] for message in handler.messages] == [[f"user{n}@example.com"] for n in range(3)]
+    assert all(message["tls"] and message["authenticated"] for message in handler.messages)
+    assert handler.connections == 1
+
+
+def test_connections_are_reused_then_renewed_after_messages_per_connection(relay):
+    transport = transport_for(relay, messages_per_connection=2)
+    results = transport.send_batch(emails(5)) + [transport.send(email) for email in emails(3)]
+    transport.close()
+    assert all(result.ok for result in results)
+    # 2 + 2 + 1 in the batch; the last connection is reused for one more message, then one of two
+    assert relay[0].connections == 4
+
+
+def test_a_connection_dropped_while_idle_is_replaced(relay):
+    transport = transport_for(relay)
+    transport.send(emails(1)[0])
+    transport._idle[0].conn.sock.shutdown(socket.SHUT_RDWR)  # As if the relay had timed the idle session out
+    result = transport.send(emails(2)[1])
+    transport.close()
+    assert result.ok and relay[0].connections == 2
+
+
+def test_wrong_password_is_reported_not_retried(relay):
+    transport = transport_for(relay)
+    transport.password = "wrong"
+    result = transport.send(emails(1)[0])
+    assert (result.status_code, result.ok) == (535, False)
+    assert relay[0].messages == []
@@ -0,0 +1,119 @@
+import gc
+import os
+import subprocess
+import sys
+import threading
+import types
+from pathlib import Path
+
+import pytest
+
+import storage as storage_module
+from storage import Storage, StorageError
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class FakeConnection:
+    def __init__(self, log):
+        self.log = log
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=()):
+        self.connection.log.append(query.split(" ")[0])
+
+
+def test_statements_are_prepared_again_on_a_new_connection():
+    storage = Storage(backend="postgres")
+    log = []
+    storage.execute(FakeConnection(log).cursor(), "flush", "SELECT ?", (1,))
+    # Each connection is closed and dropped: a new one may reuse the old one's id()
+    for _ in range(20):
+        gc.collect()
+        storage.execute(FakeConnection(log).cursor(), "flush", "SELECT ?", (1,))
+    assert log.count("PREPARE") == 21
+    assert len(storage._prepared) <= 1
+
+
+def test_statements_are_prepared_once_per_connection():
+    storage = Storage(backend="postgres")
+    log = []
+    cursor = FakeConnection(log).cursor()
+    for _ in range(5):
+        storage.execute(cursor, "flush", "SELECT ?", (1,))
+    assert log == ["PREPARE"] + ["EXECUTE"] * 5
+
+
+def test_postgres_pool_keeps_idle_connections_up_to_max(monkeypatch):
+    created = {}
+
+    class FakePool:
+        def __init__(self, minconn, maxconn, **settings):
+            self.minconn, self.maxconn = minconn, maxconn
+            created["pool"] = self
+
+    monkeypatch.setitem(sys.modules, "psycopg2.pool", types.SimpleNamespace(ThreadedConnectionPool=FakePool))
+    Storage(backend="postgres", min_connections=1, max_connections=8)._get_pool()
+    assert created["pool"].minconn == 8
+
+
+def test_connection_reuses_pooled_sqlite_connections(storage):
+    with storage.connection() as conn:
+        first = conn
+    with storage.connection() as conn:
+        assert conn is first
+
+
+def test_failed_transaction_is_rolled_back_and_reported(storage, add_contact):
+    add_contact(phone=9123456789)
+    with pytest.raises(StorageError):
+        with storage.connection() as conn:
+            conn.cursor().execute("INSERT INTO CONTACTS (NAME, PHONE, EMAIL) VALUES ('A', 9111111111, 'a@x.com')")
+            conn.cursor().execute("INSERT INTO CONTACTS (NAME, PHONE, EMAIL) VALUES ('B', 9123456789, 'b@x.com')")
+    with storage.connection() as conn:
+        assert conn.cursor().execute("SELECT COUNT(*) FROM CONTACTS").fetchone()[0] == 1
+
+
+def test_pool_never_hands_out_more_than_max_connections(tmp_path):
+    storage = Storage(backend="sqlite", path=str(tmp_path / "pool.db"), max_connections=2)
+    storage.create_schema()
+    held, blocked = [], threading.Event()
+
+    def borrow():
+        with storage.connection():
+            blocked.set()
+
+    first, second = storage.connection(), storage.connection()
+    held += [first.__enter__(), second.__enter__()]
+    thread = threading.Thread(target=borrow)
+    thread.start()
+    assert not blocked.wait(0.2)
+    first.__exit__(None, None, None)
+    assert blocked.wait(2)
+    thread.join()
+    second.__exit__(None, None, None)
+    storage.close()
+
+
+def test_storage_is_not_switched_to_another_backend(storage):
+    assert storage_module.get_storage() is storage
+    assert storage_module.get_storage("sqlite") is storage
+    with pytest.raises(StorageError, match="already open for sqlite"):
+        storage_module.get_storage("postgres")
+
+
+def test_contact_manager_defaults_to_postgres(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != "DB_BACKEND"}
+    code = "import storage; assert (storage.DB_BACKEND, storage.CONTACT_MANAGER_DB_BACKEND) == ('sqlite', 'postgres')"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env={**env, "PYTHONPATH": str(ROOT)}, check=True)
+    code = "import storage; assert storage.CONTACT_MANAGER_DB_BACKEND == 'sqlite'"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env={**env, "PYTHONPATH": str(ROOT), "DB_BACKEND": "sqlite"},
+                   check=True)
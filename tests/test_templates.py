@@ -0,0 +1,80 @@
+import os
+from datetime import datetime
+
+import pytest
+
+import templates
+from templates import EmailTemplate, Template, get_template
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    """A scratch template directory holding a `note` template, with an empty compiled-template cache."""
+    monkeypatch.setattr(templates, "_templates", {})
+    write(tmp_path, "note.subject.txt", "About {{ title }}\n")
+    write(tmp_path, "note.txt", "Hi {{ name }}, {{ title }} is due.\n")
+    write(tmp_path, "note.html", "<p>Hi {{ name }}, <b>{{title}}</b> is due.</p>")
+    return tmp_path
+
+
+def write(directory, name, text, mtime_ns=None):
+    path = directory / name
+    path.write_text(text, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_template_compiles_to_literals_and_tags():
+    template = Template("Hi {{ name }}, {{name}} again")
+    assert template.fields == ["name", "name"]
+    assert template.tagged == "Hi -name-, -name- again"
+    assert template.render({"-name-": "Asha"}) == "Hi Asha, Asha again"
+
+
+def test_html_body_escapes_values_but_text_does_not(template_dir):
+    template = EmailTemplate("note", ("name", "title"), str(template_dir))
+    subject, text, body = template.render(template.substitutions({"name": "Asha", "title": "Q&A <draft>"}))
+    assert subject == "About Q&A <draft>"
+    assert text == "Hi Asha, Q&A <draft> is due."
+    assert body == "<p>Hi Asha, <b>Q&amp;A &lt;draft&gt;</b> is due.</p>"
+
+
+def test_unknown_placeholder_is_rejected(template_dir):
+    with pytest.raises(ValueError, match="unknown placeholder"):
+        EmailTemplate("note", ("name",), str(template_dir))
+
+
+def test_template_is_compiled_once_and_again_after_an_edit(template_dir):
+    first = get_template("note", ("name", "title"), str(template_dir))
+    assert get_template("note", ("name", "title"), str(template_dir)) is first
+    write(template_dir, "note.subject.txt", "Re: {{ title }}", mtime_ns=os.stat(template_dir / "note.txt").st_mtime_ns + 10**9)
+    edited = get_template("note", ("name", "title"), str(template_dir))
+    assert edited is not first and edited.subject.tagged == "Re: -title-"
+
+
+def test_broken_edit_keeps_the_last_good_template(template_dir, capsys):
+    first = get_template("note", ("name", "title"), str(template_dir))
+    write(template_dir, "note.txt", "{{ unknown }}", mtime_ns=os.stat(template_dir / "note.txt").st_mtime_ns + 10**9)
+    assert get_template("note", ("name", "title"), str(template_dir)) is first
+    assert capsys.readouterr().out.startswith("template_reload_error template=note error=Template 'note' uses unknown")
+
+
+def test_digest_items_are_rendered_into_the_items_placeholder(app_module):
+    template = app_module.digest_template()
+    substitutions = template.substitutions({"task_count": 2}, [{"task_title": "A & B"}, {"task_title": "C"}])
+    assert "A &amp; B" in substitutions["-items_html-"] and "A & B" in substitutions["-items-"]
+    assert template.render(substitutions)[0] == "Task Digest: 2 task(s) due soon"
+
+
+def test_reminder_email_uses_the_shared_template(app_module):
+    email = app_module.build_deadline_email("asha@example.com", "Plan <Q3>", "2026-05-01 09:00", recipient_name="Asha")
+    assert email.subject == app_module.reminder_template().subject.tagged
+    assert "Plan &lt;Q3&gt;" in email.rendered().html
+
+
+def test_format_deadline_is_memoized_and_accepts_datetimes(app_module):
+    app_module.format_deadline.cache_clear()
+    assert app_module.format_deadline("2025-03-12 23:59") == "March 12th, 2025, at 11:59 PM"
+    app_module.format_deadline("2025-03-12 23:59")
+    assert app_module.format_deadline.cache_info().hits == 1
+    assert app_module.format_deadline(datetime(2025, 3, 1, 9, 5)) == "March 1st, 2025, at 09:05 AM"
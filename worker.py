@@ -0,0 +1,65 @@
+import argparse
+import os
+import socket
+import time
+
+import app
+from metrics import log, span, start_metrics_server
+from outbox import Outbox
+from storage import get_storage
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+
+
+def process_jobs(outbox, worker_id, jobs):
+    """Enrich, render and send one claimed batch, then settle each job from its send result."""
+    tasks = [job.task_row() for job in jobs]
+    with span("outbox_batch", worker=worker_id, jobs=len(jobs)) as batch:
+        try:
+            messages = app.process_tasks_with_llm(tasks)
+            results = app.get_dispatcher().dispatch(app.render_chunk(tasks, messages))
+        except Exception as e:
+            log("outbox_batch_error", worker=worker_id, jobs=len(jobs), error=str(e))
+            outbox.release(worker_id, jobs, str(e))
+            return 0, len(jobs)
+        for result in results:
+            app.report_send_result(result)
+        outbox.complete(worker_id, jobs, results)
+        sent = sum(1 for r in results if r.ok)
+        batch.set(sent=sent, failed=len(results) - sent)
+    return sent, len(results) - sent
+
+
+def run_worker(batch_size=OUTBOX_BATCH_SIZE, poll_seconds=OUTBOX_POLL_SECONDS, once=False):
+    """Claim and process outbox jobs until interrupted (or until the queue is empty with once=True)."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    storage = get_storage()
+    storage.create_schema()
+    outbox = Outbox(storage)
+    log("worker_started", worker=worker_id)
+    try:
+        while True:
+            jobs = outbox.claim(worker_id, batch_size)
+            if not jobs:
+                if once:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            process_jobs(outbox, worker_id, jobs)
+    finally:
+        storage.close()
+        app.close_dispatcher()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued deadline notifications from the outbox.")
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE, help="jobs claimed per batch")
+    parser.add_argument("--poll", type=float, default=OUTBOX_POLL_SECONDS, help="seconds to wait when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="exit once the queue is drained")
+    args = parser.parse_args()
+    start_metrics_server()
+    try:
+        run_worker(args.batch_size, args.poll, args.once)
+    except KeyboardInterrupt:
+        print("Worker stopped.")